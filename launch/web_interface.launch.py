@@ -13,7 +13,7 @@ from launch.actions import (
     GroupAction,
     IncludeLaunchDescription,
 )
-from launch.conditions import LaunchConfigurationNotEquals
+from launch.conditions import LaunchConfigurationEquals, LaunchConfigurationNotEquals
 from launch.launch_description_sources import (
     FrontendLaunchDescriptionSource,
     PythonLaunchDescriptionSource,
@@ -223,6 +223,25 @@ def generate_launch_description():
     keyfile_arg = DeclareLaunchArgument(
         "keyfile", default_value=stretch_serial_no + "+6-key.pem"
     )
+    video_streams_single_process = DeclareLaunchArgument(
+        "video_streams_single_process",
+        description=(
+            "Whether to configure all video streams in one process, with one "
+            "worker thread per stream, instead of one process per stream."
+        ),
+        default_value="false",
+        choices=["true", "false"],
+    )
+    video_streams_stream_processes = DeclareLaunchArgument(
+        "video_streams_stream_processes",
+        description=(
+            "With video_streams_single_process, whether to run each stream's worker "
+            "in its own process instead of a thread. The launched process then only "
+            "runs the TF listener, and shares its transforms with the stream processes."
+        ),
+        default_value="false",
+        choices=["true", "false"],
+    )
     nav2_params_file_param = DeclareLaunchArgument(
         "nav2_params_file",
         default_value=os.path.join(
@@ -240,6 +259,8 @@ def generate_launch_description():
             params_file,
             certfile_arg,
             keyfile_arg,
+            video_streams_single_process,
+            video_streams_stream_processes,
         ]
     )
 
@@ -454,8 +475,40 @@ def generate_launch_description():
                     "stretch_tool": stretch_tool,
                 }
             ],
+            condition=LaunchConfigurationEquals(
+                "video_streams_single_process", "false"
+            ),
         )
         ld.add_action(configure_video_streams_node)
+    # Alternatively, configure all streams in one process, which shares the TF
+    # buffer, joint state subscription, and executor across streams. The web app
+    # reads has_beta_teleop_kit and stretch_tool from the gripper stream's node,
+    # so this node keeps that name.
+    configure_all_video_streams_node = Node(
+        package="stretch_web_teleop",
+        executable="configure_video_streams.py",
+        name="configure_video_streams_gripper",
+        output="screen",
+        arguments=[
+            LaunchConfiguration("params"),
+            str(stretch_has_beta_teleop_kit),
+            "True",
+            "True",
+            "True",
+        ],
+        parameters=[
+            {
+                "has_beta_teleop_kit": stretch_has_beta_teleop_kit,
+                "stretch_tool": stretch_tool,
+                "parallel_streams": True,
+                "stream_processes": LaunchConfiguration(
+                    "video_streams_stream_processes"
+                ),
+            }
+        ],
+        condition=LaunchConfigurationEquals("video_streams_single_process", "true"),
+    )
+    ld.add_action(configure_all_video_streams_node)
 
     navigation_bringup_launch = GroupAction(
         condition=LaunchConfigurationNotEquals("map_yaml", ""),
@@ -1,43 +1,87 @@
 #!/usr/bin/env python3
 
+import array
+import functools
 import json
-import math
+import os
+import signal
+import subprocess
 import sys
+import tempfile
 import threading
-from typing import Dict, Union
+import time
+from contextlib import nullcontext
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 import numpy.typing as npt
-import pcl
-import PyKDL  # TODO: This can be removed, as it is only used to perform a transformation that can be done with numpy
 import rclpy
 import ros2_numpy
 import tf2_ros
 import yaml
 from cv_bridge import CvBridge
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from geometry_msgs.msg import TransformStamped
 from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
 from rclpy.duration import Duration
 from rclpy.executors import MultiThreadedExecutor
 from rclpy.node import Node
+from rclpy.publisher import Publisher
 from rclpy.qos import QoSProfile, ReliabilityPolicy
+from rclpy.subscription import Subscription
 from rclpy.time import Time
 from sensor_msgs.msg import CameraInfo, CompressedImage, Image, JointState, PointCloud2
-from std_msgs.msg import String
-from std_srvs.srv import SetBool
+from std_msgs.msg import Header, String
+from std_srvs.srv import SetBool, Trigger
 
+from stretch_web_teleop_helpers.bitrate_control import AdaptiveBitrateController
 from stretch_web_teleop_helpers.conversions import (
-    cv2_image_to_ros_msg,
-    deproject_pixel_to_pointcloud_point,
-    depth_img_to_pointcloud,
-    project_points_to_pixels,
+    DepthDeprojector,
+    JPEGDecoder,
+    JPEGEncoder,
     ros_msg_to_cv2_image,
+    ros_msg_to_frame,
     tf2_get_transform,
+    transform_to_matrix,
 )
+from stretch_web_teleop_helpers.frames import ChannelOrder, Frame
+from stretch_web_teleop_helpers.image_transforms import (
+    LosslessJPEGTransform,
+    PerspectiveTransform,
+    get_perspectives_roi,
+    rotate_image_around_center,
+)
+from stretch_web_teleop_helpers.overlays import (
+    OverlayBlender,
+    OverlayMaskCache,
+    create_aruco_detector,
+    get_body_landmarks_mask,
+    get_graspable_region_mask,
+    get_reach_mask_from_depth_image,
+    get_reach_mask_from_pointcloud,
+)
+from stretch_web_teleop_helpers.stream_activation import StreamActivator
+from stretch_web_teleop_helpers.stream_metrics import StreamMetrics
+from stretch_web_teleop_helpers.stream_workers import SharedTransforms, StreamWorker
 
 # TODO: Add docstrings to this file.
 
 
+class DepthAROverlayMode(Enum):
+    """
+    How the depth AR overlay determines which pixels to highlight.
+    """
+
+    # Filter, downsample, and transform the pointcloud, then project the points
+    # back into the image.
+    POINTCLOUD = "pointcloud"
+    # Compute the mask directly from the aligned depth image, using the ray
+    # through every pixel. Requires the aligned depth image.
+    IMAGE = "image"
+
+
 class ConfigureVideoStreams(Node):
     # Define constant colors and alpha values for the depth AR overlay
     BACKGROUND_COLOR = (200, 200, 200)
@@ -56,6 +100,12 @@ class ConfigureVideoStreams(Node):
     GRIPPER_DEPTH_AR_DOWNSAMPLE_DISTANCE = 0.0019  # m
     GRIPPER_DEPTH_AR_EXPANSION_KERNEL_SIZE = 3
 
+    # The (target frame, source frame) transforms that the streams look up, which
+    # are shared with the stream processes if stream_processes is True
+    SHARED_TRANSFORM_FRAMES = [("base_link", "camera_color_optical_frame")]
+    # How often to share the latest transforms with the stream processes (Hz)
+    SHARED_TRANSFORMS_RATE = 50.0
+
     def __init__(
         self,
         params_file,
@@ -94,6 +144,8 @@ class ConfigureVideoStreams(Node):
 
         with open(params_file, "r") as params:
             self.image_params = yaml.safe_load(params)
+        self.params_file = params_file
+        self.has_beta_teleop_kit = has_beta_teleop_kit
         self.verbose = verbose
         self.use_overhead = use_overhead
         self.use_realsense = use_realsense
@@ -105,10 +157,115 @@ class ConfigureVideoStreams(Node):
         self.declare_parameter("has_beta_teleop_kit", rclpy.Parameter.Type.BOOL)
         self.declare_parameter("stretch_tool", rclpy.Parameter.Type.STRING)
 
+        # How to compute the realsense depth AR overlay. See DepthAROverlayMode.
+        self.realsense_depth_ar_mode = DepthAROverlayMode(
+            self.declare_parameter(
+                "realsense_depth_ar_mode", DepthAROverlayMode.POINTCLOUD.value
+            ).value
+        )
+
+        # If True, process every stream in its own worker thread, at its own rate,
+        # so that a slow stream does not delay the others. Else, process the
+        # streams one after another at target_fps.
+        self.parallel_streams = self.declare_parameter("parallel_streams", False).value
+        # The per-stream rates, if parallel_streams is True
+        self.stream_target_fps = {
+            stream: self.declare_parameter(
+                f"{stream}_target_fps", float(target_fps)
+            ).value
+            for stream in ("overhead", "realsense", "gripper")
+        }
+        # If parallel_streams is True, drop frames that are older than this many
+        # seconds when their stream's worker gets to them. Non-positive disables this.
+        max_frame_age = self.declare_parameter("max_frame_age_sec", 0.0).value
+        self.max_frame_age = max_frame_age if max_frame_age > 0 else None
+
+        # If True, process every enabled stream in its own configure_video_streams
+        # process (with parallel_streams), so the streams do not share a GIL. This
+        # process then only runs the TF listener, and shares the transforms that the
+        # streams need with the stream processes (through shared_transforms_file),
+        # so that they do not each run a TF listener.
+        self.stream_processes = self.declare_parameter("stream_processes", False).value
+        self.stream_process_streams = []
+        if self.stream_processes:
+            self.stream_process_streams = [
+                stream
+                for stream, use_stream in (
+                    ("overhead", self.use_overhead),
+                    ("realsense", self.use_realsense),
+                    ("gripper", self.use_gripper),
+                )
+                if use_stream
+            ]
+            self.use_overhead = False
+            self.use_realsense = False
+            self.use_gripper = False
+        # If set, get the transforms from the process that started this one (see
+        # stream_processes) through this file, instead of running a TF listener.
+        shared_transforms_file = self.declare_parameter(
+            "shared_transforms_file", ""
+        ).value
+        self.shared_transforms: Optional[SharedTransforms] = None
+
+        # If True, adapt every stream's JPEG quality, output scale, and frame rate
+        # to stay within the target bitrate and latency budget.
+        self.bitrate_controllers: Dict[str, AdaptiveBitrateController] = {}
+        if self.declare_parameter("adaptive_bitrate", False).value:
+            target_bitrate_kbps = self.declare_parameter(
+                "target_bitrate_kbps", 4000.0
+            ).value
+            latency_budget = self.declare_parameter("latency_budget_sec", 0.5).value
+            min_jpeg_quality = self.declare_parameter("min_jpeg_quality", 30).value
+            min_output_scale = self.declare_parameter("min_output_scale", 0.5).value
+            min_fps = self.declare_parameter("min_fps", 5.0).value
+            for stream, use_stream in (
+                ("overhead", self.use_overhead),
+                ("realsense", self.use_realsense),
+                ("gripper", self.use_gripper),
+            ):
+                if use_stream:
+                    self.bitrate_controllers[stream] = AdaptiveBitrateController(
+                        target_bitrate=target_bitrate_kbps * 1000 / 8,
+                        latency_budget=latency_budget,
+                        max_fps=self.stream_target_fps[stream],
+                        min_fps=min(min_fps, self.stream_target_fps[stream]),
+                        min_quality=min_jpeg_quality,
+                        min_scale=min_output_scale,
+                    )
+
+        # If True, perspectives that only crop (on a JPEG block boundary) and/or rotate
+        # are applied directly to the realsense JPEGs, without decoding and
+        # re-encoding them, while no overlay is enabled and the bitrate is not
+        # adapted. Rotations are sent as an EXIF orientation, so subscribers must
+        # honor it (as the web app does).
+        self.lossless_jpeg_transforms_enabled = self.declare_parameter(
+            "lossless_jpeg_transforms", False
+        ).value
+
+        # If True, and no overlay is enabled, only decode the region of the
+        # compressed images that the stream's perspectives crop, at the lowest
+        # scale that the (adaptive) output scale needs.
+        self.partial_jpeg_decode = self.declare_parameter(
+            "partial_jpeg_decode", False
+        ).value
+        self.jpeg_decoder = JPEGDecoder()
+
+        # If True, subscribe to the compressed (MJPG passthrough) topics of the UVC
+        # cameras (the navigation camera, and the beta teleop kit's gripper camera)
+        # instead of their raw images. See navigation_camera.py's publish_compressed.
+        use_compressed_uvc_image = self.declare_parameter(
+            "use_compressed_uvc_image", False
+        ).value
+
         # Subscribe to the TF camera feeds to project camera points into base frame.
-        if self.use_realsense:
+        if self.use_realsense or "realsense" in self.stream_process_streams:
             self.tf_buffer = tf2_ros.Buffer(cache_time=Duration(seconds=12))
-            self.tf2_listener = tf2_ros.TransformListener(self.tf_buffer, self)
+            if shared_transforms_file:
+                self.shared_transforms = SharedTransforms(
+                    self.SHARED_TRANSFORM_FRAMES, shared_transforms_file, create=False
+                )
+            else:
+                self.tf2_listener = tf2_ros.TransformListener(self.tf_buffer, self)
 
         # Loaded params for each video stream
         if self.use_overhead:
@@ -140,6 +297,16 @@ class ConfigureVideoStreams(Node):
             self.gripper_camera_rgb_image = None
             self.latest_gripper_camera_rgb_image_lock = None
 
+        # Crop/mask/rotate transforms, compiled per (stream, perspective, input shape,
+        # source size, source origin, scale)
+        self.perspective_transforms: Dict[Tuple, PerspectiveTransform] = {}
+        # JPEG encoders, per (stream, perspective)
+        self.jpeg_encoders: Dict[Tuple[str, str], JPEGEncoder] = {}
+        # Lossless JPEG crop/rotate transforms, per (stream, perspective)
+        self.lossless_jpeg_transforms: Dict[
+            Tuple[str, str], Optional[LosslessJPEGTransform]
+        ] = {}
+
         self.cv_bridge = CvBridge()
         self.aruco_detector = None
         # https://github.com/hello-robot/stretchpy/blob/feature/aruco_marker_detection/docs/arucos.md#known-markers
@@ -148,11 +315,80 @@ class ConfigureVideoStreams(Node):
             "finger_right": 201,
         }
 
-        # Stores the camera projection matrix
+        # Stores the camera projection matrix, and the per-pixel rays derived from it
         if self.use_realsense:
             self.realsense_P = None
+            self.realsense_depth_deprojector = DepthDeprojector()
         if self.use_gripper:
             self.gripper_P = None
+            self.gripper_depth_deprojector = DepthDeprojector()
+
+        # Depth arrives slower than RGB, so reuse the depth AR overlay masks until
+        # a new depth message arrives or the camera moves (relative to base_link
+        # for the realsense, and relative to the fingers for the gripper camera).
+        if self.use_realsense:
+            self.realsense_depth_ar_mask_cache = OverlayMaskCache()
+        if self.use_gripper:
+            self.gripper_depth_ar_mask_cache = OverlayMaskCache()
+
+        # Blend the overlays onto the images
+        if self.use_realsense:
+            self.realsense_depth_ar_blender = OverlayBlender(
+                self.REALSENSE_DEPTH_AR_COLOR, self.REALSENSE_DEPTH_AR_ALPHA
+            )
+            self.realsense_body_pose_ar_blender = OverlayBlender(
+                self.REALSENSE_BODY_LANDMARKS_AR_COLOR,
+                self.REALSENSE_BODY_LANDMARKS_AR_ALPHA,
+            )
+        if self.use_gripper:
+            self.gripper_depth_ar_blender = OverlayBlender(
+                self.GRIPPER_DEPTH_AR_COLOR, self.GRIPPER_DEPTH_AR_ALPHA
+            )
+
+        # Publish the adaptive bitrate settings, and subscribe to the (optional)
+        # receive rates reported by the browser
+        if len(self.bitrate_controllers) > 0:
+            self.bitrate_settings_publisher = self.create_publisher(
+                String, "/video_streams/settings", 1
+            )
+            self.bitrate_feedback_subscriber = self.create_subscription(
+                String,
+                "/video_streams/feedback",
+                self.bitrate_feedback_cb,
+                1,
+                callback_group=MutuallyExclusiveCallbackGroup(),
+            )
+
+        # If True, record how long every stage of every stream takes, and how old
+        # frames are when they are published. Summaries are published on
+        # /diagnostics every period, and the latest ones can be queried through the
+        # ~/stream_metrics service.
+        self.stream_metrics: Dict[str, StreamMetrics] = {}
+        self.latest_stream_metrics_summaries: Dict[str, Dict] = {}
+        if self.declare_parameter("stream_metrics", True).value:
+            for stream, use_stream in (
+                ("overhead", self.use_overhead),
+                ("realsense", self.use_realsense),
+                ("gripper", self.use_gripper),
+            ):
+                if use_stream:
+                    self.stream_metrics[stream] = StreamMetrics(
+                        stream, frame_budget=1.0 / self.stream_target_fps[stream]
+                    )
+            self.diagnostics_publisher = self.create_publisher(
+                DiagnosticArray, "/diagnostics", 1
+            )
+            self.stream_metrics_service = self.create_service(
+                Trigger,
+                "~/stream_metrics",
+                self.stream_metrics_callback,
+                callback_group=MutuallyExclusiveCallbackGroup(),
+            )
+            self.stream_metrics_timer = self.create_timer(
+                self.declare_parameter("stream_metrics_period_sec", 5.0).value,
+                self.publish_stream_metrics,
+                callback_group=MutuallyExclusiveCallbackGroup(),
+            )
 
         # Compressed Image publishers
         if self.use_overhead:
@@ -165,6 +401,17 @@ class ConfigureVideoStreams(Node):
                 "/camera/color/image_raw/rotated/compressed",
                 QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
             )
+            # Also publish every perspective on its own topic, so multiple
+            # views can be consumed at once
+            self.publishers_realsense_perspective_cmp: Dict[str, Publisher] = {}
+            for image_config_name in self.realsense_params or {}:
+                self.publishers_realsense_perspective_cmp[
+                    image_config_name
+                ] = self.create_publisher(
+                    CompressedImage,
+                    f"/camera/color/image_raw/{image_config_name}/compressed",
+                    QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                )
         if self.use_gripper:
             self.publisher_gripper_cmp = self.create_publisher(
                 CompressedImage,
@@ -172,15 +419,69 @@ class ConfigureVideoStreams(Node):
                 QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
             )
 
+        # If True, only subscribe to a stream's upstream topics while its compressed
+        # topics have subscribers, and only subscribe to depth and body landmarks
+        # while their overlays are enabled.
+        self.stream_activators: Dict[str, StreamActivator] = {}
+        if self.declare_parameter("on_demand_subscriptions", False).value:
+            debounce_sec = self.declare_parameter("on_demand_debounce_sec", 5.0).value
+            if self.use_overhead:
+                self.stream_activators["overhead"] = StreamActivator(
+                    self,
+                    "overhead",
+                    [self.publisher_overhead_cmp],
+                    debounce_sec,
+                )
+            if self.use_realsense:
+                self.stream_activators["realsense"] = StreamActivator(
+                    self,
+                    "realsense",
+                    [
+                        self.publisher_realsense_cmp,
+                        *self.publishers_realsense_perspective_cmp.values(),
+                    ],
+                    debounce_sec,
+                )
+            if self.use_gripper:
+                self.stream_activators["gripper"] = StreamActivator(
+                    self,
+                    "gripper",
+                    [self.publisher_gripper_cmp],
+                    debounce_sec,
+                )
+            self.stream_activation_timer = self.create_timer(
+                0.5,
+                self.update_stream_activators,
+                callback_group=MutuallyExclusiveCallbackGroup(),
+            )
+
+        # The region and scale of the camera image that the UVC cameras' images
+        # cover, if the camera nodes crop and/or bin them (see navigation_camera.py's
+        # video_params_file), as ((height, width) of the images, configure_images
+        # keyword arguments) by stream
+        self.uvc_source_regions: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+
         # Subscribers
         if self.use_overhead:
             self.latest_overhead_camera_rgb_image = None
             self.latest_overhead_camera_rgb_image_lock = threading.Lock()
-            self.overhead_camera_rgb_subscriber = self.create_subscription(
-                Image,  # usb_cam doesn't output compressed images
-                "/navigation_camera/image_raw",
+            self.overhead_camera_rgb_subscriber = self.create_stream_subscription(
+                "overhead",
+                # usb_cam doesn't output compressed images, but navigation_camera.py can
+                CompressedImage if use_compressed_uvc_image else Image,
+                "/navigation_camera/image_raw"
+                + ("/compressed" if use_compressed_uvc_image else ""),
                 self.navigation_camera_cb,
                 QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                latest_message="latest_overhead_camera_rgb_image",
+                callback_group=MutuallyExclusiveCallbackGroup(),
+            )
+            self.overhead_camera_info_subscriber = self.create_stream_subscription(
+                "overhead",
+                CameraInfo,
+                "/navigation_camera/camera_info",
+                functools.partial(self.uvc_camera_info_cb, "overhead"),
+                QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
                 callback_group=MutuallyExclusiveCallbackGroup(),
             )
         if self.use_gripper:
@@ -188,21 +489,34 @@ class ConfigureVideoStreams(Node):
             self.latest_gripper_camera_rgb_image_lock = threading.Lock()
             self.expanded_gripper = False
             if has_beta_teleop_kit:
-                self.gripper_camera_rgb_subscriber = self.create_subscription(
-                    Image,
-                    "/gripper_camera/image_raw",
+                self.gripper_camera_rgb_subscriber = self.create_stream_subscription(
+                    "gripper",
+                    CompressedImage if use_compressed_uvc_image else Image,
+                    "/gripper_camera/image_raw"
+                    + ("/compressed" if use_compressed_uvc_image else ""),
                     self.gripper_camera_cb,
                     QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                    latest_message="latest_gripper_camera_rgb_image",
+                    callback_group=MutuallyExclusiveCallbackGroup(),
+                )
+                self.gripper_camera_info_subscriber = self.create_stream_subscription(
+                    "gripper",
+                    CameraInfo,
+                    "/gripper_camera/camera_info",
+                    functools.partial(self.uvc_camera_info_cb, "gripper"),
+                    QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
                     callback_group=MutuallyExclusiveCallbackGroup(),
                 )
             else:
                 # Subscribe to the RGB ompressed image topic
-                self.gripper_camera_rgb_subscriber = self.create_subscription(
+                self.gripper_camera_rgb_subscriber = self.create_stream_subscription(
+                    "gripper",
                     CompressedImage if use_compressed_image else Image,
                     "/gripper_camera/image_raw"
                     + ("/compressed" if use_compressed_image else ""),
                     self.gripper_realsense_rgb_cb,
                     QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                    latest_message="latest_gripper_camera_rgb_image",
                     callback_group=MutuallyExclusiveCallbackGroup(),
                 )
 
@@ -215,30 +529,38 @@ class ConfigureVideoStreams(Node):
                 self.latest_gripper_realsense_depth_image = None
                 self.latest_gripper_realsense_depth_image_lock = threading.Lock()
                 if use_pointcloud:
-                    self.gripper_depth_subscriber = self.create_subscription(
+                    self.gripper_depth_subscriber = self.create_stream_subscription(
+                        "gripper",
                         PointCloud2,
                         "/gripper_camera/depth/color/points",
                         self.gripper_realsense_depth_cb,
                         QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                        condition=lambda: self.gripper_depth_ar,
+                        latest_message="latest_gripper_realsense_depth_image",
                         callback_group=MutuallyExclusiveCallbackGroup(),
                     )
                 else:
-                    self.gripper_depth_subscriber = self.create_subscription(
+                    self.gripper_depth_subscriber = self.create_stream_subscription(
+                        "gripper",
                         CompressedImage if use_compressed_image else Image,
                         "/gripper_camera/aligned_depth_to_color/image_raw"
                         + ("/compressedDepth" if use_compressed_image else ""),
                         self.gripper_realsense_depth_cb,
                         QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                        condition=lambda: self.gripper_depth_ar,
+                        latest_message="latest_gripper_realsense_depth_image",
                         callback_group=MutuallyExclusiveCallbackGroup(),
                     )
-                self.gripper_camera_info_subscriber = self.create_subscription(
+                self.gripper_camera_info_subscriber = self.create_stream_subscription(
+                    "gripper",
                     CameraInfo,
                     "/gripper_camera/color/camera_info",
                     self.gripper_camera_info_cb,
                     QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
                     callback_group=MutuallyExclusiveCallbackGroup(),
                 )
-            self.joint_state_subscription = self.create_subscription(
+            self.joint_state_subscription = self.create_stream_subscription(
+                "gripper",
                 JointState,
                 "/stretch/joint_states",
                 self.joint_state_cb,
@@ -248,34 +570,47 @@ class ConfigureVideoStreams(Node):
         if self.use_realsense:
             self.latest_realsense_rgb_image = None
             self.latest_realsense_rgb_image_lock = threading.Lock()
-            self.camera_rgb_subscriber = self.create_subscription(
+            self.camera_rgb_subscriber = self.create_stream_subscription(
+                "realsense",
                 CompressedImage if use_compressed_image else Image,
                 "/camera/color/image_raw"
                 + ("/compressed" if use_compressed_image else ""),
                 self.realsense_rgb_cb,
                 QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                latest_message="latest_realsense_rgb_image",
                 callback_group=MutuallyExclusiveCallbackGroup(),
             )
             self.latest_realsense_depth_image = None
             self.latest_realsense_depth_image_lock = threading.Lock()
-            if use_pointcloud:
-                self.depth_subscriber = self.create_subscription(
+            # The image-space overlay needs the aligned depth image
+            if (
+                use_pointcloud
+                and self.realsense_depth_ar_mode == DepthAROverlayMode.POINTCLOUD
+            ):
+                self.depth_subscriber = self.create_stream_subscription(
+                    "realsense",
                     PointCloud2,
                     "/camera/depth/color/points",
                     self.realsense_depth_cb,
                     QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                    condition=lambda: self.realsense_depth_ar,
+                    latest_message="latest_realsense_depth_image",
                     callback_group=MutuallyExclusiveCallbackGroup(),
                 )
             else:
-                self.depth_subscriber = self.create_subscription(
+                self.depth_subscriber = self.create_stream_subscription(
+                    "realsense",
                     CompressedImage if use_compressed_image else Image,
                     "/camera/aligned_depth_to_color/image_raw"
                     + ("/compressedDepth" if use_compressed_image else ""),
                     self.realsense_depth_cb,
                     QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                    condition=lambda: self.realsense_depth_ar,
+                    latest_message="latest_realsense_depth_image",
                     callback_group=MutuallyExclusiveCallbackGroup(),
                 )
-            self.camera_info_subscriber = self.create_subscription(
+            self.camera_info_subscriber = self.create_stream_subscription(
+                "realsense",
                 CameraInfo,
                 "/camera/color/camera_info",
                 self.realsense_camera_info_cb,
@@ -287,11 +622,14 @@ class ConfigureVideoStreams(Node):
             self.latest_body_landmarks_str = None
             self.latest_body_landmarks_str_recv_time = None
             self.latest_body_landmarks_str_lock = threading.Lock()
-            self.body_landmarks_subscriber = self.create_subscription(
+            self.body_landmarks_subscriber = self.create_stream_subscription(
+                "realsense",
                 String,
                 "/human_estimates/latest_body_pose",
                 self.realsense_body_landmarks_cb,
                 QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                condition=lambda: self.realsense_body_pose_ar,
+                latest_message="latest_body_landmarks_str",
                 callback_group=MutuallyExclusiveCallbackGroup(),
             )
 
@@ -324,32 +662,57 @@ class ConfigureVideoStreams(Node):
             self.gripper_depth_ar = False
 
         self.roll_value = 0.0
+        self.gripper_aperture = None
 
-    # https://github.com/ros/geometry2/blob/noetic-devel/tf2_sensor_msgs/src/tf2_sensor_msgs/tf2_sensor_msgs.py#L44
-    def transform_to_kdl(self, t):
-        return PyKDL.Frame(
-            PyKDL.Rotation.Quaternion(
-                t.transform.rotation.x,
-                t.transform.rotation.y,
-                t.transform.rotation.z,
-                t.transform.rotation.w,
-            ),
-            PyKDL.Vector(
-                t.transform.translation.x,
-                t.transform.translation.y,
-                t.transform.translation.z,
-            ),
+    def create_stream_subscription(
+        self,
+        stream: str,
+        *args,
+        condition: Optional[Callable[[], bool]] = None,
+        latest_message: Optional[str] = None,
+        **kwargs,
+    ) -> Optional[Subscription]:
+        """
+        Subscribe to one of a stream's upstream topics. The arguments are the same
+        as `create_subscription`.
+
+        Parameters
+        ----------
+        stream: The stream the subscription is for.
+        condition: If subscriptions are on demand, the subscription additionally
+            only exists while this returns True. Otherwise, it is ignored.
+        latest_message: The name of the attribute that the subscription's callback
+            stores its latest message in, if any. If subscriptions are on demand, it
+            is cleared whenever the subscription is destroyed.
+
+        Returns
+        -------
+        Optional[Subscription]: The subscription, or None if it is managed on
+            demand by the stream's activator.
+        """
+        activator = self.stream_activators.get(stream, None)
+        if activator is None:
+            return self.create_subscription(*args, **kwargs)
+        on_destroy = None
+        if latest_message is not None:
+            on_destroy = functools.partial(self.clear_latest_message, latest_message)
+        activator.add_subscription(
+            *args, condition=condition, on_destroy=on_destroy, **kwargs
         )
+        return None
+
+    def update_stream_activators(self):
+        now = time.monotonic()
+        for activator in self.stream_activators.values():
+            activator.update(now)
 
-    # https://github.com/ros/geometry2/blob/noetic-devel/tf2_sensor_msgs/src/tf2_sensor_msgs/tf2_sensor_msgs.py#L52
-    def do_transform_cloud(self, cloud, transform):
-        t_kdl = self.transform_to_kdl(transform)
-        points_out = []
-        points = cloud.to_array()
-        for p_in in points:
-            p_out = t_kdl * PyKDL.Vector(p_in[0], p_in[1], p_in[2])
-            points_out.append([p_out[0], p_out[1], p_out[2]])
-        return np.array(points_out)
+    def clear_latest_message(self, name: str):
+        """
+        Clear one of the latest messages (e.g., "latest_realsense_depth_image"),
+        under its lock, once it is stale because its subscription was destroyed.
+        """
+        with getattr(self, f"{name}_lock"):
+            setattr(self, name, None)
 
     def realsense_camera_info_cb(self, msg):
         self.realsense_P = np.array(msg.p).reshape(3, 4)
@@ -362,49 +725,18 @@ class ConfigureVideoStreams(Node):
     def overlay_realsense_depth_ar(
         self,
         depth_msg: Union[CompressedImage, Image, PointCloud2],
-        img: npt.NDArray[np.uint8],
-    ):
+        frame: Frame,
+    ) -> Frame:
+        img = frame.image
         # Only keep points that are within 0.01m to 1.5m from the camera
         if self.realsense_P is None:
             self.get_logger().warn(
                 "Camera projection matrix is not available. Skipping point cloud processing."
             )
-            return img
-
-        if isinstance(depth_msg, (CompressedImage, Image)):
-            depth_image = ros_msg_to_cv2_image(depth_msg, self.cv_bridge)
-            pc_in_camera = depth_img_to_pointcloud(
-                depth_image,
-                f_x=self.realsense_P[0, 0],
-                f_y=self.realsense_P[1, 1],
-                c_x=self.realsense_P[0, 2],
-                c_y=self.realsense_P[1, 2],
-            )
-        else:
-            pc_in_camera = ros2_numpy.point_cloud2.pointcloud2_to_xyz_array(depth_msg)
-
-        pcl_cloud = pcl.PointCloud(np.array(pc_in_camera, dtype=np.float32))
-        # Filter by points that are within z_dist m of the camera.
-        z_dist = 1.5  # m
-        passthrough_z = pcl_cloud.make_passthrough_filter()
-        passthrough_z.set_filter_field_name("z")
-        passthrough_z.set_filter_limits(0.01, z_dist)
-        pcl_cloud_filtered = passthrough_z.filter()
-        # Downsample points using a VoxelGrid
-        if self.REALSENSE_DEPTH_AR_DOWNSAMPLE_DISTANCE > 0:
-            downsampler = pcl_cloud_filtered.make_voxel_grid_filter()
-            downsampler.set_leaf_size(
-                self.REALSENSE_DEPTH_AR_DOWNSAMPLE_DISTANCE,
-                self.REALSENSE_DEPTH_AR_DOWNSAMPLE_DISTANCE,
-                self.REALSENSE_DEPTH_AR_DOWNSAMPLE_DISTANCE,
-            )
-            pcl_cloud_filtered = downsampler.filter()
-        if not pcl_cloud_filtered:
-            return img
-        if pcl_cloud_filtered.to_array().size == 0:
-            return img
+            return frame
 
         # Get transform
+        self.update_shared_transforms()
         ok, transform = tf2_get_transform(
             self.tf_buffer,
             "base_link",
@@ -416,66 +748,89 @@ class ConfigureVideoStreams(Node):
                 "Could not find the transform between frames base_link and "
                 "camera_color_optical_frame."
             )
-            return img
-
-        # Transform point cloud to base link
-        pc_in_base_link = self.do_transform_cloud(pcl_cloud_filtered, transform)
-
-        # Only keep points that are between 0.25m and 1m from the base in the XY plane
-        dist = np.sqrt(
-            np.power(pc_in_base_link[:, 0], 2) + np.power(pc_in_base_link[:, 1], 2)
+            return frame
+
+        # Get the mask of pixels in the robot's reach, reusing the last mask if
+        # neither the depth nor the camera pose have changed since
+        stamp = (depth_msg.header.stamp.sec, depth_msg.header.stamp.nanosec)
+        pose = transform_to_matrix(transform)
+        overlay_mask = self.realsense_depth_ar_mask_cache.lookup(
+            stamp, img.shape[:2], pose=pose
         )
-        filtered_indices = np.where((dist > 0.25) & (dist < 1))[0]
-
-        # Get filtered points in camera frame
-        pts_in_range = pcl_cloud_filtered.to_array()[filtered_indices, :]
+        if overlay_mask is None:
+            overlay_mask = self.get_realsense_depth_ar_mask(
+                depth_msg, transform, img.shape
+            )
+            if overlay_mask is None:
+                return frame
+            self.realsense_depth_ar_mask_cache.store(
+                stamp, img.shape[:2], overlay_mask, pose=pose
+            )
+        if self.verbose:
+            self.get_logger().info(
+                f"Realsense depth AR mask cache: {self.realsense_depth_ar_mask_cache.hits} hits, "
+                f"{self.realsense_depth_ar_mask_cache.misses} misses",
+                throttle_duration_sec=5.0,
+            )
 
         # Change color of pixels in robot's reach
-        if img is not None:
-            # Get pixel coordinates
-            uv_mask = project_points_to_pixels(
-                pts_in_range,
-                self.realsense_P,
-                width=img.shape[1],
-                height=img.shape[0],
-            )
-            u_mask = uv_mask[:, 0]
-            v_mask = uv_mask[:, 1]
-
-            # Overlay the pixels in the robot's reach
-            overlay_mask = np.zeros((img.shape[0], img.shape[1]), dtype=np.uint8)
-            overlay_mask[v_mask, u_mask] = 255
-            overlay_mask = cv2.dilate(
-                overlay_mask,
-                np.ones(
-                    (
-                        self.REALSENSE_DEPTH_AR_EXPANSION_KERNEL_SIZE,
-                        self.REALSENSE_DEPTH_AR_EXPANSION_KERNEL_SIZE,
-                    ),
-                    np.uint8,
-                ),
-                iterations=1,
+        return frame.with_image(
+            self.realsense_depth_ar_blender.blend(
+                img, overlay_mask, channel_order=frame.channel_order
             )
-            overlay_img = np.tile(
-                self.REALSENSE_DEPTH_AR_COLOR, (img.shape[0], img.shape[1], 1)
-            )
-            overlaid_img = cv2.addWeighted(
-                img,
-                1 - self.REALSENSE_DEPTH_AR_ALPHA,
-                overlay_img,
-                self.REALSENSE_DEPTH_AR_ALPHA,
-                0,
+        )
+
+    def get_realsense_depth_ar_mask(
+        self,
+        depth_msg: Union[CompressedImage, Image, PointCloud2],
+        transform: TransformStamped,
+        img_shape: Tuple[int, ...],
+    ) -> Optional[npt.NDArray[np.uint8]]:
+        """
+        Get the mask of pixels in the robot's reach, using the configured overlay mode.
+
+        Parameters
+        ----------
+        depth_msg: The aligned depth image or the pointcloud.
+        transform: The transform from the camera frame to base_link.
+        img_shape: The shape of the image to overlay the mask on.
+
+        Returns
+        -------
+        Optional[npt.NDArray[np.uint8]]: The mask, or None if there are no points.
+        """
+        if isinstance(depth_msg, (CompressedImage, Image)):
+            depth_image = ros_msg_to_cv2_image(depth_msg, self.cv_bridge)
+            self.realsense_depth_deprojector.set_intrinsics(
+                f_x=self.realsense_P[0, 0],
+                f_y=self.realsense_P[1, 1],
+                c_x=self.realsense_P[0, 2],
+                c_y=self.realsense_P[1, 2],
+                shape=depth_image.shape,
             )
-            img = np.where(overlay_mask[:, :, None], overlaid_img, img)
-        return img
+            if self.realsense_depth_ar_mode == DepthAROverlayMode.IMAGE:
+                return get_reach_mask_from_depth_image(
+                    self.realsense_depth_deprojector, depth_image, transform, img_shape
+                )
+            pc_in_camera = self.realsense_depth_deprojector.deproject(depth_image)
+        else:
+            pc_in_camera = ros2_numpy.point_cloud2.pointcloud2_to_xyz_array(depth_msg)
+        return get_reach_mask_from_pointcloud(
+            pc_in_camera,
+            transform,
+            self.realsense_P,
+            img_shape,
+            leaf_size=self.REALSENSE_DEPTH_AR_DOWNSAMPLE_DISTANCE,
+            dilation_kernel_size=self.REALSENSE_DEPTH_AR_EXPANSION_KERNEL_SIZE,
+        )
 
     def overlay_realsense_body_pose_ar(
         self,
         body_landmarks_str: str,
         body_landmarks_str_recv_time: Time,
-        img: npt.NDArray[np.uint8],
+        frame: Frame,
         timeout_sec: float = 2.0,
-    ) -> npt.NDArray[np.uint8]:
+    ) -> Frame:
         """
         Overlay the detected body landmarks on the image.
 
@@ -485,21 +840,22 @@ class ConfigureVideoStreams(Node):
             The body landmarks as a JSON string.
         body_landmarks_str_recv_time : Time
             The time at which the body landmarks string was received.
-        img : np.ndarray
-            The image to overlay the body landmarks on.
+        frame : Frame
+            The frame to overlay the body landmarks on.
         timeout_sec : float, optional
             The maximum time for which the body landmark string is not considered stale.
 
         Returns
         -------
-        np.ndarray
-            The image with the body landmarks overlaid.
+        Frame
+            The frame with the body landmarks overlaid.
         """
+        img = frame.image
         if self.realsense_P is None:
             self.get_logger().warn(
                 "Camera projection matrix is not available. Skipping point cloud processing."
             )
-            return img
+            return frame
 
         if self.get_clock().now() - body_landmarks_str_recv_time > Duration(
             seconds=timeout_sec
@@ -508,7 +864,7 @@ class ConfigureVideoStreams(Node):
                 "Body landmarks are stale. Skipping body pose AR overlay.",
                 throttle_duration_sec=1.0,
             )
-            return img
+            return frame
 
         try:
             body_landmarks_xyz = json.loads(body_landmarks_str)
@@ -516,13 +872,13 @@ class ConfigureVideoStreams(Node):
             self.get_logger().warn(
                 f"Could not decode body landmarks: {repr(body_landmarks_str)}. {err}"
             )
-            return img
+            return frame
         self.get_logger().debug(f"Body landmarks: {repr(body_landmarks_xyz)}")
         if len(body_landmarks_xyz) == 0:
             self.get_logger().warn(
                 "No body landmarks detected.", throttle_duration_sec=1.0
             )
-            return img
+            return frame
         body_landmark_order = list(body_landmarks_xyz.keys())
 
         # Convert the 3D body landmarks to 2D pixel coordinates
@@ -530,31 +886,21 @@ class ConfigureVideoStreams(Node):
             [list(body_landmarks_xyz[name]) for name in body_landmark_order]
         )  # N x 3
         self.get_logger().debug(f"Body landmarks 3D: {body_landmarks_3d.shape}")
-        body_landmarks_2d = project_points_to_pixels(
-            body_landmarks_3d,
-            self.realsense_P,
-            width=img.shape[1],
-            height=img.shape[0],
-        )
 
-        # Overlay circles on the detected body landmarks
-        overlay_mask = np.zeros((img.shape[0], img.shape[1]), dtype=np.uint8)
-        radius = min(img.shape[0], img.shape[1]) // 40
-        for u, v in body_landmarks_2d:
-            overlay_mask = cv2.circle(overlay_mask, (u, v), radius, (255,), -1)
-        overlay_img = np.tile(
-            self.REALSENSE_BODY_LANDMARKS_AR_COLOR, (img.shape[0], img.shape[1], 1)
+        # Overlay circles on the detected body landmarks. Only draw and blend the
+        # region of the image that the circles cover.
+        mask_and_roi = get_body_landmarks_mask(
+            body_landmarks_3d, self.realsense_P, img.shape
         )
-        overlaid_img = cv2.addWeighted(
-            img,
-            1 - self.REALSENSE_BODY_LANDMARKS_AR_ALPHA,
-            overlay_img,
-            self.REALSENSE_BODY_LANDMARKS_AR_ALPHA,
-            0,
-        )
-        img = np.where(overlay_mask[:, :, None], overlaid_img, img)
+        if mask_and_roi is None:
+            return frame
+        overlay_mask, roi = mask_and_roi
 
-        return img
+        return frame.with_image(
+            self.realsense_body_pose_ar_blender.blend(
+                img, overlay_mask, roi=roi, channel_order=frame.channel_order
+            )
+        )
 
     def realsense_depth_ar_callback(self, req, res):
         self.get_logger().info(f"Realsense depth AR service: {req.data}")
@@ -580,109 +926,283 @@ class ConfigureVideoStreams(Node):
         res.success = True
         return res
 
-    def crop_image(self, image, params):
-        if params["x_min"] is None:
-            raise ValueError("Crop x_min is not defined!")
-        if params["x_max"] is None:
-            raise ValueError("Crop x_max is not defined!")
-        if params["y_min"] is None:
-            raise ValueError("Crop y_min is not defined!")
-        if params["y_max"] is None:
-            raise ValueError("Crop y_max is not defined!")
-
-        x_min = params["x_min"]
-        x_max = params["x_max"]
-        y_min = params["y_min"]
-        y_max = params["y_max"]
-        width = x_max - x_min
-        height = y_max - y_min
-
-        # It is possible that the "crop" expands the image beyond its original dimensions.
-        # Hence, we create a new image and fill it with a constant value for the background.
-        background_color = (
-            self.BACKGROUND_COLOR
-            if image.shape[-1] == 3
-            else (*self.BACKGROUND_COLOR, 255)
-        )
-        cropped_image = (
-            np.repeat(background_color, width * height, axis=0)
-            .reshape(height, width, image.shape[-1])
-            .astype(np.uint8)
+    def get_perspective_transform(
+        self,
+        stream: str,
+        perspective: str,
+        input_shape: Tuple[int, ...],
+        source_size: Optional[Tuple[int, int]] = None,
+        source_origin: Tuple[int, int] = (0, 0),
+        scale: float = 1.0,
+    ) -> PerspectiveTransform:
+        """
+        Get the compiled transform for a perspective, compiling it the first
+        time a stream's perspective sees an image of the given shape (and region
+        and scale of the source image).
+
+        Parameters
+        ----------
+        stream: The stream's key in the params file (e.g., "realsense").
+        perspective: The perspective's key within the stream (e.g., "default").
+        input_shape: The shape of the images the transform will be applied to.
+        source_size: The (width, height) of the source image. If None, the input
+            images are the source images.
+        source_origin: The (x, y) of the input's top-left corner in the source image.
+        scale: The scale of the input images relative to the source image.
+
+        Returns
+        -------
+        PerspectiveTransform: The compiled transform.
+        """
+        key = (
+            stream,
+            perspective,
+            tuple(input_shape),
+            source_size,
+            tuple(source_origin),
+            scale,
         )
+        perspective_transform = self.perspective_transforms.get(key, None)
+        if perspective_transform is None:
+            perspective_transform = PerspectiveTransform(
+                self.image_params[stream][perspective],
+                input_shape,
+                self.BACKGROUND_COLOR,
+                source_size,
+                source_origin,
+                scale,
+            )
+            self.perspective_transforms[key] = perspective_transform
+        return perspective_transform
 
-        # x and y are swapped, since the first index is the rows (y) and the second index is the columns (x)
-        cropped_image[
-            max(-y_min, 0) : min(height - (y_max - image.shape[0]), height),
-            max(-x_min, 0) : min(width - (x_max - image.shape[1]), width),
-        ] = image[
-            max(y_min, 0) : min(y_max, image.shape[0]),
-            max(x_min, 0) : min(x_max, image.shape[1]),
-        ]
-        return cropped_image
+    def get_jpeg_encoder(self, stream: str, perspective: str) -> JPEGEncoder:
+        """
+        Get the JPEG encoder for a perspective, configured by the perspective's
+        (optional) "encoding" parameters. If they are invalid, or not supported
+        in this environment, log an error and use the default encoder.
+
+        Parameters
+        ----------
+        stream: The stream's key in the params file (e.g., "realsense").
+        perspective: The perspective's key within the stream (e.g., "default").
+
+        Returns
+        -------
+        JPEGEncoder: The encoder.
+        """
+        key = (stream, perspective)
+        jpeg_encoder = self.jpeg_encoders.get(key, None)
+        if jpeg_encoder is None:
+            params = (self.image_params.get(stream, None) or {}).get(perspective, None)
+            try:
+                jpeg_encoder = JPEGEncoder.from_params(
+                    params.get("encoding", None) if params else None
+                )
+            except (ValueError, NotImplementedError) as err:
+                self.get_logger().error(
+                    f"Invalid encoding for {stream} perspective {perspective}: {err}. "
+                    "Using the default encoding."
+                )
+                jpeg_encoder = JPEGEncoder()
+            self.jpeg_encoders[key] = jpeg_encoder
+        return jpeg_encoder
+
+    def get_lossless_jpeg_transform(
+        self, stream: str, perspective: str
+    ) -> Optional[LosslessJPEGTransform]:
+        """
+        Get the lossless JPEG transform for a perspective.
+
+        Parameters
+        ----------
+        stream: The stream's key in the params file (e.g., "realsense").
+        perspective: The perspective's key within the stream (e.g., "default").
+
+        Returns
+        -------
+        Optional[LosslessJPEGTransform]: The transform, or None if the perspective
+            cannot be applied losslessly.
+        """
+        key = (stream, perspective)
+        if key not in self.lossless_jpeg_transforms:
+            lossless_jpeg_transform = LosslessJPEGTransform(
+                self.image_params[stream][perspective]
+            )
+            self.lossless_jpeg_transforms[key] = (
+                lossless_jpeg_transform
+                if lossless_jpeg_transform.is_supported
+                else None
+            )
+        return self.lossless_jpeg_transforms[key]
+
+    def publish_lossless_jpeg_perspectives(
+        self,
+        rgb_ros_image: CompressedImage,
+        stream: str,
+        perspectives_to_render: Dict[str, List[Publisher]],
+    ) -> Tuple[Dict[str, List[Publisher]], int]:
+        """
+        Publish the perspectives that can be applied directly to the JPEG.
+
+        Parameters
+        ----------
+        rgb_ros_image: The compressed image.
+        stream: The stream's key in the params file (e.g., "realsense").
+        perspectives_to_render: A map from perspective name to its publishers.
+
+        Returns
+        -------
+        Dict[str, List[Publisher]]: The perspectives that still have to be rendered
+            from the decoded image.
+        int: The total number of bytes published.
+        """
+        remaining_perspectives = {}
+        num_bytes = 0
+        for image_config_name, publishers in perspectives_to_render.items():
+            lossless_jpeg_transform = self.get_lossless_jpeg_transform(
+                stream, image_config_name
+            )
+            if lossless_jpeg_transform is None:
+                remaining_perspectives[image_config_name] = publishers
+                continue
+            with self.measure_stage(stream, "transform"):
+                jpeg = lossless_jpeg_transform.apply(bytes(rgb_ros_image.data))
+            if jpeg is None:
+                remaining_perspectives[image_config_name] = publishers
+                continue
+            msg = CompressedImage(format="jpeg")
+            msg.header.stamp = rgb_ros_image.header.stamp
+            msg.data = array.array("B", jpeg)
+            with self.measure_stage(stream, "publish"):
+                for publisher in publishers:
+                    publisher.publish(msg)
+            num_bytes += len(jpeg) * len(publishers)
+        return remaining_perspectives, num_bytes
+
+    def decode_image(
+        self,
+        ros_image: Union[CompressedImage, Image],
+        stream: str,
+        perspectives: List[Tuple[str, str]],
+        full_resolution: bool = False,
+    ) -> Tuple[Frame, Dict]:
+        """
+        Convert a stream's image message to a frame. If partial JPEG decoding
+        is enabled, only decode the region of the JPEG that the perspectives crop,
+        at the lowest scale that the stream's output scale needs.
 
-    # https://stackoverflow.com/questions/44865023/how-can-i-create-a-circular-mask-for-a-numpy-array
-    def create_circular_mask(self, h, w, center=None, radius=None):
-        if center is None:  # use the middle of the image
-            center = (int(w / 2), int(h / 2))
+        Parameters
+        ----------
+        ros_image: The image message.
+        stream: The stream (e.g., "gripper"), for its adaptive output scale.
+        perspectives: The (stream key in the params file, perspective) of every
+            perspective that will be rendered from the image.
+        full_resolution: If True, decode the whole image at full resolution
+            (e.g., because an overlay will be drawn on it).
+
+        Returns
+        -------
+        Frame: The frame, in the image's own channel order.
+        Dict: The keyword arguments for `configure_images` that describe the
+            region and scale of the source image that the frame covers.
+        """
+        source_size = None
         if (
-            radius is None
-        ):  # use the smallest distance between the center and image walls
-            radius = min(center[0], center[1], w - center[0], h - center[1])
-
-        Y, X = np.ogrid[:h, :w]
-        dist_from_center = np.sqrt((X - center[0]) ** 2 + (Y - center[1]) ** 2)
-
-        mask = dist_from_center <= radius
-        return mask
-
-    def mask_image(self, image, params):
-        if params["width"] is None:
-            raise ValueError("Mask width is not defined!")
-        if params["height"] is None:
-            raise ValueError("Mask height is not defined!")
-
-        w = params["width"]
-        h = params["height"]
-        center = (
-            (params["center"]["x"], params["center"]["y"]) if params["center"] else None
+            self.partial_jpeg_decode
+            and not full_resolution
+            and isinstance(ros_image, CompressedImage)
+            and "jpeg" in ros_image.format.lower()
+        ):
+            source_size = JPEGDecoder.get_size(ros_image.data)
+        if source_size is None:
+            frame = ros_msg_to_frame(ros_image, self.cv_bridge)
+            return frame, self.get_uvc_source_region(stream, frame.image.shape)
+
+        # The region that the perspectives need, if they all crop
+        roi = get_perspectives_roi(
+            [
+                self.image_params[stream_key][perspective]
+                for stream_key, perspective in perspectives
+            ]
         )
-        radius = params["radius"]
-
-        mask = self.create_circular_mask(h, w, center, radius)
-        img = image.copy()
-        background_color = (
-            self.BACKGROUND_COLOR
-            if image.shape[-1] == 3
-            else (*self.BACKGROUND_COLOR, 255)
+
+        controller = self.bitrate_controllers.get(stream, None)
+        scale_denominator = JPEGDecoder.get_scale_denominator(
+            controller.scale if controller is not None else 1.0
         )
-        img[~mask] = background_color
-        return img
-
-    def rotate_image(self, image, value):
-        if value == "ROTATE_90_CLOCKWISE":
-            return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
-        elif value == "ROTATE_180":
-            return cv2.rotate(image, cv2.ROTATE_180)
-        elif value == "ROTATE_90_COUNTERCLOCKWISE":
-            return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
-        else:
-            raise ValueError(
-                "Invalid rotate image value: options are ROTATE_90_CLOCKWISE, ROTATE_180, or ROTATE_90_COUNTERCLOCKWISE"
-            )
+        image, source_origin = self.jpeg_decoder.decode(
+            ros_image.data, roi, scale_denominator
+        )
+        return Frame(image, ChannelOrder.BGR), {
+            "source_size": source_size,
+            "source_origin": source_origin,
+            "scale": 1.0 / scale_denominator,
+        }
+
+    def uvc_camera_info_cb(self, stream: str, camera_info: CameraInfo) -> None:
+        """
+        Record the region (ROI) and scale (binning) of the camera image that a UVC
+        camera node publishes, if it crops and/or bins its images.
+
+        Parameters
+        ----------
+        stream: The stream the camera is for (e.g., "overhead").
+        camera_info: The camera info.
+        """
+        binning = max(camera_info.binning_x, 1)
+        roi = camera_info.roi
+        width = roi.width if roi.width > 0 else camera_info.width
+        height = roi.height if roi.height > 0 else camera_info.height
+        self.uvc_source_regions[stream] = (
+            (height // binning, width // binning),
+            {
+                "source_size": (camera_info.width, camera_info.height),
+                "source_origin": (roi.x_offset, roi.y_offset),
+                "scale": 1.0 / binning,
+            },
+        )
+
+    def get_uvc_source_region(self, stream: str, shape: Tuple[int, ...]) -> Dict:
+        """
+        Get the `configure_images` keyword arguments that describe the region and
+        scale of the camera image that a stream's image covers, if its UVC camera
+        node crops and/or bins its images.
+
+        Parameters
+        ----------
+        stream: The stream (e.g., "overhead").
+        shape: The shape of the stream's image. Images that are not the size of
+            the camera info's region (e.g., the uncropped compressed images)
+            cover the whole camera image.
 
-    def configure_images(self, rgb_image, params):
-        color_transform = (
-            cv2.COLOR_BGR2RGB if rgb_image.shape[-1] == 3 else cv2.COLOR_BGRA2RGBA
+        Returns
+        -------
+        Dict: The keyword arguments, which are empty for the whole camera image.
+        """
+        source_region = self.uvc_source_regions.get(stream, None)
+        if source_region is None or source_region[0] != tuple(shape[:2]):
+            return {}
+        return source_region[1]
+
+    def configure_images(
+        self,
+        frame: Frame,
+        stream,
+        perspective,
+        source_size: Optional[Tuple[int, int]] = None,
+        source_origin: Tuple[int, int] = (0, 0),
+        scale: float = 1.0,
+    ) -> Frame:
+        return frame.with_image(
+            self.get_perspective_transform(
+                stream,
+                perspective,
+                frame.image.shape,
+                source_size,
+                source_origin,
+                scale,
+            ).apply(frame.image)
         )
-        rgb_image = cv2.cvtColor(rgb_image, color_transform)
-        if params:
-            if params["crop"]:
-                rgb_image = self.crop_image(rgb_image, params["crop"])
-            if params["mask"]:
-                rgb_image = self.mask_image(rgb_image, params["mask"])
-            if params["rotate"]:
-                rgb_image = self.rotate_image(rgb_image, params["rotate"])
-        return rgb_image
 
     def realsense_depth_cb(
         self,
@@ -715,6 +1235,8 @@ class ConfigureVideoStreams(Node):
             )
 
         with self.latest_realsense_rgb_image_lock:
+            if self.latest_realsense_rgb_image is not None:
+                self.record_dropped_frame("realsense")
             self.latest_realsense_rgb_image = rgb_ros_image
 
     def realsense_body_landmarks_cb(self, msg):
@@ -722,43 +1244,113 @@ class ConfigureVideoStreams(Node):
             self.latest_body_landmarks_str_recv_time = self.get_clock().now()
             self.latest_body_landmarks_str = msg.data
 
+    def get_realsense_perspectives_to_render(self) -> Dict[str, List[Publisher]]:
+        """
+        Get the realsense perspectives that currently have subscribers, along with
+        the publishers that each perspective should be published on.
+
+        The currently selected perspective is published on the main realsense topic,
+        and every configured perspective is published on its own topic.
+
+        Returns
+        -------
+        Dict[str, List[Publisher]]: A map from perspective name to the publishers
+            with subscribers for that perspective.
+        """
+        perspectives_to_render = {}
+        for image_config_name in self.publishers_realsense_perspective_cmp:
+            publisher = self.publishers_realsense_perspective_cmp[image_config_name]
+            publishers = []
+            if publisher.get_subscription_count() > 0:
+                publishers.append(publisher)
+            if (
+                image_config_name == self.realsense_camera_perspective
+                and self.publisher_realsense_cmp.get_subscription_count() > 0
+            ):
+                publishers.append(self.publisher_realsense_cmp)
+            if len(publishers) > 0:
+                perspectives_to_render[image_config_name] = publishers
+        return perspectives_to_render
+
     def process_realsense_image(
         self,
         rgb_ros_image: Union[CompressedImage, Image],
     ):
-        image = ros_msg_to_cv2_image(rgb_ros_image, self.cv_bridge)
-        if isinstance(rgb_ros_image, CompressedImage):
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        for image_config_name in self.realsense_params:
-            # Perform overlays *before* cropping/masking/rotating the image,
-            # for consistent (de)projection and transformations
-            if self.realsense_depth_ar:
-                with self.latest_realsense_depth_image_lock:
-                    depth_msg = self.latest_realsense_depth_image
-                image = self.overlay_realsense_depth_ar(depth_msg, image)
-            if self.realsense_body_pose_ar:
-                with self.latest_body_landmarks_str_lock:
-                    body_landmarks_str = self.latest_body_landmarks_str
-                    body_landmarks_str_recv_time = (
-                        self.latest_body_landmarks_str_recv_time
-                    )
-                if body_landmarks_str is not None and len(body_landmarks_str) > 0:
-                    image = self.overlay_realsense_body_pose_ar(
-                        body_landmarks_str, body_landmarks_str_recv_time, image
+        # Only render and encode the perspectives that someone is watching
+        perspectives_to_render = self.get_realsense_perspectives_to_render()
+        if len(perspectives_to_render) == 0:
+            return
+        if not self.should_process_frame("realsense"):
+            return
+
+        num_bytes = 0
+        if (
+            self.lossless_jpeg_transforms_enabled
+            and isinstance(rgb_ros_image, CompressedImage)
+            and "jpeg" in rgb_ros_image.format.lower()
+            and not self.realsense_depth_ar
+            and not self.realsense_body_pose_ar
+            and "realsense" not in self.bitrate_controllers
+        ):
+            perspectives_to_render, num_bytes = self.publish_lossless_jpeg_perspectives(
+                rgb_ros_image, "realsense", perspectives_to_render
+            )
+            if len(perspectives_to_render) == 0:
+                self.record_published_frame(
+                    "realsense", num_bytes, rgb_ros_image.header
+                )
+                return
+
+        with self.measure_stage("realsense", "decode"):
+            frame, source_region = self.decode_image(
+                rgb_ros_image,
+                "realsense",
+                [("realsense", perspective) for perspective in perspectives_to_render],
+                full_resolution=self.realsense_depth_ar or self.realsense_body_pose_ar,
+            )
+
+        # Perform overlays *before* cropping/masking/rotating the image,
+        # for consistent (de)projection and transformations. The overlays
+        # are shared by all perspectives, so only compute them once.
+        if self.realsense_depth_ar:
+            with self.latest_realsense_depth_image_lock:
+                depth_msg = self.latest_realsense_depth_image
+            if depth_msg is not None:
+                with self.measure_stage("realsense", "overlay"):
+                    frame = self.overlay_realsense_depth_ar(depth_msg, frame)
+        if self.realsense_body_pose_ar:
+            with self.latest_body_landmarks_str_lock:
+                body_landmarks_str = self.latest_body_landmarks_str
+                body_landmarks_str_recv_time = self.latest_body_landmarks_str_recv_time
+            if body_landmarks_str is not None and len(body_landmarks_str) > 0:
+                with self.measure_stage("realsense", "overlay"):
+                    frame = self.overlay_realsense_body_pose_ar(
+                        body_landmarks_str, body_landmarks_str_recv_time, frame
                     )
-            img = self.configure_images(image, self.realsense_params[image_config_name])
-            # if self.aruco_markers: img = self.aruco_markers_callback(marker_msg, img)
-            self.realsense_images[image_config_name] = img
 
-        self.realsense_rgb_image = self.realsense_images[
-            self.realsense_camera_perspective
-        ]
-        self.publish_compressed_msg(
-            self.realsense_rgb_image, self.publisher_realsense_cmp, rgb_ros_image.header
-        )
+        for image_config_name, publishers in perspectives_to_render.items():
+            with self.measure_stage("realsense", "transform"):
+                img = self.configure_images(
+                    frame, "realsense", image_config_name, **source_region
+                )
+            # if self.aruco_markers: img = self.aruco_markers_callback(marker_msg, img)
+            self.realsense_images[image_config_name] = img.image
+            if image_config_name == self.realsense_camera_perspective:
+                self.realsense_rgb_image = img.image
+            num_bytes += self.publish_compressed_msg(
+                img,
+                publishers,
+                rgb_ros_image.header,
+                self.get_jpeg_encoder("realsense", image_config_name),
+                stream="realsense",
+                image_scale=source_region.get("scale", 1.0),
+            )
+        self.record_published_frame("realsense", num_bytes, rgb_ros_image.header)
 
     def gripper_camera_cb(self, ros_image):
         with self.latest_gripper_camera_rgb_image_lock:
+            if self.latest_gripper_camera_rgb_image is not None:
+                self.record_dropped_frame("gripper")
             self.latest_gripper_camera_rgb_image = ros_image
 
     def gripper_realsense_depth_cb(
@@ -793,209 +1385,167 @@ class ConfigureVideoStreams(Node):
             )
 
         with self.latest_gripper_camera_rgb_image_lock:
+            if self.latest_gripper_camera_rgb_image is not None:
+                self.record_dropped_frame("gripper")
             self.latest_gripper_camera_rgb_image = ros_image
 
     def process_gripper_image(
         self,
         ros_image: Union[CompressedImage, Image],
     ):
-        image = ros_msg_to_cv2_image(ros_image, self.cv_bridge)
-        if isinstance(ros_image, CompressedImage):
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        else:
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if not self.should_process_frame("gripper"):
+            return
+        # The service may toggle this while the image is processed
+        expanded_gripper = self.expanded_gripper
+        stream_key = "expandedGripper" if expanded_gripper else "gripper"
+        with self.measure_stage("gripper", "decode"):
+            frame, source_region = self.decode_image(
+                ros_image,
+                "gripper",
+                [(stream_key, self.gripper_camera_perspective)],
+                full_resolution=self.gripper_depth_ar,
+            )
 
         if self.gripper_depth_ar:
             with self.latest_gripper_realsense_depth_image_lock:
                 depth_msg = self.latest_gripper_realsense_depth_image
             if depth_msg is not None:
-                image = self.overlay_gripper_depth_ar(image, depth_msg)
+                with self.measure_stage("gripper", "overlay"):
+                    frame = self.overlay_gripper_depth_ar(frame, depth_msg)
 
-        if self.expanded_gripper:
+        if expanded_gripper:
             # Compute and publish the expanded gripper image
-            gripper_camera_rgb_image = self.configure_images(
-                image, self.expanded_gripper_params[self.gripper_camera_perspective]
-            )
-            self.gripper_camera_rgb_image = self.rotate_image_around_center(
-                gripper_camera_rgb_image, -1 * self.roll_value
-            )
-            self.publish_compressed_msg(
-                self.gripper_camera_rgb_image,
+            with self.measure_stage("gripper", "transform"):
+                gripper_camera_frame = self.configure_images(
+                    frame,
+                    "expandedGripper",
+                    self.gripper_camera_perspective,
+                    **source_region,
+                )
+                self.gripper_camera_rgb_image = self.rotate_image_around_center(
+                    gripper_camera_frame.image, -1 * self.roll_value
+                )
+            num_bytes = self.publish_compressed_msg(
+                gripper_camera_frame.with_image(self.gripper_camera_rgb_image),
                 self.publisher_gripper_cmp,
                 ros_image.header,
+                self.get_jpeg_encoder(
+                    "expandedGripper", self.gripper_camera_perspective
+                ),
+                stream="gripper",
+                image_scale=source_region.get("scale", 1.0),
             )
         else:
             # Compute and publish the standard gripper image
-            gripper_camera_rgb_image = self.configure_images(
-                image, self.gripper_params[self.gripper_camera_perspective]
-            )
-            self.gripper_camera_rgb_image = self.rotate_image_around_center(
-                gripper_camera_rgb_image, -1 * self.roll_value
-            )
-            self.publish_compressed_msg(
-                self.gripper_camera_rgb_image,
+            with self.measure_stage("gripper", "transform"):
+                gripper_camera_frame = self.configure_images(
+                    frame, "gripper", self.gripper_camera_perspective, **source_region
+                )
+                self.gripper_camera_rgb_image = self.rotate_image_around_center(
+                    gripper_camera_frame.image, -1 * self.roll_value
+                )
+            num_bytes = self.publish_compressed_msg(
+                gripper_camera_frame.with_image(self.gripper_camera_rgb_image),
                 self.publisher_gripper_cmp,
                 ros_image.header,
+                self.get_jpeg_encoder("gripper", self.gripper_camera_perspective),
+                stream="gripper",
+                image_scale=source_region.get("scale", 1.0),
             )
+        self.record_published_frame("gripper", num_bytes, ros_image.header)
 
     def overlay_gripper_depth_ar(
-        self, image: npt.NDArray, depth_msg: Union[CompressedImage, Image, PointCloud2]
-    ) -> npt.NDArray:
+        self, frame: Frame, depth_msg: Union[CompressedImage, Image, PointCloud2]
+    ) -> Frame:
         """
         Overlays points within the graspable region of the gripper in the depth image.
 
         Note that this method does not require extrinsics calibration between the camera and the gripper,
         because it utilizes the aruco markers on the gripper.
         """
+        image = frame.image
         if self.gripper_P is None:
             self.get_logger().warn(
                 "Gripper camera projection matrix is not available. Skipping point cloud processing."
             )
-            return image
+            return frame
+
+        # Get the mask of pixels in the gripper's graspable region, reusing the
+        # last mask if neither the depth nor the gripper aperture have changed since
+        stamp = (depth_msg.header.stamp.sec, depth_msg.header.stamp.nanosec)
+        state = (
+            None if self.gripper_aperture is None else np.array([self.gripper_aperture])
+        )
+        overlay_mask = self.gripper_depth_ar_mask_cache.lookup(
+            stamp, image.shape[:2], state=state
+        )
+        if overlay_mask is None:
+            overlay_mask = self.get_gripper_depth_ar_mask(image, depth_msg)
+            if overlay_mask is None:
+                return frame
+            self.gripper_depth_ar_mask_cache.store(
+                stamp, image.shape[:2], overlay_mask, state=state
+            )
+        if self.verbose:
+            self.get_logger().info(
+                f"Gripper depth AR mask cache: {self.gripper_depth_ar_mask_cache.hits} hits, "
+                f"{self.gripper_depth_ar_mask_cache.misses} misses",
+                throttle_duration_sec=5.0,
+            )
+
+        return frame.with_image(
+            self.gripper_depth_ar_blender.blend(
+                image, overlay_mask, channel_order=frame.channel_order
+            )
+        )
+
+    def get_gripper_depth_ar_mask(
+        self, image: npt.NDArray, depth_msg: Union[CompressedImage, Image, PointCloud2]
+    ) -> Optional[npt.NDArray[np.uint8]]:
+        """
+        Get the mask of pixels within the graspable region of the gripper, by
+        locating the fingers' aruco markers in the image.
+
+        Parameters
+        ----------
+        image: The gripper camera's RGB image.
+        depth_msg: The aligned depth image or the pointcloud.
 
+        Returns
+        -------
+        Optional[npt.NDArray[np.uint8]]: The mask, or None if it could not be computed.
+        """
         # Load the depth image
         if isinstance(depth_msg, (CompressedImage, Image)):
             depth_image = ros_msg_to_cv2_image(depth_msg, self.cv_bridge)
-            pc_in_camera = depth_img_to_pointcloud(
-                depth_image,
+            self.gripper_depth_deprojector.set_intrinsics(
                 f_x=self.gripper_P[0, 0],
                 f_y=self.gripper_P[1, 1],
                 c_x=self.gripper_P[0, 2],
                 c_y=self.gripper_P[1, 2],
+                shape=depth_image.shape,
             )
+            pc_in_camera = self.gripper_depth_deprojector.deproject(depth_image)
         else:
             pc_in_camera = ros2_numpy.point_cloud2.pointcloud2_to_xyz_array(depth_msg)
 
-        # Filter the pointcloud to only nearby points, to lower its size
-        pcl_cloud = pcl.PointCloud(np.array(pc_in_camera, dtype=np.float32))
-        passthrough = pcl_cloud.make_passthrough_filter()
-        passthrough.set_filter_field_name("z")
-        passthrough.set_filter_limits(0.01, 0.3)
-        pcl_cloud_filtered = passthrough.filter()
-
-        # Downsample points using a VoxelGrid
-        if self.GRIPPER_DEPTH_AR_DOWNSAMPLE_DISTANCE > 0:
-            downsampler = pcl_cloud_filtered.make_voxel_grid_filter()
-            downsampler.set_leaf_size(
-                self.GRIPPER_DEPTH_AR_DOWNSAMPLE_DISTANCE,
-                self.GRIPPER_DEPTH_AR_DOWNSAMPLE_DISTANCE,
-                self.GRIPPER_DEPTH_AR_DOWNSAMPLE_DISTANCE,
-            )
-            pcl_cloud_filtered = downsampler.filter()
-        pc_in_camera_filtered = pcl_cloud_filtered.to_array()
-        if pc_in_camera_filtered.shape[0] == 0:
-            self.get_logger().debug(
-                "No points in the gripper's depth image. Skipping point cloud processing.",
-                throttle_duration_sec=1.0,
-            )
-            return image
-
-        # Create the Aruco Detector
         if self.aruco_detector is None:
-            aruco_parameters = cv2.aruco.DetectorParameters()
-            aruco_parameters.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
-            aruco_dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_250)
-            self.aruco_detector = cv2.aruco.ArucoDetector(
-                aruco_dictionary, aruco_parameters
-            )
-
-        # Detect the gripper markers
-        corners, ids, _ = self.aruco_detector.detectMarkers(image)
-        if ids is None:
-            self.get_logger().debug(
-                "Did not detect any aruco markers on the gripper. Skipping point cloud processing.",
-                throttle_duration_sec=1.0,
-            )
-            return image
-        aruco_center_pos = {}
-        for label, aruco_id in self.gripper_aruco_ids.items():
-            if aruco_id in ids:
-                # Update the crop corners
-                idx = np.argmax(ids == aruco_id)
-                aruco_corners = corners[idx][0]
-                center = np.mean(aruco_corners, axis=0)
-                aruco_center_pos[label] = deproject_pixel_to_pointcloud_point(
-                    center[0], center[1], pc_in_camera_filtered, self.gripper_P
-                )
-                if aruco_center_pos[label] is None:
-                    self.get_logger().warn(
-                        f"Could not deproject the center of aruco marker {label}. Skipping point cloud processing."
-                    )
-                    return image
-        if (
-            "finger_left" not in aruco_center_pos
-            or "finger_right" not in aruco_center_pos
-        ):
-            self.get_logger().debug(
-                "Did not detect both aruco markers on the gripper. Skipping point cloud processing.",
-                throttle_duration_sec=1.0,
-            )
-            return image
-
-        # Filter the points to those in the range. Note that (x, y, z) is in the
-        # camera frame (e.g., +z out of camera, +x to the left of camera, +y up)
-        left_x, left_y, left_z = aruco_center_pos["finger_left"]
-        right_x, right_y, right_z = aruco_center_pos["finger_right"]
-        # Filter points within the distance range. Add a depth offset of 5cm to
-        # account for the offset between the aruco marker and the gripper tip.
-        z_offset_m = 0.04
-        passthrough_z = pcl_cloud_filtered.make_passthrough_filter()
-        passthrough_z.set_filter_field_name("z")
-        passthrough_z.set_filter_limits(0.01, max(left_z, right_z) + z_offset_m)
-        pcl_cloud_filtered = passthrough_z.filter()
-        # Filter points within the x range
-        passthrough_x = pcl_cloud_filtered.make_passthrough_filter()
-        passthrough_x.set_filter_field_name("x")
-        passthrough_x.set_filter_limits(left_x, right_x)
-        pcl_cloud_filtered = passthrough_x.filter()
-        # Filter points within the y range
-        y_offset_m = 0.02
-        passthrough_y = pcl_cloud_filtered.make_passthrough_filter()
-        passthrough_y.set_filter_field_name("y")
-        passthrough_y.set_filter_limits(
-            min(left_y, right_y) - y_offset_m, max(left_y, right_y) + y_offset_m
-        )
-        pcl_cloud_filtered = passthrough_y.filter()
-
-        # Convert filtered points to (u, v) indices
-        pts_in_range = pcl_cloud_filtered.to_array()
-        uv_mask = project_points_to_pixels(
-            pts_in_range,
+            self.aruco_detector = create_aruco_detector()
+        overlay_mask, reason = get_graspable_region_mask(
+            image,
+            pc_in_camera,
             self.gripper_P,
-            width=image.shape[1],
-            height=image.shape[0],
+            self.aruco_detector,
+            self.gripper_aruco_ids,
+            leaf_size=self.GRIPPER_DEPTH_AR_DOWNSAMPLE_DISTANCE,
+            dilation_kernel_size=self.GRIPPER_DEPTH_AR_EXPANSION_KERNEL_SIZE,
         )
-        u_mask = uv_mask[:, 0]
-        v_mask = uv_mask[:, 1]
-
-        # Overlay the pixels in the robot's reach
-        overlay_mask = np.zeros((image.shape[0], image.shape[1]), dtype=np.uint8)
-        overlay_mask[v_mask, u_mask] = 255
-        if self.GRIPPER_DEPTH_AR_EXPANSION_KERNEL_SIZE > 1:
-            overlay_mask = cv2.dilate(
-                overlay_mask,
-                np.ones(
-                    (
-                        self.GRIPPER_DEPTH_AR_EXPANSION_KERNEL_SIZE,
-                        self.GRIPPER_DEPTH_AR_EXPANSION_KERNEL_SIZE,
-                    ),
-                    np.uint8,
-                ),
-                iterations=1,
+        if overlay_mask is None:
+            self.get_logger().debug(
+                f"{reason} Skipping point cloud processing.",
+                throttle_duration_sec=1.0,
             )
-        overlay_image = np.tile(
-            self.GRIPPER_DEPTH_AR_COLOR, (image.shape[0], image.shape[1], 1)
-        )
-        overlaid_image = cv2.addWeighted(
-            image,
-            1 - self.GRIPPER_DEPTH_AR_ALPHA,
-            overlay_image,
-            self.GRIPPER_DEPTH_AR_ALPHA,
-            0,
-        )
-        image = np.where(overlay_mask[:, :, None], overlaid_image, image)
-
-        return image
+        return overlay_mask
 
     def navigation_camera_cb(self, ros_image):
         if self.verbose:
@@ -1009,71 +1559,499 @@ class ConfigureVideoStreams(Node):
             )
 
         with self.latest_overhead_camera_rgb_image_lock:
+            if self.latest_overhead_camera_rgb_image is not None:
+                self.record_dropped_frame("overhead")
             self.latest_overhead_camera_rgb_image = ros_image
 
     def process_navigation_image(self, ros_image):
-        image = ros_msg_to_cv2_image(ros_image, self.cv_bridge)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        self.overhead_camera_rgb_image = self.configure_images(
-            image, self.overhead_params[self.overhead_camera_perspective]
-        )
-        self.publish_compressed_msg(
-            self.overhead_camera_rgb_image,
+        if not self.should_process_frame("overhead"):
+            return
+        with self.measure_stage("overhead", "decode"):
+            frame, source_region = self.decode_image(
+                ros_image,
+                "overhead",
+                [("overhead", self.overhead_camera_perspective)],
+            )
+        with self.measure_stage("overhead", "transform"):
+            frame = self.configure_images(
+                frame, "overhead", self.overhead_camera_perspective, **source_region
+            )
+        self.overhead_camera_rgb_image = frame.image
+        num_bytes = self.publish_compressed_msg(
+            frame,
             self.publisher_overhead_cmp,
             ros_image.header,
+            self.get_jpeg_encoder("overhead", self.overhead_camera_perspective),
+            stream="overhead",
+            image_scale=source_region.get("scale", 1.0),
         )
+        self.record_published_frame("overhead", num_bytes, ros_image.header)
 
     def rotate_image_around_center(self, image, angle):
-        image_center = tuple(np.array(image.shape[1::-1]) / 2)
-        rot_mat = cv2.getRotationMatrix2D(image_center, math.degrees(angle), 1.0)
-        result = cv2.warpAffine(
-            image,
-            rot_mat,
-            image.shape[1::-1],
-            flags=cv2.INTER_LINEAR,
-            borderValue=self.BACKGROUND_COLOR,
-        )
-        return result
+        return rotate_image_around_center(image, angle, self.BACKGROUND_COLOR)
 
     def joint_state_cb(self, joint_state):
         if "joint_wrist_roll" in joint_state.name:
             roll_index = joint_state.name.index("joint_wrist_roll")
             self.roll_value = joint_state.position[roll_index]
+        if "joint_gripper_finger_left" in joint_state.name:
+            aperture_index = joint_state.name.index("joint_gripper_finger_left")
+            self.gripper_aperture = joint_state.position[aperture_index]
 
-    def publish_compressed_msg(self, image, publisher, header):
-        msg = cv2_image_to_ros_msg(image, compress=True, bridge=self.cv_bridge)
+    def publish_compressed_msg(
+        self,
+        frame: Frame,
+        publishers: Union[Publisher, List[Publisher]],
+        header: Header,
+        jpeg_encoder: Optional[JPEGEncoder] = None,
+        stream: Optional[str] = None,
+        image_scale: float = 1.0,
+    ) -> int:
+        """
+        Compress and publish a frame.
+
+        Parameters
+        ----------
+        frame: The frame. The encoder converts its channel order, if necessary.
+        publishers: The publisher(s) to publish the compressed image on.
+        header: The header of the message the frame came from.
+        jpeg_encoder: The encoder to use. If None, use the default encoder.
+        stream: The stream the frame is from. If the stream has an adaptive
+            bitrate controller, the frame is scaled and encoded per its settings.
+        image_scale: The scale the frame is already at, relative to the stream's
+            full resolution (e.g., if it was decoded at a reduced scale).
+
+        Returns
+        -------
+        int: The total number of bytes published.
+        """
+        if jpeg_encoder is None:
+            jpeg_encoder = JPEGEncoder()
+        with self.measure_stage(stream, "encode"):
+            image = frame.image
+            quality = None
+            controller = self.bitrate_controllers.get(stream, None)
+            if controller is not None:
+                scale = controller.scale / image_scale
+                if scale < 1.0:
+                    image = cv2.resize(
+                        image,
+                        None,
+                        fx=scale,
+                        fy=scale,
+                        interpolation=cv2.INTER_AREA,
+                    )
+                quality = min(jpeg_encoder.quality, controller.quality)
+            msg = jpeg_encoder.encode_to_msg(image, quality, frame.channel_order)
         msg.header.stamp = header.stamp
-        publisher.publish(msg)
+        if not isinstance(publishers, list):
+            publishers = [publishers]
+        with self.measure_stage(stream, "publish"):
+            for publisher in publishers:
+                publisher.publish(msg)
+        return len(msg.data) * len(publishers)
+
+    def should_process_frame(self, stream: str) -> bool:
+        """
+        Check whether to process a stream's latest frame, given its adaptive
+        frame rate (if any).
+        """
+        controller = self.bitrate_controllers.get(stream, None)
+        return controller is None or controller.should_process_frame(time.monotonic())
+
+    def record_published_frame(
+        self, stream: str, num_bytes: int, header: Header
+    ) -> None:
+        """
+        Update a stream's metrics and adaptive bitrate controller (if any) with a
+        published frame, and publish the controller's settings whenever they are
+        updated.
+
+        Parameters
+        ----------
+        stream: The stream.
+        num_bytes: The total number of bytes published for the frame.
+        header: The header of the message the frame came from.
+        """
+        metrics = self.stream_metrics.get(stream, None)
+        controller = self.bitrate_controllers.get(stream, None)
+        if metrics is None and controller is None:
+            return
+        now = time.monotonic()
+        latency = (
+            self.get_clock().now() - Time.from_msg(header.stamp)
+        ).nanoseconds / 1.0e9
+        if metrics is not None:
+            metrics.record_published(latency)
+        if controller is None:
+            return
+        controller.record_frame(num_bytes, latency, now)
+        if controller.update(now):
+            state = controller.get_state()
+            state["stream"] = stream
+            self.bitrate_settings_publisher.publish(String(data=json.dumps(state)))
+            if self.verbose:
+                self.get_logger().info(f"Adaptive bitrate settings: {state}")
+
+    def bitrate_feedback_cb(self, msg: String) -> None:
+        """
+        Receive the rate and latency at which the browser is receiving a stream,
+        as a JSON string, e.g., '{"stream": "realsense", "receive_fps": 12.5,
+        "latency": 0.3}'.
+        """
+        try:
+            feedback = json.loads(msg.data)
+            controller = self.bitrate_controllers.get(feedback["stream"], None)
+        except (json.JSONDecodeError, KeyError, TypeError) as err:
+            self.get_logger().warn(
+                f"Could not decode video stream feedback: {repr(msg.data)}. {err}",
+                throttle_duration_sec=1.0,
+            )
+            return
+        if controller is not None:
+            controller.record_feedback(
+                time.monotonic(),
+                receive_fps=feedback.get("receive_fps", None),
+                receive_latency=feedback.get("latency", None),
+            )
+
+    def measure_stage(self, stream: str, stage: str):
+        """
+        Get a context manager that records how long its body takes as one of the
+        stream's stages, if the stream's metrics are enabled.
+
+        Parameters
+        ----------
+        stream: The stream.
+        stage: The stage, one of StreamMetrics.STAGES.
+        """
+        metrics = self.stream_metrics.get(stream, None)
+        return nullcontext() if metrics is None else metrics.measure(stage)
+
+    def measure_frames(
+        self,
+        stream: str,
+        process_frame: Callable[[Union[CompressedImage, Image]], None],
+    ) -> Callable[[Union[CompressedImage, Image]], None]:
+        """
+        Wrap a stream's frame processing function, so that (if the stream's metrics
+        are enabled) every stage is measured once per frame, summed across the
+        perspectives the frame is rendered to.
+
+        Parameters
+        ----------
+        stream: The stream.
+        process_frame: The function that processes one of the stream's frames.
+        """
+        metrics = self.stream_metrics.get(stream, None)
+        if metrics is None:
+            return process_frame
+
+        def measured_process_frame(frame: Union[CompressedImage, Image]) -> None:
+            with metrics.measure_frame():
+                process_frame(frame)
+
+        return measured_process_frame
+
+    def record_dropped_frame(self, stream: str) -> None:
+        """
+        Record that one of the stream's frames was dropped before being processed.
+        """
+        metrics = self.stream_metrics.get(stream, None)
+        if metrics is not None:
+            metrics.record_dropped()
+
+    def publish_stream_metrics(self) -> None:
+        """
+        Summarize every stream's metrics since the previous summary, publish the
+        summaries on /diagnostics, and warn about streams over their frame budget.
+        """
+        diagnostic_array = DiagnosticArray()
+        diagnostic_array.header.stamp = self.get_clock().now().to_msg()
+        for stream, metrics in self.stream_metrics.items():
+            summary = metrics.summarize(reset=True)
+            mask_cache = {
+                "realsense": getattr(self, "realsense_depth_ar_mask_cache", None),
+                "gripper": getattr(self, "gripper_depth_ar_mask_cache", None),
+            }.get(stream, None)
+            if mask_cache is not None:
+                summary["overlay_mask_cache_hit_rate"] = round(mask_cache.hit_rate, 3)
+            self.latest_stream_metrics_summaries[stream] = summary
+
+            slowest_stage = summary["slowest_stage"]
+            message = (
+                f"{summary['fps']} fps, {summary['frames_dropped']} dropped, "
+                f"p90 frame age {summary['frame_age']['p90_ms']} ms, "
+                f"slowest stage {slowest_stage} "
+                f"(p90 {summary['stages'][slowest_stage]['p90_ms']} ms)"
+            )
+            is_over_budget = summary["frames_published"] > 0 and (
+                metrics.is_over_budget(summary)
+            )
+            if is_over_budget:
+                self.get_logger().warn(
+                    f"The {stream} stream is over its "
+                    f"{summary['frame_budget_ms']} ms frame budget: {message}"
+                )
+
+            # Flatten the summary into the status's key-value pairs
+            values = []
+            for key, value in summary.items():
+                if key == "stages":
+                    for stage, stage_summary in value.items():
+                        values += [
+                            KeyValue(key=f"{stage} {stat}", value=str(stat_value))
+                            for stat, stat_value in stage_summary.items()
+                        ]
+                elif isinstance(value, dict):
+                    values += [
+                        KeyValue(key=f"{key} {stat}", value=str(stat_value))
+                        for stat, stat_value in value.items()
+                    ]
+                else:
+                    values.append(KeyValue(key=key, value=str(value)))
+            diagnostic_array.status.append(
+                DiagnosticStatus(
+                    level=(
+                        DiagnosticStatus.WARN if is_over_budget else DiagnosticStatus.OK
+                    ),
+                    name=f"{self.get_name()}: {stream} video stream",
+                    message=message,
+                    hardware_id=stream,
+                    values=values,
+                )
+            )
+        self.diagnostics_publisher.publish(diagnostic_array)
+
+    def stream_metrics_callback(self, req, res):
+        """
+        Respond with the latest metrics summary of every stream, as JSON. Streams
+        that have not been summarized yet are summarized without resetting them.
+        """
+        summaries = {
+            stream: self.latest_stream_metrics_summaries.get(stream, None)
+            or metrics.summarize()
+            for stream, metrics in self.stream_metrics.items()
+        }
+        res.success = True
+        res.message = json.dumps(summaries)
+        return res
+
+    def take_latest_overhead_image(self) -> Optional[Union[CompressedImage, Image]]:
+        with self.latest_overhead_camera_rgb_image_lock:
+            overhead_camera_rgb_image = self.latest_overhead_camera_rgb_image
+            self.latest_overhead_camera_rgb_image = None
+        return overhead_camera_rgb_image
+
+    def take_latest_realsense_image(self) -> Optional[Union[CompressedImage, Image]]:
+        with self.latest_realsense_rgb_image_lock:
+            realsense_rgb_image = self.latest_realsense_rgb_image
+            self.latest_realsense_rgb_image = None
+        return realsense_rgb_image
+
+    def take_latest_gripper_image(self) -> Optional[Union[CompressedImage, Image]]:
+        with self.latest_gripper_camera_rgb_image_lock:
+            gripper_rgb_image = self.latest_gripper_camera_rgb_image
+            self.latest_gripper_camera_rgb_image = None
+        return gripper_rgb_image
+
+    def update_shared_transforms(self) -> None:
+        """
+        Add the new transforms that the process that started this one shares (if
+        any) to the TF buffer.
+        """
+        if self.shared_transforms is None:
+            return
+        for transform in self.shared_transforms.read_new():
+            self.tf_buffer.set_transform(transform, "configure_video_streams")
 
     def run(self):
+        if self.stream_processes:
+            self.run_stream_processes()
+            return
+        if self.parallel_streams:
+            self.run_stream_workers()
+            return
+
+        process_navigation_image = self.measure_frames(
+            "overhead", self.process_navigation_image
+        )
+        process_realsense_image = self.measure_frames(
+            "realsense", self.process_realsense_image
+        )
+        process_gripper_image = self.measure_frames(
+            "gripper", self.process_gripper_image
+        )
         rate = self.create_rate(self.target_fps)
         while rclpy.ok():
             # Process the navigation image
             if self.use_overhead:
-                with self.latest_overhead_camera_rgb_image_lock:
-                    overhead_camera_rgb_image = self.latest_overhead_camera_rgb_image
-                    self.latest_overhead_camera_rgb_image = None
+                overhead_camera_rgb_image = self.take_latest_overhead_image()
                 if overhead_camera_rgb_image is not None:
-                    self.process_navigation_image(overhead_camera_rgb_image)
+                    process_navigation_image(overhead_camera_rgb_image)
 
             # Process the realsense image
             if self.use_realsense:
-                with self.latest_realsense_rgb_image_lock:
-                    realsense_rgb_image = self.latest_realsense_rgb_image
-                    self.latest_realsense_rgb_image = None
+                realsense_rgb_image = self.take_latest_realsense_image()
                 if realsense_rgb_image is not None:
-                    self.process_realsense_image(realsense_rgb_image)
+                    process_realsense_image(realsense_rgb_image)
 
             # Process the gripper image
             if self.use_gripper:
-                with self.latest_gripper_camera_rgb_image_lock:
-                    gripper_rgb_image = self.latest_gripper_camera_rgb_image
-                    self.latest_gripper_camera_rgb_image = None
+                gripper_rgb_image = self.take_latest_gripper_image()
                 if gripper_rgb_image is not None:
-                    self.process_gripper_image(gripper_rgb_image)
+                    process_gripper_image(gripper_rgb_image)
 
             rate.sleep()
 
+    def run_stream_workers(self):
+        """
+        Process every enabled stream in its own worker thread, with its own rate,
+        frame deadline, and stats, until ROS shuts down.
+        """
+        workers: List[StreamWorker] = []
+        for stream, use_stream, take_frame, process_frame in (
+            (
+                "overhead",
+                self.use_overhead,
+                self.take_latest_overhead_image,
+                self.process_navigation_image,
+            ),
+            (
+                "realsense",
+                self.use_realsense,
+                self.take_latest_realsense_image,
+                self.process_realsense_image,
+            ),
+            (
+                "gripper",
+                self.use_gripper,
+                self.take_latest_gripper_image,
+                self.process_gripper_image,
+            ),
+        ):
+            if use_stream:
+                workers.append(
+                    StreamWorker(
+                        self,
+                        stream,
+                        take_frame,
+                        self.measure_frames(stream, process_frame),
+                        target_fps=self.stream_target_fps[stream],
+                        max_frame_age=self.max_frame_age,
+                        stats_log_period=5.0 if self.verbose else None,
+                        on_frame_dropped=functools.partial(
+                            self.record_dropped_frame, stream
+                        ),
+                    )
+                )
+        self.stream_workers = workers
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        finally:
+            for worker in workers:
+                worker.stop(timeout=1.0)
+
+    def get_stream_process_args(
+        self, stream: str, shared_transforms_file: str
+    ) -> List[str]:
+        """
+        Get the command line of the configure_video_streams process for a stream.
+        It gets the same ROS arguments as this process, so the same parameters,
+        with its own node name, one worker thread, and this process's transforms.
+        """
+        return [
+            sys.executable,
+            os.path.abspath(sys.argv[0]),
+            self.params_file,
+            str(self.has_beta_teleop_kit),
+            *(
+                str(stream == other_stream)
+                for other_stream in ("overhead", "realsense", "gripper")
+            ),
+            # The first matching remapping wins, so rename the node before the
+            # ROS arguments of this process
+            "--ros-args",
+            "-r",
+            f"__node:=configure_video_streams_{stream}_process",
+            "--",
+            *sys.argv[6:],
+            # The last parameter override wins, so override these after them
+            "--ros-args",
+            "-p",
+            "stream_processes:=False",
+            "-p",
+            "parallel_streams:=True",
+            "-p",
+            f"shared_transforms_file:={shared_transforms_file}",
+        ]
+
+    def run_stream_processes(self):
+        """
+        Process every enabled stream in its own configure_video_streams process,
+        and share the transforms of this process's TF listener with them, until
+        ROS shuts down or a stream process exits.
+        """
+        shared_transforms_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        fd, shared_transforms_file = tempfile.mkstemp(
+            prefix="configure_video_streams_tf_", dir=shared_transforms_dir
+        )
+        os.close(fd)
+        shared_transforms = SharedTransforms(
+            self.SHARED_TRANSFORM_FRAMES, shared_transforms_file, create=True
+        )
+        processes: Dict[str, subprocess.Popen] = {}
+        rate = self.create_rate(self.SHARED_TRANSFORMS_RATE)
+        try:
+            for stream in self.stream_process_streams:
+                processes[stream] = subprocess.Popen(
+                    self.get_stream_process_args(stream, shared_transforms_file)
+                )
+            shared_stamps = [None] * len(self.SHARED_TRANSFORM_FRAMES)
+            while rclpy.ok():
+                exited = [
+                    stream
+                    for stream, process in processes.items()
+                    if process.poll() is not None
+                ]
+                if exited:
+                    self.get_logger().error(f"Stream processes {exited} exited")
+                    break
+                if "realsense" in processes:
+                    for i, (target_frame, source_frame) in enumerate(
+                        self.SHARED_TRANSFORM_FRAMES
+                    ):
+                        ok, transform = tf2_get_transform(
+                            self.tf_buffer,
+                            target_frame,
+                            source_frame,
+                            timeout=Duration(seconds=0),
+                        )
+                        stamp = (
+                            transform.header.stamp.sec,
+                            transform.header.stamp.nanosec,
+                        )
+                        if ok and stamp != shared_stamps[i]:
+                            shared_transforms.write(i, transform)
+                            shared_stamps[i] = stamp
+                rate.sleep()
+        finally:
+            # Stop the stream processes like ros2 launch stops nodes
+            for process in processes.values():
+                if process.poll() is None:
+                    process.send_signal(signal.SIGINT)
+            for stream, process in processes.items():
+                try:
+                    process.wait(timeout=5.0)
+                except subprocess.TimeoutExpired:
+                    self.get_logger().warn(f"Killing the {stream} stream process")
+                    process.kill()
+            self.destroy_rate(rate)
+            shared_transforms.close(remove=True)
+
 
 if __name__ == "__main__":
     rclpy.init()
@@ -38,8 +38,8 @@ from stretch_web_teleop_helpers.constants import (
     get_stow_configuration,
 )
 from stretch_web_teleop_helpers.conversions import (
+    DepthDeprojector,
     deproject_pixel_to_pointcloud_point,
-    depth_img_to_pointcloud,
     remaining_time,
     ros_msg_to_cv2_image,
     tf2_transform,
@@ -121,6 +121,7 @@ class MoveToPregraspNode(Node):
         )
         self.latest_realsense_info_lock = threading.Lock()
         self.latest_realsense_info: Optional[CameraInfo] = None
+        self.depth_deprojector = DepthDeprojector()
         self.camera_info_subscriber = self.create_subscription(
             CameraInfo,
             "/camera/aligned_depth_to_color/camera_info",
@@ -514,13 +515,14 @@ class MoveToPregraspNode(Node):
         with self.latest_realsense_info_lock:
             camera_info_msg = self.latest_realsense_info
         depth_image = ros_msg_to_cv2_image(depth_msg, self.cv_bridge)
-        pointcloud = depth_img_to_pointcloud(
-            depth_image,
+        self.depth_deprojector.set_intrinsics(
             f_x=camera_info_msg.k[0],
             f_y=camera_info_msg.k[4],
             c_x=camera_info_msg.k[2],
             c_y=camera_info_msg.k[5],
-        )  # N x 3 array
+            shape=depth_image.shape,
+        )
+        pointcloud = self.depth_deprojector.deproject(depth_image)  # N x 3 array
 
         # Undo any transformation that were applied to the raw camera image before sending it
         # to the web app
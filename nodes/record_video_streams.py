@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+"""
+Records every input of ConfigureVideoStreams (the camera images, depth images or
+pointclouds, camera infos, joint states, body landmarks, and the head camera's
+transform) to a frame log, so that the session can be replayed offline with
+replay_video_streams.py.
+
+Example usage:
+    ros2 run stretch_web_teleop record_video_streams.py ~/video_streams_session
+    ros2 run stretch_web_teleop record_video_streams.py ~/session --aligned-depth
+"""
+# Standard imports
+import argparse
+import functools
+import sys
+import threading
+import time
+from typing import Dict
+
+# Third-party imports
+import rclpy
+import tf2_ros
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
+from rclpy.duration import Duration
+from rclpy.executors import MultiThreadedExecutor
+from rclpy.node import Node
+from rclpy.qos import QoSProfile, ReliabilityPolicy
+from rclpy.serialization import serialize_message
+from sensor_msgs.msg import CameraInfo, CompressedImage, Image, JointState, PointCloud2
+from std_msgs.msg import String
+
+# Local imports
+from stretch_web_teleop_helpers.conversions import tf2_get_transform
+from stretch_web_teleop_helpers.frame_log import FrameLogWriter
+
+# The frame log channel of the transform from the head camera's frame to base_link,
+# recorded whenever a head camera image arrives
+CAMERA_TRANSFORM_CHANNEL = "camera_transform"
+CAMERA_TRANSFORM_TYPE = "geometry_msgs/msg/TransformStamped"
+
+
+def get_msg_type_name(msg_type: type) -> str:
+    """
+    Get the name of a message type, e.g., "sensor_msgs/msg/Image".
+    """
+    return f"{msg_type.__module__.split('.')[0]}/msg/{msg_type.__name__}"
+
+
+def get_video_stream_topics(
+    has_beta_teleop_kit: bool = False,
+    use_pointcloud: bool = True,
+    use_compressed_image: bool = True,
+    use_compressed_uvc_image: bool = False,
+) -> Dict[str, type]:
+    """
+    Get the topics (and their message types) that ConfigureVideoStreams subscribes
+    to, with the same options as its constructor.
+
+    Returns
+    -------
+    Dict[str, type]: A map from topic to message type.
+    """
+    compressed = "/compressed" if use_compressed_image else ""
+    compressed_depth = "/compressedDepth" if use_compressed_image else ""
+    image_type = CompressedImage if use_compressed_image else Image
+    uvc_compressed = "/compressed" if use_compressed_uvc_image else ""
+    uvc_image_type = CompressedImage if use_compressed_uvc_image else Image
+    topics = {
+        "/navigation_camera/image_raw" + uvc_compressed: uvc_image_type,
+        "/navigation_camera/camera_info": CameraInfo,
+        "/camera/color/image_raw" + compressed: image_type,
+        "/camera/color/camera_info": CameraInfo,
+        "/human_estimates/latest_body_pose": String,
+        "/stretch/joint_states": JointState,
+    }
+    if use_pointcloud:
+        topics["/camera/depth/color/points"] = PointCloud2
+    else:
+        topics[
+            "/camera/aligned_depth_to_color/image_raw" + compressed_depth
+        ] = image_type
+    if has_beta_teleop_kit:
+        topics["/gripper_camera/image_raw" + uvc_compressed] = uvc_image_type
+        topics["/gripper_camera/camera_info"] = CameraInfo
+    else:
+        topics["/gripper_camera/image_raw" + compressed] = image_type
+        topics["/gripper_camera/color/camera_info"] = CameraInfo
+        if use_pointcloud:
+            topics["/gripper_camera/depth/color/points"] = PointCloud2
+        else:
+            topics[
+                "/gripper_camera/aligned_depth_to_color/image_raw" + compressed_depth
+            ] = image_type
+    return topics
+
+
+class VideoStreamsRecorder(Node):
+    """
+    Appends the (still serialized) messages on the video streams' input topics
+    to a frame log, along with the head camera's transform.
+    """
+
+    def __init__(self, path: str, topics: Dict[str, type]):
+        """
+        Initialize the node.
+
+        Parameters
+        ----------
+        path: The directory of the frame log to create.
+        topics: A map from the topics to record to their message types.
+        """
+        super().__init__("record_video_streams")
+
+        self.writer = FrameLogWriter(path)
+        self.num_bytes = 0
+        self.num_msgs = 0
+
+        # Look up the head camera's transform whenever a head camera image arrives
+        self.tf_buffer = tf2_ros.Buffer(cache_time=Duration(seconds=12))
+        self.tf2_listener = tf2_ros.TransformListener(self.tf_buffer, self)
+        self.camera_transform_channel_id = self.writer.add_channel(
+            CAMERA_TRANSFORM_CHANNEL, CAMERA_TRANSFORM_TYPE
+        )
+
+        # Subscribe with raw=True, so the messages are recorded without being
+        # deserialized and serialized again
+        self.recording_subscribers = []
+        for topic, msg_type in topics.items():
+            channel_id = self.writer.add_channel(topic, get_msg_type_name(msg_type))
+            self.recording_subscribers.append(
+                self.create_subscription(
+                    msg_type,
+                    topic,
+                    functools.partial(
+                        self.record_callback,
+                        channel_id,
+                        topic.startswith("/camera/color/image_raw"),
+                    ),
+                    QoSProfile(depth=10, reliability=ReliabilityPolicy.BEST_EFFORT),
+                    callback_group=MutuallyExclusiveCallbackGroup(),
+                    raw=True,
+                )
+            )
+
+        self.start_time = time.monotonic()
+        self.flush_timer = self.create_timer(1.0, self.flush_callback)
+        self.get_logger().info(f"Recording {len(topics)} topics to {path}")
+
+    def record_callback(
+        self, channel_id: int, record_camera_transform: bool, data: bytes
+    ) -> None:
+        """
+        Record a serialized message.
+
+        Parameters
+        ----------
+        channel_id: The frame log channel of the message's topic.
+        record_camera_transform: Whether to also record the head camera's transform.
+        data: The serialized message.
+        """
+        recv_time_ns = self.get_clock().now().nanoseconds
+        self.writer.append(channel_id, recv_time_ns, data)
+        self.num_bytes += len(data)
+        self.num_msgs += 1
+        if record_camera_transform:
+            ok, transform = tf2_get_transform(
+                self.tf_buffer,
+                "base_link",
+                "camera_color_optical_frame",
+                timeout=Duration(seconds=0),
+            )
+            if ok:
+                self.writer.append(
+                    self.camera_transform_channel_id,
+                    recv_time_ns,
+                    serialize_message(transform),
+                )
+
+    def flush_callback(self) -> None:
+        """
+        Flush the frame log, and log how much has been recorded.
+        """
+        self.writer.flush()
+        self.get_logger().info(
+            f"Recorded {self.num_msgs} messages ({self.num_bytes / 1.0e6:.1f} MB) "
+            f"in {time.monotonic() - self.start_time:.0f} s",
+            throttle_duration_sec=10.0,
+        )
+
+
+def main():
+    """
+    Record until interrupted.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=str, help="The directory of the frame log")
+    parser.add_argument("--beta-teleop-kit", action="store_true")
+    parser.add_argument(
+        "--aligned-depth",
+        action="store_true",
+        help="Record the aligned depth images instead of the pointclouds",
+    )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Record the raw images instead of the compressed images",
+    )
+    parser.add_argument(
+        "--compressed-uvc",
+        action="store_true",
+        help="Record the UVC cameras' compressed (MJPG passthrough) images",
+    )
+    args = parser.parse_args(rclpy.utilities.remove_ros_args(sys.argv)[1:])
+
+    rclpy.init()
+    node = VideoStreamsRecorder(
+        args.path,
+        get_video_stream_topics(
+            has_beta_teleop_kit=args.beta_teleop_kit,
+            use_pointcloud=not args.aligned_depth,
+            use_compressed_image=not args.raw,
+            use_compressed_uvc_image=args.compressed_uvc,
+        ),
+    )
+    executor = MultiThreadedExecutor(num_threads=4)
+    spin_thread = threading.Thread(
+        target=rclpy.spin,
+        args=(node,),
+        kwargs={"executor": executor},
+        daemon=True,
+    )
+    spin_thread.start()
+
+    try:
+        while rclpy.ok():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+
+    # Terminate this node, and close the frame log once no callback can append to it
+    node.destroy_node()
+    rclpy.shutdown()
+    spin_thread.join()
+    node.writer.close()
+
+
+if __name__ == "__main__":
+    main()
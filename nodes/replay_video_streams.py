@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+
+"""
+Replays a frame log recorded by record_video_streams.py through ConfigureVideoStreams'
+processing functions, in this process, at the recorded rate (or faster), or as
+fast as possible. No other ROS nodes (e.g., the cameras or the web app) need to be
+running: the recorded messages are passed directly to the node's callbacks, and
+its outputs are consumed by a sink in this process. To keep a running robot's
+topics out of the replay, set a separate ROS_DOMAIN_ID.
+
+At the end, it prints the node's per-stream metrics (see StreamMetrics), and the
+number of frames and bytes published on every output topic. With --profile, it
+also writes cProfile stats of the replay.
+
+Example usage:
+    ros2 run stretch_web_teleop replay_video_streams.py ~/session
+    ros2 run stretch_web_teleop replay_video_streams.py ~/session --speed 0 --profile replay.prof
+    ros2 run stretch_web_teleop replay_video_streams.py ~/session --realsense-depth-ar
+"""
+# Standard imports
+import argparse
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Third-party imports
+import rclpy
+from ament_index_python.packages import get_package_share_directory
+from configure_video_streams import ConfigureVideoStreams
+from rclpy.executors import SingleThreadedExecutor
+from rclpy.node import Node
+from rclpy.qos import QoSProfile, ReliabilityPolicy
+from rclpy.serialization import deserialize_message
+from rclpy.time import Time
+from record_video_streams import CAMERA_TRANSFORM_CHANNEL
+from rosidl_runtime_py.utilities import get_message
+from sensor_msgs.msg import CompressedImage
+
+# Local imports
+from stretch_web_teleop_helpers.frame_log import FrameLogEntry, FrameLogReader
+
+
+class OutputSink(Node):
+    """
+    Subscribes to ConfigureVideoStreams' output topics, so that it renders them,
+    and counts the frames and bytes published on each.
+    """
+
+    def __init__(self, topics: List[str]):
+        """
+        Initialize the node.
+
+        Parameters
+        ----------
+        topics: The compressed image topics to subscribe to.
+        """
+        super().__init__("replay_video_streams_sink")
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+        self.output_subscribers = []
+        for topic in topics:
+            self.counts[topic] = {"frames": 0, "bytes": 0}
+            self.output_subscribers.append(
+                self.create_subscription(
+                    CompressedImage,
+                    topic,
+                    lambda msg, topic=topic: self.output_callback(topic, msg),
+                    QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT),
+                )
+            )
+
+    def output_callback(self, topic: str, msg: CompressedImage) -> None:
+        with self.lock:
+            self.counts[topic]["frames"] += 1
+            self.counts[topic]["bytes"] += len(msg.data)
+
+
+class VideoStreamsReplayer:
+    """
+    Feeds the messages in a frame log to a ConfigureVideoStreams node, and has it
+    process every stream's latest frame, like its run loop does.
+    """
+
+    def __init__(self, node: ConfigureVideoStreams, reader: FrameLogReader):
+        """
+        Initialize the VideoStreamsReplayer.
+
+        Parameters
+        ----------
+        node: The node to replay the messages through. It must not be spinning,
+            so that nothing but the replayer calls its callbacks.
+        reader: The frame log.
+        """
+        self.node = node
+        self.reader = reader
+        self.msg_types = {
+            channel["name"]: get_message(channel["type"]) for channel in reader.channels
+        }
+        self.callbacks = self.get_callbacks()
+        self.streams: List[Tuple[Callable, Callable]] = []
+        if node.use_overhead:
+            self.streams.append(
+                (node.take_latest_overhead_image, node.process_navigation_image)
+            )
+        if node.use_realsense:
+            self.streams.append(
+                (node.take_latest_realsense_image, node.process_realsense_image)
+            )
+        if node.use_gripper:
+            self.streams.append(
+                (node.take_latest_gripper_image, node.process_gripper_image)
+            )
+        skipped = [
+            channel["name"]
+            for channel in reader.channels
+            if channel["name"] not in self.callbacks
+        ]
+        if skipped:
+            node.get_logger().warn(f"Not replaying the channels {skipped}")
+
+    def get_callbacks(self) -> Dict[str, Callable]:
+        """
+        Get the node callback of every channel that the node subscribes to.
+        """
+        node = self.node
+        callbacks = {}
+        if node.use_overhead:
+            for topic in (
+                "/navigation_camera/image_raw",
+                "/navigation_camera/image_raw/compressed",
+            ):
+                callbacks[topic] = node.navigation_camera_cb
+            callbacks["/navigation_camera/camera_info"] = functools.partial(
+                node.uvc_camera_info_cb, "overhead"
+            )
+        if node.use_realsense:
+            for topic in (
+                "/camera/color/image_raw",
+                "/camera/color/image_raw/compressed",
+            ):
+                callbacks[topic] = node.realsense_rgb_cb
+            for topic in (
+                "/camera/depth/color/points",
+                "/camera/aligned_depth_to_color/image_raw",
+                "/camera/aligned_depth_to_color/image_raw/compressedDepth",
+            ):
+                callbacks[topic] = node.realsense_depth_cb
+            callbacks["/camera/color/camera_info"] = node.realsense_camera_info_cb
+            callbacks[
+                "/human_estimates/latest_body_pose"
+            ] = node.realsense_body_landmarks_cb
+            callbacks[CAMERA_TRANSFORM_CHANNEL] = lambda transform: (
+                node.tf_buffer.set_transform(transform, "replay_video_streams")
+            )
+        if node.use_gripper:
+            for topic in (
+                "/gripper_camera/image_raw",
+                "/gripper_camera/image_raw/compressed",
+            ):
+                callbacks[topic] = node.gripper_realsense_rgb_cb
+            callbacks["/stretch/joint_states"] = node.joint_state_cb
+            # Only the D405 gripper camera has depth
+            if hasattr(node, "latest_gripper_realsense_depth_image_lock"):
+                for topic in (
+                    "/gripper_camera/depth/color/points",
+                    "/gripper_camera/aligned_depth_to_color/image_raw",
+                    "/gripper_camera/aligned_depth_to_color/image_raw/compressedDepth",
+                ):
+                    callbacks[topic] = node.gripper_realsense_depth_cb
+                callbacks[
+                    "/gripper_camera/color/camera_info"
+                ] = node.gripper_camera_info_cb
+            else:
+                callbacks["/gripper_camera/camera_info"] = functools.partial(
+                    node.uvc_camera_info_cb, "gripper"
+                )
+        return callbacks
+
+    def feed(self, entry: FrameLogEntry, offset_ns: int) -> None:
+        """
+        Deserialize a message and pass it to its callback.
+
+        Parameters
+        ----------
+        entry: The message's frame log entry.
+        offset_ns: The offset from recorded to replayed time. Header stamps are
+            shifted by it, so the messages are as old (relative to the node's
+            clock) as they were when they were recorded.
+        """
+        callback = self.callbacks.get(entry.channel, None)
+        if callback is None:
+            return
+        msg = deserialize_message(bytes(entry.data), self.msg_types[entry.channel])
+        if hasattr(msg, "header"):
+            stamp_ns = Time.from_msg(msg.header.stamp).nanoseconds + offset_ns
+            msg.header.stamp = Time(nanoseconds=max(stamp_ns, 0)).to_msg()
+        callback(msg)
+
+    def process_latest_frames(self) -> None:
+        """
+        Process every stream's latest frame, if it has one.
+        """
+        for take_latest_frame, process_frame in self.streams:
+            frame = take_latest_frame()
+            if frame is not None:
+                process_frame(frame)
+
+    def replay(self, speed: Optional[float] = 1.0) -> int:
+        """
+        Replay the frame log.
+
+        Parameters
+        ----------
+        speed: The replay rate, relative to the recorded rate. If None (or
+            non-positive), replay as fast as possible, processing every frame.
+            Otherwise, frames that arrive while the node is still processing
+            are overwritten by newer ones, as they would be on the robot.
+
+        Returns
+        -------
+        int: The number of messages replayed.
+        """
+        if len(self.reader) == 0:
+            return 0
+        if speed is not None and speed <= 0:
+            speed = None
+        first_recv_time_ns = self.reader[0].recv_time_ns
+        start_time = time.monotonic()
+        for i, entry in enumerate(self.reader):
+            elapsed = (entry.recv_time_ns - first_recv_time_ns) / 1.0e9
+            if speed is not None:
+                delay = start_time + elapsed / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            # Map the recorded time to now on the node's clock
+            offset_ns = self.node.get_clock().now().nanoseconds - entry.recv_time_ns
+            self.feed(entry, offset_ns)
+
+            # Process the latest frames, unless the next message is already due
+            # (i.e., the node is behind), like the node's run loop would
+            if i + 1 < len(self.reader) and speed is not None:
+                next_elapsed = (
+                    self.reader[i + 1].recv_time_ns - first_recv_time_ns
+                ) / 1.0e9
+                if start_time + next_elapsed / speed <= time.monotonic():
+                    continue
+            self.process_latest_frames()
+        return len(self.reader)
+
+
+def main():
+    """
+    Replay a frame log and print the metrics.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=str, help="The directory of the frame log")
+    parser.add_argument(
+        "--params",
+        type=str,
+        default=None,
+        help="The video streams' params file. Defaults to the installed one.",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="The replay rate, relative to the recorded rate. 0 replays as fast as possible.",
+    )
+    parser.add_argument("--beta-teleop-kit", action="store_true")
+    parser.add_argument("--realsense-depth-ar", action="store_true")
+    parser.add_argument("--realsense-body-pose-ar", action="store_true")
+    parser.add_argument("--gripper-depth-ar", action="store_true")
+    parser.add_argument("--expanded-gripper", action="store_true")
+    parser.add_argument(
+        "--profile", type=str, default=None, help="Write cProfile stats to this file"
+    )
+    parser.add_argument(
+        "--discovery-timeout",
+        type=float,
+        default=5.0,
+        help="How long to wait for the node to discover the output sink, in seconds",
+    )
+    args = parser.parse_args(rclpy.utilities.remove_ros_args(sys.argv)[1:])
+
+    params_file = args.params
+    if params_file is None:
+        params_file = os.path.join(
+            get_package_share_directory("stretch_web_teleop"),
+            "config",
+            "configure_video_streams_params.yaml",
+        )
+    reader = FrameLogReader(args.path)
+    channels = reader.get_channel_counts()
+    print(
+        f"Replaying {len(reader)} messages ({reader.get_duration():.1f} s): {channels}"
+    )
+
+    rclpy.init()
+    # Configure the node for the recorded topics
+    node = ConfigureVideoStreams(
+        params_file=params_file,
+        has_beta_teleop_kit=args.beta_teleop_kit,
+        use_overhead=any(
+            channels.get(topic, 0) > 0
+            for topic in (
+                "/navigation_camera/image_raw",
+                "/navigation_camera/image_raw/compressed",
+            )
+        ),
+        use_realsense=any(
+            channels.get(topic, 0) > 0
+            for topic in (
+                "/camera/color/image_raw",
+                "/camera/color/image_raw/compressed",
+            )
+        ),
+        use_gripper=any(
+            channels.get(topic, 0) > 0
+            for topic in (
+                "/gripper_camera/image_raw",
+                "/gripper_camera/image_raw/compressed",
+            )
+        ),
+        use_pointcloud=not any(
+            "aligned_depth_to_color" in topic and count > 0
+            for topic, count in channels.items()
+        ),
+        use_compressed_image=any(
+            topic.endswith("/compressed") and count > 0
+            for topic, count in channels.items()
+        ),
+    )
+    if node.use_realsense:
+        node.realsense_depth_ar = args.realsense_depth_ar
+        node.realsense_body_pose_ar = args.realsense_body_pose_ar
+    if node.use_gripper:
+        node.gripper_depth_ar = args.gripper_depth_ar
+        node.expanded_gripper = args.expanded_gripper
+
+    # Subscribe to every output, and wait until the node sees the subscriptions,
+    # since it only renders the realsense perspectives that have subscribers
+    output_topics = []
+    if node.use_overhead:
+        output_topics.append(node.publisher_overhead_cmp.topic_name)
+    if node.use_realsense:
+        output_topics.append(node.publisher_realsense_cmp.topic_name)
+        output_topics += [
+            publisher.topic_name
+            for publisher in node.publishers_realsense_perspective_cmp.values()
+        ]
+    if node.use_gripper:
+        output_topics.append(node.publisher_gripper_cmp.topic_name)
+    sink = OutputSink(output_topics)
+    executor = SingleThreadedExecutor()
+    executor.add_node(sink)
+    spin_thread = threading.Thread(target=executor.spin, daemon=True)
+    spin_thread.start()
+    deadline = time.monotonic() + args.discovery_timeout
+    while time.monotonic() < deadline and (
+        node.use_realsense
+        and node.publisher_realsense_cmp.get_subscription_count() == 0
+    ):
+        time.sleep(0.1)
+
+    replayer = VideoStreamsReplayer(node, reader)
+    # Start the metrics' window at the start of the replay
+    for metrics in node.stream_metrics.values():
+        metrics.summarize(reset=True)
+    profiler = cProfile.Profile() if args.profile else None
+    start_time = time.monotonic()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        num_msgs = replayer.replay(speed=args.speed)
+    except KeyboardInterrupt:
+        num_msgs = None
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+    elapsed = time.monotonic() - start_time
+    # Give the sink a moment to receive the last outputs
+    time.sleep(0.5)
+
+    print(f"Replayed {num_msgs} messages in {elapsed:.1f} s")
+    print(
+        json.dumps(
+            {
+                "streams": {
+                    stream: metrics.summarize()
+                    for stream, metrics in node.stream_metrics.items()
+                },
+                "outputs": sink.counts,
+            },
+            indent=2,
+        )
+    )
+    if profiler is not None:
+        print(f"Wrote the profile to {args.profile}")
+
+    executor.shutdown()
+    sink.destroy_node()
+    node.destroy_node()
+    rclpy.shutdown()
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Benchmarks the NumPy filters in `pointcloud_filters.py` against the python-pcl
+# PassThrough and VoxelGrid filters they replace, and checks that both produce the
+# same points. If python-pcl is not installed, only the NumPy filters are timed.
+#
+# Example usage:
+#   python3 benchmark_pointcloud_filters.py
+#   python3 benchmark_pointcloud_filters.py --sizes 20000 200000 --repeats 5
+
+import argparse
+import timeit
+
+import numpy as np
+
+from stretch_web_teleop_helpers.pointcloud_filters import box_filter, filter_pointcloud
+
+try:
+    import pcl
+except ImportError:
+    pcl = None
+
+# The filter settings used by the RealSense and gripper depth AR overlays
+REALSENSE_Z_LIMITS = (0.01, 1.5)
+REALSENSE_LEAF_SIZE = 0.012
+GRIPPER_Z_LIMITS = (0.01, 0.3)
+GRIPPER_LEAF_SIZE = 0.0019
+GRIPPER_BOX = dict(x_limits=(-0.04, 0.04), y_limits=(-0.03, 0.05), z_limits=(0.01, 0.2))
+
+
+def pcl_filter(points, z_limits, leaf_size):
+    """The python-pcl PassThrough + VoxelGrid filter that filter_pointcloud replaces."""
+    cloud = pcl.PointCloud(points)
+    passthrough = cloud.make_passthrough_filter()
+    passthrough.set_filter_field_name("z")
+    passthrough.set_filter_limits(*z_limits)
+    cloud = passthrough.filter()
+    downsampler = cloud.make_voxel_grid_filter()
+    downsampler.set_leaf_size(leaf_size, leaf_size, leaf_size)
+    return downsampler.filter().to_array()
+
+
+def pcl_box_filter(points, x_limits, y_limits, z_limits):
+    """The chained python-pcl PassThrough filters that box_filter replaces."""
+    cloud = pcl.PointCloud(points)
+    for field, limits in (("z", z_limits), ("x", x_limits), ("y", y_limits)):
+        passthrough = cloud.make_passthrough_filter()
+        passthrough.set_filter_field_name(field)
+        passthrough.set_filter_limits(*limits)
+        cloud = passthrough.filter()
+    return cloud.to_array()
+
+
+def get_pointcloud(size, max_depth, rng):
+    """Get a pointcloud that fills a camera frustum, like a RealSense pointcloud."""
+    z = rng.uniform(0.0, max_depth, size)
+    x = rng.uniform(-0.6, 0.6, size) * z
+    y = rng.uniform(-0.4, 0.4, size) * z
+    return np.stack((x, y, z), axis=1).astype(np.float32)
+
+
+def time_ms(func, repeats):
+    """Get the fastest time to run func, in milliseconds."""
+    return min(timeit.repeat(func, number=1, repeat=repeats)) * 1e3
+
+
+def same_points(expected, actual):
+    """Check that two pointclouds contain the same points, in any order."""
+    if expected.shape != actual.shape:
+        return False
+    expected = expected[np.lexsort(expected.T)]
+    actual = actual[np.lexsort(actual.T)]
+    return np.allclose(expected, actual, atol=1e-5)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000, 200000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cases = [
+        (
+            "realsense",
+            2.0,
+            lambda p: filter_pointcloud(
+                p, z_limits=REALSENSE_Z_LIMITS, leaf_size=REALSENSE_LEAF_SIZE
+            ),
+            lambda p: pcl_filter(p, REALSENSE_Z_LIMITS, REALSENSE_LEAF_SIZE),
+        ),
+        (
+            "gripper",
+            0.5,
+            lambda p: filter_pointcloud(
+                p, z_limits=GRIPPER_Z_LIMITS, leaf_size=GRIPPER_LEAF_SIZE
+            ),
+            lambda p: pcl_filter(p, GRIPPER_Z_LIMITS, GRIPPER_LEAF_SIZE),
+        ),
+        (
+            "gripper box",
+            0.5,
+            lambda p: box_filter(p, **GRIPPER_BOX),
+            lambda p: pcl_box_filter(p, **GRIPPER_BOX),
+        ),
+    ]
+
+    print(f"{'filter':>12} | {'points':>7} | {'numpy':>9} | {'pcl':>9} | match")
+    for name, max_depth, numpy_func, pcl_func in cases:
+        for size in args.sizes:
+            points = get_pointcloud(size, max_depth, rng)
+            numpy_ms = time_ms(lambda: numpy_func(points), args.repeats)
+            if pcl is None:
+                print(
+                    f"{name:>12} | {size:>7} | {numpy_ms:>6.2f} ms | {'n/a':>9} | n/a"
+                )
+                continue
+            pcl_ms = time_ms(lambda: pcl_func(points), args.repeats)
+            match = same_points(pcl_func(points), numpy_func(points))
+            print(
+                f"{name:>12} | {size:>7} | {numpy_ms:>6.2f} ms | {pcl_ms:>6.2f} ms | {match}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Benchmarks `conversions.project_points_to_mask` against building the same mask from
+# `conversions.project_points_to_pixels`, which deduplicates the pixels with a sort
+# before they are written into the mask. Both include the 3x3 dilation that
+# ConfigureVideoStreams applies to the depth AR overlay masks.
+#
+# Example usage:
+#   python3 benchmark_project_points.py
+#   python3 benchmark_project_points.py --sizes 10000 1000000 --repeats 10
+
+import argparse
+import timeit
+
+import cv2
+import numpy as np
+
+from stretch_web_teleop_helpers.conversions import (
+    project_points_to_mask,
+    project_points_to_pixels,
+)
+
+# A D435 at 640x480, with approximate intrinsics
+WIDTH, HEIGHT = 640, 480
+PROJ = np.array(
+    [
+        [385.0, 0.0, 320.0, 0.0],
+        [0.0, 385.0, 240.0, 0.0],
+        [0.0, 0.0, 1.0, 0.0],
+    ]
+)
+EXPANSION_KERNEL_SIZE = 3
+
+
+def pixels_to_mask(points):
+    """The mask as the callers built it from project_points_to_pixels."""
+    uv = project_points_to_pixels(points, PROJ, width=WIDTH, height=HEIGHT)
+    mask = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+    mask[uv[:, 1], uv[:, 0]] = 255
+    return cv2.dilate(
+        mask,
+        np.ones((EXPANSION_KERNEL_SIZE, EXPANSION_KERNEL_SIZE), np.uint8),
+        iterations=1,
+    )
+
+
+def time_ms(func, repeats):
+    """The best time of one call to func, in milliseconds."""
+    number = 10
+    return min(timeit.repeat(func, number=number, repeat=repeats)) / number * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    mask = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+    print(
+        f"{'points':>8} | {'pixels + dedup':>14} | {'mask':>10} | {'mask (reused)':>13} | speedup"
+    )
+    for size in args.sizes:
+        # Points in front of the camera, some of which project outside the image
+        points = np.column_stack(
+            (
+                rng.uniform(-1.5, 1.5, size),
+                rng.uniform(-1.2, 1.2, size),
+                rng.uniform(0.3, 2.0, size),
+            )
+        ).astype(np.float32)
+
+        # Check that both methods agree
+        expected = pixels_to_mask(points)
+        actual = project_points_to_mask(
+            points,
+            PROJ,
+            width=WIDTH,
+            height=HEIGHT,
+            dilation_kernel_size=EXPANSION_KERNEL_SIZE,
+        )
+        num_different = np.count_nonzero(expected != actual)
+        assert num_different <= 1e-4 * expected.size, num_different
+
+        pixels_ms = time_ms(lambda: pixels_to_mask(points), args.repeats)
+        mask_ms = time_ms(
+            lambda: project_points_to_mask(
+                points,
+                PROJ,
+                width=WIDTH,
+                height=HEIGHT,
+                dilation_kernel_size=EXPANSION_KERNEL_SIZE,
+            ),
+            args.repeats,
+        )
+
+        def reused():
+            mask.fill(0)
+            project_points_to_mask(
+                points, PROJ, mask, dilation_kernel_size=EXPANSION_KERNEL_SIZE
+            )
+
+        reused_ms = time_ms(reused, args.repeats)
+        print(
+            f"{size:>8} | {pixels_ms:>11.2f} ms | {mask_ms:>7.2f} ms | {reused_ms:>10.2f} ms | "
+            f"{pixels_ms / reused_ms:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
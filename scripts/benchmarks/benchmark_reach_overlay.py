@@ -0,0 +1,111 @@
+# Benchmarks the two ways ConfigureVideoStreams can compute the RealSense depth AR
+# (reach) overlay mask from an aligned depth image:
+#   - pointcloud: deproject, filter, voxel-downsample, transform to base_link,
+#     project back into the image, and dilate.
+#   - image: compute the planar distance from the base of every depth pixel directly.
+# The depth images are synthetic renders of the floor, as seen from the head camera.
+#
+# Example usage:
+#   python3 benchmark_reach_overlay.py
+#   python3 benchmark_reach_overlay.py --tilt 0.6 --repeats 10
+
+import argparse
+import timeit
+
+import numpy as np
+from video_pipeline.synthetic import (
+    D435_RESOLUTIONS,
+    get_camera_to_base,
+    render_floor_depth,
+)
+
+from stretch_web_teleop_helpers.conversions import (
+    DepthDeprojector,
+    project_points_to_mask,
+    transform_points,
+)
+from stretch_web_teleop_helpers.pointcloud_filters import filter_pointcloud
+
+# The same constants as ConfigureVideoStreams
+DOWNSAMPLE_DISTANCE = 0.012
+EXPANSION_KERNEL_SIZE = 3
+
+
+def pointcloud_mask(deprojector, depth_image, transform, proj):
+    """The pointcloud-based mask, as in ConfigureVideoStreams."""
+    points = filter_pointcloud(
+        deprojector.deproject(depth_image),
+        z_limits=(0.01, 1.5),
+        leaf_size=DOWNSAMPLE_DISTANCE,
+    )
+    points_in_base = transform_points(points, transform)
+    dist = np.sqrt(points_in_base[:, 0] ** 2 + points_in_base[:, 1] ** 2)
+    points_in_range = points[(dist > 0.25) & (dist < 1)]
+    return project_points_to_mask(
+        points_in_range,
+        proj,
+        width=depth_image.shape[1],
+        height=depth_image.shape[0],
+        dilation_kernel_size=EXPANSION_KERNEL_SIZE,
+    )
+
+
+def image_mask(deprojector, depth_image, transform):
+    """The image-space mask, as in ConfigureVideoStreams."""
+    return deprojector.planar_distance_mask(
+        depth_image, transform, min_dist=0.25, max_dist=1.0, depth_limits=(0.01, 1.5)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tilt", type=float, default=0.8, help="Head tilt down (rad)")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    transform = get_camera_to_base(args.tilt)
+    print(
+        f"{'resolution':>10} | {'pointcloud':>10} | {'image':>8} | speedup | "
+        "mask pixels (pointcloud / image)"
+    )
+    for name, (height, width, f) in D435_RESOLUTIONS.items():
+        proj = np.array([[f, 0, width / 2, 0], [0, f, height / 2, 0], [0, 0, 1, 0]])
+        depth_image = render_floor_depth(height, width, f, transform, rng)
+        deprojector = DepthDeprojector()
+        deprojector.set_intrinsics(
+            f_x=f, f_y=f, c_x=width / 2, c_y=height / 2, shape=depth_image.shape
+        )
+
+        pointcloud_ms = (
+            min(
+                timeit.repeat(
+                    lambda: pointcloud_mask(deprojector, depth_image, transform, proj),
+                    number=1,
+                    repeat=args.repeats,
+                )
+            )
+            * 1e3
+        )
+        image_ms = (
+            min(
+                timeit.repeat(
+                    lambda: image_mask(deprojector, depth_image, transform),
+                    number=1,
+                    repeat=args.repeats,
+                )
+            )
+            * 1e3
+        )
+        num_pointcloud = np.count_nonzero(
+            pointcloud_mask(deprojector, depth_image, transform, proj)
+        )
+        num_image = np.count_nonzero(image_mask(deprojector, depth_image, transform))
+        print(
+            f"{name:>10} | {pointcloud_ms:>7.2f} ms | {image_ms:>5.2f} ms | "
+            f"{pointcloud_ms / image_ms:>6.1f}x | {num_pointcloud} / {num_image}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Benchmarks `conversions.transform_points` against the per-point PyKDL loop that
+# `ConfigureVideoStreams.do_transform_cloud` used to transform the RealSense pointcloud.
+# If PyKDL is not installed, the per-point loop is run in pure Python instead.
+#
+# Example usage:
+#   python3 benchmark_transform_points.py
+#   python3 benchmark_transform_points.py --sizes 20000 200000 --repeats 5
+
+import argparse
+import timeit
+
+import numpy as np
+from geometry_msgs.msg import TransformStamped
+
+from stretch_web_teleop_helpers.conversions import transform_points, transform_to_matrix
+
+try:
+    import PyKDL
+except ImportError:
+    PyKDL = None
+
+
+def get_transform():
+    """Get a transform similar to the one between base_link and camera_color_optical_frame."""
+    transform = TransformStamped()
+    transform.transform.translation.x = 0.012
+    transform.transform.translation.y = 0.011
+    transform.transform.translation.z = 1.293
+    transform.transform.rotation.x = -0.633
+    transform.transform.rotation.y = 0.643
+    transform.transform.rotation.z = -0.303
+    transform.transform.rotation.w = 0.306
+    return transform
+
+
+def per_point_loop(points, transform):
+    """The per-point loop that transform_points replaces."""
+    if PyKDL is not None:
+        t_kdl = PyKDL.Frame(
+            PyKDL.Rotation.Quaternion(
+                transform.transform.rotation.x,
+                transform.transform.rotation.y,
+                transform.transform.rotation.z,
+                transform.transform.rotation.w,
+            ),
+            PyKDL.Vector(
+                transform.transform.translation.x,
+                transform.transform.translation.y,
+                transform.transform.translation.z,
+            ),
+        )
+        points_out = []
+        for p_in in points:
+            p_out = t_kdl * PyKDL.Vector(p_in[0], p_in[1], p_in[2])
+            points_out.append([p_out[0], p_out[1], p_out[2]])
+        return np.array(points_out)
+
+    matrix = transform_to_matrix(transform).tolist()
+    points_out = []
+    for x, y, z in points.tolist():
+        points_out.append(
+            [row[0] * x + row[1] * y + row[2] * z + row[3] for row in matrix[:3]]
+        )
+    return np.array(points_out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[20000, 50000, 100000, 200000]
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    transform = get_transform()
+    rng = np.random.default_rng(0)
+    loop_name = "PyKDL loop" if PyKDL is not None else "Python loop"
+    print(
+        f"{'points':>8} | {loop_name:>12} | {'numpy':>10} | {'numpy (out)':>11} | speedup"
+    )
+    for size in args.sizes:
+        points = rng.uniform(-2.0, 2.0, (size, 3)).astype(np.float32)
+        out = np.empty_like(points)
+
+        # Check that both methods agree
+        expected = per_point_loop(points, transform)
+        actual = transform_points(points, transform)
+        assert np.allclose(expected, actual, atol=1e-4)
+
+        loop_ms = (
+            min(
+                timeit.repeat(
+                    lambda: per_point_loop(points, transform),
+                    number=1,
+                    repeat=args.repeats,
+                )
+            )
+            * 1e3
+        )
+        numpy_ms = (
+            min(
+                timeit.repeat(
+                    lambda: transform_points(points, transform),
+                    number=10,
+                    repeat=args.repeats,
+                )
+            )
+            / 10
+            * 1e3
+        )
+        numpy_out_ms = (
+            min(
+                timeit.repeat(
+                    lambda: transform_points(points, transform, out=out),
+                    number=10,
+                    repeat=args.repeats,
+                )
+            )
+            / 10
+            * 1e3
+        )
+        print(
+            f"{size:>8} | {loop_ms:>9.2f} ms | {numpy_ms:>7.3f} ms | {numpy_out_ms:>8.3f} ms | "
+            f"{loop_ms / numpy_out_ms:.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
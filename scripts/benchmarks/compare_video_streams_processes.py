@@ -0,0 +1,189 @@
+# Compares the CPU usage and resident memory (RSS) of processing the video streams in
+# one process per stream (like the default launch, with one configure_video_streams
+# per camera) against one process with a worker thread per stream (like
+# `video_streams_single_process:=true`), without a ROS graph. Every stream runs its
+# end-to-end pipeline from the video_pipeline benchmark (decode, optional depth AR
+# overlay, perspective transform, and encode) on a synthetic frame at its target
+# fps, and both layouts are measured from /proc like measure_video_streams_resources.py.
+#
+# This isolates what the layouts cost in Python and the pipeline itself (interpreters,
+# imported libraries, frame buffers, and the GIL). It does not include what each
+# ROS node adds (its executor, DDS participant, subscriptions, and TF listener), so
+# on the robot the difference is larger; measure that with
+# measure_video_streams_resources.py while the web interface is launched.
+#
+# Example usage (from scripts/benchmarks):
+#   python3 compare_video_streams_processes.py
+#   python3 compare_video_streams_processes.py --depth-ar --fps 30 --duration 30
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import yaml
+from measure_video_streams_resources import get_cpu_time, get_rss_mb
+from video_pipeline.__main__ import PARAMS_FILE
+from video_pipeline.cases import build_cases
+
+STREAMS = ("overhead", "realsense", "gripper")
+# The video_pipeline case that processes one frame of every stream
+PIPELINE_CASES = {
+    "overhead": "pipeline/overhead.wide_angle_cam@1024x768",
+    "realsense": "pipeline/realsense.default@640x480",
+    "gripper": "pipeline/gripper.d405@480x270",
+}
+DEPTH_AR_PIPELINE_CASES = {
+    "overhead": "pipeline/overhead.wide_angle_cam@1024x768",
+    "realsense": "pipeline/realsense.default.depth_ar@640x480",
+    "gripper": "pipeline/gripper.d405.depth_ar@480x270",
+}
+
+
+def run_stream(fn, fps, duration, frames):
+    """Process a frame at the target fps (skipping ticks when behind) until done."""
+    period = 1.0 / fps
+    end_time = time.monotonic() + duration
+    next_time = time.monotonic()
+    while next_time < end_time:
+        fn()
+        frames.append(time.monotonic())
+        next_time += period
+        now = time.monotonic()
+        if next_time < now:
+            # Like a ROS rate, skip the ticks that were missed
+            next_time += (now - next_time) // period * period + period
+        time.sleep(max(next_time - now, 0.0))
+
+
+def run_worker(args):
+    """Process the given streams, each in its own thread, and print their fps."""
+    with open(args.params, "r") as params:
+        image_params = yaml.safe_load(params)
+    pipeline_cases = DEPTH_AR_PIPELINE_CASES if args.depth_ar else PIPELINE_CASES
+    names = {pipeline_cases[stream] for stream in args.worker}
+    cases = {
+        case.name: case for case in build_cases(image_params) if case.name in names
+    }
+    # Only keep the frames of the streams this process handles
+    gc.collect()
+
+    frames = {stream: [] for stream in args.worker}
+    threads = [
+        threading.Thread(
+            target=run_stream,
+            args=(
+                cases[pipeline_cases[stream]].fn,
+                args.fps,
+                args.warmup + args.duration,
+                frames[stream],
+            ),
+        )
+        for stream in args.worker
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    fps = {}
+    for stream, times in frames.items():
+        # The fps while the process was measured, after the warmup
+        measured = [t for t in times if t >= times[0] + args.warmup]
+        fps[stream] = (len(measured) - 1) / (measured[-1] - measured[0])
+    print(json.dumps(fps), flush=True)
+
+
+def measure_layout(layout, args):
+    """Run the streams in a layout's processes, and measure them after the warmup."""
+    if layout == "processes":
+        groups = [[stream] for stream in args.streams]
+    else:
+        groups = [list(args.streams)]
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--params",
+                args.params,
+                "--fps",
+                str(args.fps),
+                "--warmup",
+                str(args.warmup),
+                "--duration",
+                str(args.duration),
+                *(["--depth-ar"] if args.depth_ar else []),
+                "--worker",
+                *group,
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for group in groups
+    ]
+    pids = [process.pid for process in processes]
+
+    # Wait for the processes to build their frames and warm up
+    time.sleep(args.warmup)
+    start_time = time.monotonic()
+    start_cpu = {pid: get_cpu_time(pid) for pid in pids}
+    rss_samples = {pid: [] for pid in pids}
+    while time.monotonic() - start_time < args.duration * 0.9:
+        for pid in pids:
+            rss_samples[pid].append(get_rss_mb(pid))
+        time.sleep(args.interval)
+    elapsed = time.monotonic() - start_time
+    cpu = sum((get_cpu_time(pid) - start_cpu[pid]) / elapsed * 100.0 for pid in pids)
+    rss = sum(sum(samples) / len(samples) for samples in rss_samples.values())
+
+    fps = {}
+    for process in processes:
+        stdout, _ = process.communicate()
+        fps.update(json.loads(stdout.strip().splitlines()[-1]))
+    return {
+        "num_processes": len(processes),
+        "cpu_percent": round(cpu, 1),
+        "rss_mb": round(rss, 1),
+        "fps": {stream: round(fps[stream], 1) for stream in args.streams},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--params", type=str, default=PARAMS_FILE)
+    parser.add_argument("--streams", nargs="+", choices=STREAMS, default=list(STREAMS))
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument(
+        "--depth-ar",
+        action="store_true",
+        help="Blend the depth AR overlays onto the realsense and gripper streams",
+    )
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds")
+    parser.add_argument(
+        "--worker", nargs="+", choices=STREAMS, help="(Internal) process these streams"
+    )
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args)
+        return
+
+    print(
+        f"{'layout':>9} | processes | {'cpu (%)':>7} | {'rss (MB)':>8} | fps per stream"
+    )
+    for layout in ("processes", "threads"):
+        result = measure_layout(layout, args)
+        print(
+            f"{layout:>9} | {result['num_processes']:>9} | {result['cpu_percent']:>7.1f} | "
+            f"{result['rss_mb']:>8.1f} | {result['fps']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,667 @@
+# Load tests configure_video_streams with synthetic camera topics, to find the camera
+# profiles and overlays at which the video streams can no longer keep up. It publishes
+# moving synthetic frames (and depth, pointclouds, camera infos, joint states, body
+# landmarks, and the head camera's transform) on every topic the video streams
+# subscribe to, sweeps the camera profiles and AR overlay toggles, and for every
+# scenario reports each stream's input and output fps, output latency, and slowest
+# stage (from /diagnostics), along with the CPU usage and memory of the
+# configure_video_streams process(es).
+#
+# Launch the web interface *without* the cameras (so this is the only publisher of
+# the camera topics), view the streams (or pass --no-sink-check), then run this. Camera
+# profiles are "<width>x<height>x<fps>", as in multi_camera.launch.py.
+#
+# Example usage:
+#   python3 load_test_video_streams.py
+#   python3 load_test_video_streams.py --realsense-profiles 424x240x15 1280x720x30 \
+#       --overlays none realsense_depth_ar all --duration 20 --output results.json
+
+import argparse
+import itertools
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+import rclpy
+from diagnostic_msgs.msg import DiagnosticArray
+from geometry_msgs.msg import TransformStamped
+from measure_video_streams_resources import find_pids, get_cpu_time, get_rss_mb
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
+from rclpy.executors import MultiThreadedExecutor
+from rclpy.node import Node
+from rclpy.qos import QoSProfile, ReliabilityPolicy
+from sensor_msgs.msg import (
+    CameraInfo,
+    CompressedImage,
+    Image,
+    JointState,
+    PointCloud2,
+    PointField,
+)
+from std_msgs.msg import String
+from std_srvs.srv import SetBool
+from tf2_ros import StaticTransformBroadcaster
+from video_pipeline.synthetic import (
+    encode_jpeg,
+    get_camera_to_base,
+    render_body_landmarks,
+    render_color_image,
+    render_floor_depth,
+    render_gripper_scene,
+)
+
+from stretch_web_teleop_helpers.stream_metrics import LatencyHistogram
+
+# The AR overlay services of configure_video_streams
+OVERLAYS = (
+    "realsense_depth_ar",
+    "realsense_body_pose_ar",
+    "gripper_depth_ar",
+    "expanded_gripper",
+)
+# The compressed topics that configure_video_streams publishes, per stream
+OUTPUT_TOPICS = {
+    "overhead": "/navigation_camera/image_raw/rotated/compressed",
+    "realsense": "/camera/color/image_raw/rotated/compressed",
+    "gripper": "/gripper_camera/image_raw/cropped/compressed",
+}
+# The focal length of the cameras, as a fraction of the image width
+FOCAL_LENGTH_RATIOS = {"overhead": 0.5, "realsense": 0.71, "gripper": 0.45}
+HEAD_TILT = 0.8
+SENSOR_QOS = QoSProfile(depth=1, reliability=ReliabilityPolicy.BEST_EFFORT)
+
+
+def parse_profile(profile):
+    """Parse a "<width>x<height>x<fps>" camera profile."""
+    width, height, fps = profile.split("x")
+    return int(width), int(height), float(fps)
+
+
+def parse_target_fps(values, default):
+    """
+    Parse the streams' target fps from "<stream>=<fps>" overrides of a default, which
+    mirror configure_video_streams's target_fps and <stream>_target_fps parameters.
+    """
+    target_fps = {stream: default for stream in OUTPUT_TOPICS}
+    for value in values:
+        stream, fps = value.split("=")
+        if stream not in target_fps:
+            raise ValueError(
+                f"Unknown stream {stream}, options are {list(OUTPUT_TOPICS)}"
+            )
+        target_fps[stream] = float(fps)
+    return target_fps
+
+
+def rotation_matrix_to_quaternion(rotation):
+    """Convert a (proper) 3x3 rotation matrix to an (x, y, z, w) quaternion."""
+    w = np.sqrt(max(0.0, 1.0 + np.trace(rotation))) / 2.0
+    x = np.copysign(
+        np.sqrt(max(0.0, 1.0 + rotation[0, 0] - rotation[1, 1] - rotation[2, 2])) / 2,
+        rotation[2, 1] - rotation[1, 2],
+    )
+    y = np.copysign(
+        np.sqrt(max(0.0, 1.0 - rotation[0, 0] + rotation[1, 1] - rotation[2, 2])) / 2,
+        rotation[0, 2] - rotation[2, 0],
+    )
+    z = np.copysign(
+        np.sqrt(max(0.0, 1.0 - rotation[0, 0] - rotation[1, 1] + rotation[2, 2])) / 2,
+        rotation[1, 0] - rotation[0, 1],
+    )
+    return x, y, z, w
+
+
+def render_moving_frames(image, num_frames, protect_bottom=0):
+    """
+    Render frames of moving content from an image: the image scrolls horizontally,
+    and a disk moves across it.
+
+    Parameters
+    ----------
+    image: The first frame.
+    num_frames: The number of frames, after which the motion repeats.
+    protect_bottom: The number of rows at the bottom of the image that do not
+        move (e.g., the gripper's aruco markers).
+    """
+    height, width = image.shape[:2]
+    moving_height = height - protect_bottom
+    frames = []
+    for i in range(num_frames):
+        frame = image.copy()
+        shift = int(i * width / num_frames)
+        frame[:moving_height] = np.roll(image[:moving_height], shift, axis=1)
+        center = (
+            int(width * (0.5 + 0.4 * np.cos(2 * np.pi * i / num_frames))),
+            int(moving_height * (0.5 + 0.4 * np.sin(2 * np.pi * i / num_frames))),
+        )
+        cv2.circle(frame, center, max(moving_height // 10, 2), (255, 255, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+def depth_to_points(depth, f):
+    """Deproject a depth image (in mm) to an (N, 3) float32 pointcloud."""
+    height, width = depth.shape
+    v, u = np.nonzero(depth)
+    z = depth[v, u].astype(np.float32) / 1000.0
+    x = (u - width / 2) * z / f
+    y = (v - height / 2) * z / f
+    return np.stack((x, y, z), axis=1).astype(np.float32)
+
+
+def points_to_msg(points, frame_id):
+    """Create an unorganized PointCloud2 message with x, y, z fields."""
+    msg = PointCloud2()
+    msg.header.frame_id = frame_id
+    msg.height = 1
+    msg.width = points.shape[0]
+    msg.fields = [
+        PointField(name=name, offset=4 * i, datatype=PointField.FLOAT32, count=1)
+        for i, name in enumerate("xyz")
+    ]
+    msg.is_bigendian = False
+    msg.point_step = 12
+    msg.row_step = 12 * points.shape[0]
+    msg.is_dense = True
+    msg.data = points.tobytes()
+    return msg
+
+
+def depth_to_msg(depth, frame_id, compressed):
+    """Create an aligned depth message, raw or with compressedDepth PNG encoding."""
+    if not compressed:
+        msg = Image(
+            height=depth.shape[0],
+            width=depth.shape[1],
+            encoding="16UC1",
+            step=depth.shape[1] * 2,
+            data=depth.tobytes(),
+        )
+    else:
+        # configure_video_streams skips the 12-byte compressedDepth header
+        msg = CompressedImage(
+            format="16UC1; compressedDepth png",
+            data=bytes(12) + encode_png(depth),
+        )
+    msg.header.frame_id = frame_id
+    return msg
+
+
+def encode_png(image):
+    """Encode an image as a PNG."""
+    success, data = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not success:
+        raise RuntimeError("Failed to compress image")
+    return data.tobytes()
+
+
+def image_to_msg(image, frame_id, compressed, rgb, jpeg_quality):
+    """Create a camera image message, as the camera drivers publish them."""
+    if compressed:
+        msg = CompressedImage(
+            format=("rgb8" if rgb else "bgr8") + "; jpeg compressed bgr8",
+            data=encode_jpeg(image, jpeg_quality),
+        )
+    else:
+        msg = Image(
+            height=image.shape[0],
+            width=image.shape[1],
+            encoding="rgb8" if rgb else "bgr8",
+            step=image.shape[1] * 3,
+            data=(image[:, :, ::-1] if rgb else image).tobytes(),
+        )
+    msg.header.frame_id = frame_id
+    return msg
+
+
+def camera_info_to_msg(width, height, f, frame_id):
+    """Create a camera info message for a camera with its principal point at the center."""
+    msg = CameraInfo(width=width, height=height)
+    msg.header.frame_id = frame_id
+    msg.k = [f, 0.0, width / 2, 0.0, f, height / 2, 0.0, 0.0, 1.0]
+    msg.p = [f, 0.0, width / 2, 0.0, 0.0, f, height / 2, 0.0, 0.0, 0.0, 1.0, 0.0]
+    return msg
+
+
+class SyntheticCameraStream:
+    """The pre-rendered messages of one camera, published round-robin."""
+
+    def __init__(self, images, depths, camera_info):
+        self.images = images
+        self.depths = depths
+        self.camera_info = camera_info
+        self.index = 0
+
+    def next(self):
+        """Get the next image and depth (if any) messages."""
+        i = self.index
+        self.index = (self.index + 1) % len(self.images)
+        depth = self.depths[i % len(self.depths)] if self.depths else None
+        return self.images[i], depth
+
+
+class VideoStreamsLoadGenerator(Node):
+    """
+    Publishes synthetic camera topics, and measures configure_video_streams' outputs.
+    """
+
+    def __init__(self, args):
+        super().__init__("video_streams_load_generator")
+        self.args = args
+        compressed = not args.raw
+        image_type = CompressedImage if compressed else Image
+        suffix = "/compressed" if compressed else ""
+        depth_suffix = "/compressedDepth" if compressed else ""
+
+        # Inputs
+        self.image_publishers = {
+            "overhead": self.create_publisher(
+                Image, "/navigation_camera/image_raw", SENSOR_QOS
+            ),
+            "realsense": self.create_publisher(
+                image_type, "/camera/color/image_raw" + suffix, SENSOR_QOS
+            ),
+            "gripper": self.create_publisher(
+                image_type, "/gripper_camera/image_raw" + suffix, SENSOR_QOS
+            ),
+        }
+        if args.aligned_depth:
+            depth_topics = {
+                "realsense": "/camera/aligned_depth_to_color/image_raw" + depth_suffix,
+                "gripper": "/gripper_camera/aligned_depth_to_color/image_raw"
+                + depth_suffix,
+            }
+            self.depth_publishers = {
+                stream: self.create_publisher(image_type, topic, SENSOR_QOS)
+                for stream, topic in depth_topics.items()
+            }
+        else:
+            self.depth_publishers = {
+                "realsense": self.create_publisher(
+                    PointCloud2, "/camera/depth/color/points", SENSOR_QOS
+                ),
+                "gripper": self.create_publisher(
+                    PointCloud2, "/gripper_camera/depth/color/points", SENSOR_QOS
+                ),
+            }
+        self.camera_info_publishers = {
+            "realsense": self.create_publisher(
+                CameraInfo, "/camera/color/camera_info", SENSOR_QOS
+            ),
+            "gripper": self.create_publisher(
+                CameraInfo, "/gripper_camera/color/camera_info", SENSOR_QOS
+            ),
+        }
+        self.joint_state_publisher = self.create_publisher(
+            JointState, "/stretch/joint_states", 1
+        )
+        self.body_landmarks_publisher = self.create_publisher(
+            String, "/human_estimates/latest_body_pose", SENSOR_QOS
+        )
+        self.body_landmarks = render_body_landmarks(np.random.default_rng(0))
+        self.publish_camera_transform()
+
+        # The overlay services
+        self.overlay_clients = {
+            overlay: self.create_client(SetBool, overlay) for overlay in OVERLAYS
+        }
+
+        # Outputs
+        self.lock = threading.Lock()
+        self.stream_lock = threading.Lock()
+        self.streams = {}
+        self.timers = []
+        self.input_counts = {stream: 0 for stream in OUTPUT_TOPICS}
+        self.output_counts = {stream: 0 for stream in OUTPUT_TOPICS}
+        self.output_bytes = {stream: 0 for stream in OUTPUT_TOPICS}
+        self.output_latencies = {stream: LatencyHistogram() for stream in OUTPUT_TOPICS}
+        self.slowest_stages = {}
+        self.output_subscribers = [
+            self.create_subscription(
+                CompressedImage,
+                topic,
+                lambda msg, stream=stream: self.output_callback(stream, msg),
+                SENSOR_QOS,
+                callback_group=MutuallyExclusiveCallbackGroup(),
+            )
+            for stream, topic in OUTPUT_TOPICS.items()
+        ]
+        self.diagnostics_subscriber = self.create_subscription(
+            DiagnosticArray, "/diagnostics", self.diagnostics_callback, 10
+        )
+
+    def publish_camera_transform(self):
+        """Publish the head camera's transform, for the realsense depth AR overlay."""
+        transform = get_camera_to_base(HEAD_TILT)
+        msg = TransformStamped()
+        msg.header.stamp = self.get_clock().now().to_msg()
+        msg.header.frame_id = "base_link"
+        msg.child_frame_id = "camera_color_optical_frame"
+        msg.transform.translation.x = float(transform[0, 3])
+        msg.transform.translation.y = float(transform[1, 3])
+        msg.transform.translation.z = float(transform[2, 3])
+        (
+            msg.transform.rotation.x,
+            msg.transform.rotation.y,
+            msg.transform.rotation.z,
+            msg.transform.rotation.w,
+        ) = (float(q) for q in rotation_matrix_to_quaternion(transform[:3, :3]))
+        self.static_transform_broadcaster = StaticTransformBroadcaster(self)
+        self.static_transform_broadcaster.sendTransform(msg)
+
+    def render_streams(self, profiles, jpeg_quality):
+        """Pre-render every stream's messages for a scenario's camera profiles."""
+        rng = np.random.default_rng(0)
+        compressed = not self.args.raw
+        num_frames = self.args.num_frames
+        streams = {}
+
+        width, height, _ = profiles["overhead"]
+        images = render_moving_frames(
+            render_color_image(height, width, rng), num_frames
+        )
+        streams["overhead"] = SyntheticCameraStream(
+            [image_to_msg(i, "nav_camera", False, False, 0) for i in images], [], None
+        )
+
+        width, height, _ = profiles["realsense"]
+        f = FOCAL_LENGTH_RATIOS["realsense"] * width
+        images = render_moving_frames(
+            render_color_image(height, width, rng), num_frames
+        )
+        depth = render_floor_depth(height, width, f, get_camera_to_base(HEAD_TILT), rng)
+        frame_id = "camera_color_optical_frame"
+        streams["realsense"] = SyntheticCameraStream(
+            [image_to_msg(i, frame_id, compressed, True, jpeg_quality) for i in images],
+            [
+                depth_to_msg(depth, frame_id, compressed)
+                if self.args.aligned_depth
+                else points_to_msg(depth_to_points(depth, f), frame_id)
+            ],
+            camera_info_to_msg(width, height, f, frame_id),
+        )
+
+        width, height, _ = profiles["gripper"]
+        f = FOCAL_LENGTH_RATIOS["gripper"] * width
+        image, depth = render_gripper_scene(height, width, rng)
+        images = render_moving_frames(image, num_frames, protect_bottom=height // 2)
+        frame_id = "gripper_camera_color_optical_frame"
+        streams["gripper"] = SyntheticCameraStream(
+            [image_to_msg(i, frame_id, compressed, True, jpeg_quality) for i in images],
+            [
+                depth_to_msg(depth, frame_id, compressed)
+                if self.args.aligned_depth
+                else points_to_msg(depth_to_points(depth, f), frame_id)
+            ],
+            camera_info_to_msg(width, height, f, frame_id),
+        )
+        return streams
+
+    def start_scenario(self, profiles, jpeg_quality, overlays):
+        """Switch to a scenario's camera profiles and overlays."""
+        streams = self.render_streams(profiles, jpeg_quality)
+        for timer in self.timers:
+            self.destroy_timer(timer)
+        with self.stream_lock:
+            self.streams = streams
+        self.timers = [
+            self.create_timer(
+                1.0 / profiles[stream][2],
+                lambda stream=stream: self.publish_stream(stream),
+                callback_group=MutuallyExclusiveCallbackGroup(),
+            )
+            for stream in OUTPUT_TOPICS
+        ]
+        return {
+            overlay: self.set_overlay(overlay, overlay in overlays)
+            for overlay in OVERLAYS
+        }
+
+    def set_overlay(self, overlay, enabled, timeout=2.0):
+        """Toggle an overlay service. Returns whether the call succeeded."""
+        client = self.overlay_clients[overlay]
+        if not client.wait_for_service(timeout_sec=timeout):
+            return False
+        future = client.call_async(SetBool.Request(data=enabled))
+        deadline = time.monotonic() + timeout
+        while not future.done() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return future.done() and future.result() is not None and future.result().success
+
+    def publish_stream(self, stream):
+        """Publish a stream's next frame (and depth, camera info, and so on)."""
+        with self.stream_lock:
+            synthetic_stream = self.streams.get(stream, None)
+        if synthetic_stream is None:
+            return
+        image_msg, depth_msg = synthetic_stream.next()
+        stamp = self.get_clock().now().to_msg()
+        image_msg.header.stamp = stamp
+        self.image_publishers[stream].publish(image_msg)
+        if depth_msg is not None:
+            depth_msg.header.stamp = stamp
+            self.depth_publishers[stream].publish(depth_msg)
+        if synthetic_stream.camera_info is not None:
+            synthetic_stream.camera_info.header.stamp = stamp
+            self.camera_info_publishers[stream].publish(synthetic_stream.camera_info)
+        if stream == "realsense":
+            self.body_landmarks_publisher.publish(String(data=self.body_landmarks))
+        elif stream == "gripper":
+            self.joint_state_publisher.publish(
+                JointState(
+                    header=image_msg.header,
+                    name=["joint_wrist_roll", "joint_gripper_finger_left"],
+                    position=[0.3 * np.sin(time.monotonic()), 0.1],
+                )
+            )
+        with self.lock:
+            self.input_counts[stream] += 1
+
+    def output_callback(self, stream, msg):
+        latency = (
+            self.get_clock().now() - rclpy.time.Time.from_msg(msg.header.stamp)
+        ).nanoseconds / 1.0e9
+        with self.lock:
+            self.output_counts[stream] += 1
+            self.output_bytes[stream] += len(msg.data)
+            self.output_latencies[stream].record(latency)
+
+    def diagnostics_callback(self, msg):
+        for status in msg.status:
+            if status.hardware_id not in OUTPUT_TOPICS:
+                continue
+            for value in status.values:
+                if value.key == "slowest_stage":
+                    self.slowest_stages[status.hardware_id] = value.value
+
+    def reset_measurements(self):
+        with self.lock:
+            for stream in OUTPUT_TOPICS:
+                self.input_counts[stream] = 0
+                self.output_counts[stream] = 0
+                self.output_bytes[stream] = 0
+                self.output_latencies[stream].reset()
+            self.slowest_stages = {}
+
+    def get_measurements(self, elapsed):
+        with self.lock:
+            return {
+                stream: {
+                    "input_fps": round(self.input_counts[stream] / elapsed, 2),
+                    "output_fps": round(self.output_counts[stream] / elapsed, 2),
+                    "output_kbps": round(
+                        self.output_bytes[stream] * 8 / elapsed / 1000, 1
+                    ),
+                    "latency": self.output_latencies[stream].summarize(),
+                    "slowest_stage": self.slowest_stages.get(stream, None),
+                }
+                for stream in OUTPUT_TOPICS
+            }
+
+
+def run_scenario(node, profiles, jpeg_quality, overlays, args):
+    """Run one scenario, and measure the streams and the video stream processes."""
+    overlay_results = node.start_scenario(profiles, jpeg_quality, overlays)
+    time.sleep(args.warmup)
+
+    pids = find_pids(args.pattern)
+    start_cpu = {pid: get_cpu_time(pid) for pid in pids}
+    node.reset_measurements()
+    start_time = time.monotonic()
+    time.sleep(args.duration)
+    elapsed = time.monotonic() - start_time
+    streams = node.get_measurements(elapsed)
+    cpu = 0.0
+    rss = 0.0
+    for pid in pids:
+        try:
+            cpu += (get_cpu_time(pid) - start_cpu[pid]) / elapsed * 100.0
+            rss += get_rss_mb(pid)
+        except OSError:
+            pass
+    for stream, result in streams.items():
+        # configure_video_streams publishes each stream at most at its target fps, so
+        # the stream is saturated if it publishes noticeably fewer frames than that
+        # (or than it gets, if the camera is slower)
+        result["expected_fps"] = min(result["input_fps"], args.target_fps[stream])
+        result["saturated"] = result["output_fps"] < 0.9 * result["expected_fps"]
+    return {
+        "profiles": {
+            stream: "x".join(f"{value:g}" for value in profile)
+            for stream, profile in profiles.items()
+        },
+        "jpeg_quality": jpeg_quality,
+        "overlays": sorted(overlays),
+        "overlays_set": overlay_results,
+        "streams": streams,
+        "cpu_percent": round(cpu, 1),
+        "rss_mb": round(rss, 1),
+        "num_processes": len(pids),
+    }
+
+
+def print_result(result):
+    """Print one scenario's results as a line per stream."""
+    overlays = "+".join(result["overlays"]) or "none"
+    print(
+        f"profiles {result['profiles']}, jpeg quality {result['jpeg_quality']}, "
+        f"overlays {overlays}: cpu {result['cpu_percent']}% "
+        f"({result['num_processes']} processes), rss {result['rss_mb']} MB"
+    )
+    for stream, stream_result in result["streams"].items():
+        latency = stream_result["latency"]
+        print(
+            f"  {stream:>9} | in {stream_result['input_fps']:>5.1f} fps | "
+            f"out {stream_result['output_fps']:>5.1f} fps "
+            f"(expected {stream_result['expected_fps']:>5.1f}) | "
+            f"latency p50 {latency['p50_ms']:>6.1f} ms, p90 {latency['p90_ms']:>6.1f} ms | "
+            f"{stream_result['output_kbps']:>7.1f} kbps | "
+            f"slowest stage {stream_result['slowest_stage']}"
+            f"{'  SATURATED' if stream_result['saturated'] else ''}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--navigation-profiles", nargs="+", default=["1024x768x15"])
+    parser.add_argument(
+        "--realsense-profiles",
+        nargs="+",
+        default=["424x240x15", "640x480x15", "1280x720x15", "1280x720x30"],
+    )
+    parser.add_argument("--gripper-profiles", nargs="+", default=["480x270x15"])
+    parser.add_argument("--jpeg-qualities", nargs="+", type=int, default=[90])
+    parser.add_argument(
+        "--overlays",
+        nargs="+",
+        default=["none", *OVERLAYS, "all"],
+        help="Overlay combinations to sweep: 'none', 'all', or '+'-separated services",
+    )
+    parser.add_argument(
+        "--raw", action="store_true", help="Publish raw instead of compressed images"
+    )
+    parser.add_argument(
+        "--aligned-depth",
+        action="store_true",
+        help="Publish aligned depth images instead of pointclouds",
+    )
+    parser.add_argument(
+        "--target-fps",
+        type=float,
+        default=15.0,
+        help="configure_video_streams's target_fps parameter",
+    )
+    parser.add_argument(
+        "--stream-target-fps",
+        nargs="+",
+        default=[],
+        help="'<stream>=<fps>' for the streams whose <stream>_target_fps parameter is set",
+    )
+    parser.add_argument("--num-frames", type=int, default=30)
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--pattern", type=str, default="configure_video_streams.py")
+    parser.add_argument("--output", type=str, default=None, help="JSON results file")
+    args = parser.parse_args()
+
+    overlay_sets = []
+    for overlay_set in args.overlays:
+        if overlay_set == "none":
+            overlay_sets.append(set())
+        elif overlay_set == "all":
+            overlay_sets.append(set(OVERLAYS))
+        else:
+            overlays = set(overlay_set.split("+"))
+            unknown = overlays - set(OVERLAYS)
+            if unknown:
+                parser.error(f"Unknown overlays {unknown}, options are {OVERLAYS}")
+            overlay_sets.append(overlays)
+    try:
+        args.target_fps = parse_target_fps(args.stream_target_fps, args.target_fps)
+    except ValueError as err:
+        parser.error(str(err))
+
+    rclpy.init()
+    node = VideoStreamsLoadGenerator(args)
+    executor = MultiThreadedExecutor(num_threads=6)
+    executor.add_node(node)
+    spin_thread = threading.Thread(target=executor.spin, daemon=True)
+    spin_thread.start()
+
+    results = []
+    try:
+        for nav, realsense, gripper, jpeg_quality, overlays in itertools.product(
+            args.navigation_profiles,
+            args.realsense_profiles,
+            args.gripper_profiles,
+            args.jpeg_qualities,
+            overlay_sets,
+        ):
+            profiles = {
+                "overhead": parse_profile(nav),
+                "realsense": parse_profile(realsense),
+                "gripper": parse_profile(gripper),
+            }
+            result = run_scenario(node, profiles, jpeg_quality, overlays, args)
+            print_result(result)
+            results.append(result)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for overlay in OVERLAYS:
+            node.set_overlay(overlay, False, timeout=0.5)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote the results of {len(results)} scenarios to {args.output}")
+
+    executor.shutdown()
+    node.destroy_node()
+    rclpy.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Measures the CPU usage and resident memory (RSS) of the running configure_video_streams
+# process(es), to compare launching one process per stream against the single-process
+# mode (`video_streams_single_process:=true`). Run it while the web interface is
+# launched and the streams are being viewed, once per mode, and compare the totals.
+# It reads /proc directly, so it only runs on Linux.
+#
+# Example usage:
+#   python3 measure_video_streams_resources.py
+#   python3 measure_video_streams_resources.py --duration 60 --pattern configure_video_streams
+
+import argparse
+import os
+import time
+
+
+def find_pids(pattern):
+    """Get the PIDs of the processes whose command line contains the pattern."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit() or int(entry) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ").decode(errors="replace")
+        except OSError:
+            continue
+        if pattern in cmdline and "measure_video_streams_resources" not in cmdline:
+            pids.append(int(entry))
+    return pids
+
+
+def get_cpu_time(pid):
+    """Get the user + system CPU time of a process, in seconds."""
+    with open(f"/proc/{pid}/stat", "r") as f:
+        # The command name may contain spaces, so split after its closing paren
+        fields = f.read().rsplit(")", 1)[1].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    return (utime + stime) / os.sysconf("SC_CLK_TCK")
+
+
+def get_rss_mb(pid):
+    """Get the resident set size of a process, in MB."""
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def get_num_threads(pid):
+    """Get the number of threads of a process."""
+    return len(os.listdir(f"/proc/{pid}/task"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pattern", type=str, default="configure_video_streams.py")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds")
+    args = parser.parse_args()
+
+    pids = find_pids(args.pattern)
+    if len(pids) == 0:
+        print(f"No running processes match {args.pattern!r}")
+        return
+    print(f"Measuring {len(pids)} process(es) for {args.duration:.0f} s: {pids}")
+
+    start_time = time.monotonic()
+    start_cpu = {pid: get_cpu_time(pid) for pid in pids}
+    rss_samples = {pid: [] for pid in pids}
+    while time.monotonic() - start_time < args.duration:
+        for pid in pids:
+            rss_samples[pid].append(get_rss_mb(pid))
+        time.sleep(args.interval)
+    elapsed = time.monotonic() - start_time
+
+    print(
+        f"{'pid':>8} | {'cpu (%)':>8} | {'mean rss (MB)':>13} | {'max rss (MB)':>12} | threads"
+    )
+    total_cpu, total_rss, total_max_rss = 0.0, 0.0, 0.0
+    for pid in pids:
+        cpu = (get_cpu_time(pid) - start_cpu[pid]) / elapsed * 100.0
+        mean_rss = sum(rss_samples[pid]) / len(rss_samples[pid])
+        max_rss = max(rss_samples[pid])
+        total_cpu += cpu
+        total_rss += mean_rss
+        total_max_rss += max_rss
+        print(
+            f"{pid:>8} | {cpu:>8.1f} | {mean_rss:>13.1f} | {max_rss:>12.1f} | {get_num_threads(pid)}"
+        )
+    print(
+        f"{'total':>8} | {total_cpu:>8.1f} | {total_rss:>13.1f} | {total_max_rss:>12.1f} |"
+    )
+
+
+if __name__ == "__main__":
+    main()
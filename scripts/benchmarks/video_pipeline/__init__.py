@@ -0,0 +1,3 @@
+# An offline benchmark suite for ConfigureVideoStreams' video pipeline, which
+# runs every stage (and every stream end-to-end) on synthetic frames, without a
+# ROS graph. See __main__.py for usage.
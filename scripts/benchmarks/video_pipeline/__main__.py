@@ -0,0 +1,148 @@
+# Benchmarks every stage of ConfigureVideoStreams' video pipeline (JPEG decoding,
+# the AR overlays, the perspective transforms from configure_video_streams_params.yaml,
+# rotation, and JPEG encoding), and every stream end-to-end, on synthetic frames at
+# the resolutions of Stretch's cameras (navigation camera 1024x768, D435 640x480 and
+# 1280x720, D405 480x270). It does not need a ROS graph, but it imports the helpers,
+# which import ROS Python packages, so the ROS workspace must be sourced.
+#
+# For every case, it reports the time per frame (the minimum and median over the
+# repeats) and the peak memory allocated while processing one frame. With --check,
+# it compares them to the thresholds in thresholds.yaml, and exits with a non-zero
+# status if any case regressed. The thresholds leave headroom for noisy machines;
+# after an intentional change, regenerate them with --write-thresholds (ideally on
+# the robot's computer).
+#
+# Example usage (from scripts/benchmarks):
+#   python3 -m video_pipeline
+#   python3 -m video_pipeline --filter pipeline/ --repeats 50
+#   python3 -m video_pipeline --check
+#   python3 -m video_pipeline --write-thresholds
+
+import argparse
+import os
+import statistics
+import sys
+import timeit
+import tracemalloc
+
+import yaml
+
+from .cases import build_cases
+
+PARAMS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "..",
+    "..",
+    "config",
+    "configure_video_streams_params.yaml",
+)
+THRESHOLDS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "thresholds.yaml"
+)
+# The headroom that --write-thresholds leaves over the measured values
+TIME_HEADROOM = 3.0
+MEMORY_HEADROOM = 1.5
+
+
+def measure(case, repeats):
+    """Get the min and median ms per frame, and the peak KiB allocated for one frame."""
+    # Warm up any lazily-allocated buffers (e.g., the blenders' color planes)
+    case.fn()
+    times_ms = [
+        t * 1e3 for t in timeit.repeat(case.fn, number=1, repeat=max(repeats, 1))
+    ]
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    case.fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times_ms), statistics.median(times_ms), peak / 1024
+
+
+def check(name, min_ms, peak_kib, thresholds):
+    """Get the regressions of a case, compared to its thresholds."""
+    threshold = thresholds.get(name, None)
+    if threshold is None:
+        return []
+    regressions = []
+    if min_ms > threshold["max_ms"]:
+        regressions.append(f"{min_ms:.2f} ms > {threshold['max_ms']} ms")
+    if peak_kib > threshold["max_peak_kib"]:
+        regressions.append(f"{peak_kib:.0f} KiB > {threshold['max_peak_kib']} KiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python3 -m video_pipeline")
+    parser.add_argument("--params", type=str, default=PARAMS_FILE)
+    parser.add_argument("--thresholds", type=str, default=THRESHOLDS_FILE)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument(
+        "--filter", type=str, default="", help="Only run cases whose name contains this"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Fail if any case exceeds its thresholds"
+    )
+    parser.add_argument(
+        "--write-thresholds",
+        action="store_true",
+        help="Write the measured values, plus headroom, as the thresholds",
+    )
+    args = parser.parse_args()
+
+    with open(args.params, "r") as params:
+        image_params = yaml.safe_load(params)
+    thresholds = {}
+    if os.path.exists(args.thresholds):
+        with open(args.thresholds, "r") as f:
+            thresholds = yaml.safe_load(f) or {}
+
+    cases = [case for case in build_cases(image_params) if args.filter in case.name]
+    name_width = max(len(case.name) for case in cases)
+    print(
+        f"{'case':<{name_width}} | {'min (ms)':>8} | {'median (ms)':>11} | "
+        f"{'peak alloc (KiB)':>16}"
+    )
+    results = {}
+    failures = []
+    for case in cases:
+        min_ms, median_ms, peak_kib = measure(case, args.repeats)
+        results[case.name] = (min_ms, peak_kib)
+        regressions = check(case.name, min_ms, peak_kib, thresholds)
+        if regressions:
+            failures.append((case.name, regressions))
+        print(
+            f"{case.name:<{name_width}} | {min_ms:>8.2f} | {median_ms:>11.2f} | "
+            f"{peak_kib:>16.0f}{'  REGRESSED' if regressions else ''}"
+        )
+
+    if args.write_thresholds:
+        with open(args.thresholds, "w") as f:
+            f.write(
+                "# Generated by `python3 -m video_pipeline --write-thresholds`: the\n"
+                f"# measured ms per frame (x{TIME_HEADROOM}) and peak allocations "
+                f"(x{MEMORY_HEADROOM}) of every case.\n"
+            )
+            # Keep the thresholds of the cases that were filtered out
+            for name, (min_ms, peak_kib) in results.items():
+                thresholds[name] = {
+                    "max_ms": round(max(min_ms * TIME_HEADROOM, 0.1), 2),
+                    "max_peak_kib": int(max(peak_kib * MEMORY_HEADROOM, 16)),
+                }
+            yaml.safe_dump(thresholds, f, sort_keys=True)
+        print(f"Wrote the thresholds of {len(results)} cases to {args.thresholds}")
+
+    if args.check:
+        missing = [name for name in results if name not in thresholds]
+        if missing:
+            print(f"No thresholds for: {', '.join(missing)}")
+        for name, regressions in failures:
+            print(f"REGRESSION {name}: {'; '.join(regressions)}")
+        if failures:
+            sys.exit(1)
+        print(f"All {len(results) - len(missing)} checked cases are within thresholds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+# The benchmark cases: every stage of ConfigureVideoStreams' video pipeline
+# (decoding, overlays, perspective transforms, rotation, and encoding), and every
+# stream end-to-end, on the synthetic frames. The overlays compute their masks
+# with the same helpers as the node, minus the ROS plumbing (transform lookups,
+# message conversions) and the mask caches, so that they measure the cost of
+# computing a new mask.
+
+import json
+
+import numpy as np
+
+from stretch_web_teleop_helpers.conversions import (
+    DepthDeprojector,
+    JPEGDecoder,
+    JPEGEncoder,
+)
+from stretch_web_teleop_helpers.frames import ChannelOrder, Frame
+from stretch_web_teleop_helpers.image_transforms import (
+    LosslessJPEGTransform,
+    PerspectiveTransform,
+    rotate_image_around_center,
+)
+from stretch_web_teleop_helpers.overlays import (
+    OverlayBlender,
+    create_aruco_detector,
+    get_body_landmarks_mask,
+    get_graspable_region_mask,
+    get_reach_mask_from_depth_image,
+    get_reach_mask_from_pointcloud,
+)
+
+from .synthetic import (
+    D405_RESOLUTION,
+    D435_RESOLUTIONS,
+    GRIPPER_ARUCO_IDS,
+    NAVIGATION_CAMERA,
+    encode_jpeg,
+    get_camera_to_base,
+    get_projection_matrix,
+    render_body_landmarks,
+    render_color_image,
+    render_floor_depth,
+    render_gripper_scene,
+)
+
+# The same constants as ConfigureVideoStreams
+BACKGROUND_COLOR = (200, 200, 200)
+REALSENSE_DEPTH_AR_COLOR = (0, 191, 255)
+REALSENSE_BODY_LANDMARKS_AR_COLOR = (255, 0, 191)
+GRIPPER_DEPTH_AR_COLOR = (255, 0, 191)
+OVERLAY_ALPHA = 0.6
+REALSENSE_DEPTH_AR_DOWNSAMPLE_DISTANCE = 0.012
+REALSENSE_DEPTH_AR_EXPANSION_KERNEL_SIZE = 3
+GRIPPER_DEPTH_AR_DOWNSAMPLE_DISTANCE = 0.0019
+GRIPPER_DEPTH_AR_EXPANSION_KERNEL_SIZE = 3
+# The head tilt of the synthetic floor renders, and the wrist roll of the gripper frames
+HEAD_TILT = 0.8
+WRIST_ROLL = 0.5
+
+
+class Case:
+    """A benchmarked function, which processes one (synthetic) frame per call."""
+
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+
+
+def realsense_depth_ar_pointcloud(
+    frame, deprojector, depth_image, transform, proj, blender
+):
+    """The pointcloud-mode realsense depth AR overlay."""
+    mask = get_reach_mask_from_pointcloud(
+        deprojector.deproject(depth_image),
+        transform,
+        proj,
+        frame.image.shape,
+        leaf_size=REALSENSE_DEPTH_AR_DOWNSAMPLE_DISTANCE,
+        dilation_kernel_size=REALSENSE_DEPTH_AR_EXPANSION_KERNEL_SIZE,
+    )
+    if mask is None:
+        return frame
+    return frame.with_image(
+        blender.blend(frame.image, mask, channel_order=frame.channel_order)
+    )
+
+
+def realsense_depth_ar_image(frame, deprojector, depth_image, transform, blender):
+    """The image-mode realsense depth AR overlay."""
+    mask = get_reach_mask_from_depth_image(
+        deprojector, depth_image, transform, frame.image.shape
+    )
+    return frame.with_image(
+        blender.blend(frame.image, mask, channel_order=frame.channel_order)
+    )
+
+
+def realsense_body_pose_ar(frame, body_landmarks_str, proj, blender):
+    """The realsense body pose AR overlay."""
+    body_landmarks_xyz = json.loads(body_landmarks_str)
+    mask_and_roi = get_body_landmarks_mask(
+        np.array(list(body_landmarks_xyz.values())), proj, frame.image.shape
+    )
+    if mask_and_roi is None:
+        return frame
+    mask, roi = mask_and_roi
+    return frame.with_image(
+        blender.blend(frame.image, mask, roi=roi, channel_order=frame.channel_order)
+    )
+
+
+def gripper_depth_ar(frame, deprojector, depth_image, proj, aruco_detector, blender):
+    """The gripper depth AR overlay."""
+    mask, _ = get_graspable_region_mask(
+        frame.image,
+        deprojector.deproject(depth_image),
+        proj,
+        aruco_detector,
+        GRIPPER_ARUCO_IDS,
+        leaf_size=GRIPPER_DEPTH_AR_DOWNSAMPLE_DISTANCE,
+        dilation_kernel_size=GRIPPER_DEPTH_AR_EXPANSION_KERNEL_SIZE,
+    )
+    if mask is None:
+        return frame
+    return frame.with_image(
+        blender.blend(frame.image, mask, channel_order=frame.channel_order)
+    )
+
+
+def copy_frame(image):
+    """
+    Get a frame with a copy of a BGR image, since the overlays blend in-place (and
+    repeatedly blending the same image would change what the detectors see).
+    """
+    return Frame(image.copy(), ChannelOrder.BGR)
+
+
+def create_deprojector(depth_image, f):
+    """Create a depth deprojector for a camera with its principal point at the center."""
+    deprojector = DepthDeprojector()
+    height, width = depth_image.shape
+    deprojector.set_intrinsics(
+        f_x=f, f_y=f, c_x=width / 2, c_y=height / 2, shape=depth_image.shape
+    )
+    return deprojector
+
+
+def get_encoder(image_params, stream, perspective):
+    """Get a perspective's JPEG encoder, as configured in the params file."""
+    return JPEGEncoder.from_params(
+        (image_params[stream][perspective] or {}).get("encoding", None)
+    )
+
+
+def get_encoder_backends():
+    """Get the JPEG encoder backends that are installed."""
+    backends = []
+    for backend in JPEGEncoder.BACKENDS:
+        try:
+            JPEGEncoder(backend=backend)
+        except (NotImplementedError, OSError, RuntimeError):
+            continue
+        backends.append(backend)
+    return backends
+
+
+def build_cases(image_params, seed=0):
+    """
+    Build the benchmark cases.
+
+    Parameters
+    ----------
+    image_params: The perspectives, as loaded from configure_video_streams_params.yaml.
+    seed: The seed of the synthetic frames.
+
+    Returns
+    -------
+    The list of cases, named "<stage>/<what>@<resolution>".
+    """
+    rng = np.random.default_rng(seed)
+    cases = []
+    decoder = JPEGDecoder()
+    transform = get_camera_to_base(HEAD_TILT)
+
+    # The navigation camera publishes raw BGR images
+    nav_height, nav_width, _ = NAVIGATION_CAMERA
+    nav_image = render_color_image(nav_height, nav_width, rng)
+    nav_resolution = f"{nav_width}x{nav_height}"
+    for perspective in image_params["overhead"]:
+        perspective_transform = PerspectiveTransform(
+            image_params["overhead"][perspective], nav_image.shape, BACKGROUND_COLOR
+        )
+        encoder = get_encoder(image_params, "overhead", perspective)
+        cases.append(
+            Case(
+                f"transform/overhead.{perspective}@{nav_resolution}",
+                lambda t=perspective_transform: t.apply(nav_image),
+            )
+        )
+        cases.append(
+            Case(
+                f"pipeline/overhead.{perspective}@{nav_resolution}",
+                lambda t=perspective_transform, e=encoder: e.encode(
+                    t.apply(nav_image), channel_order=ChannelOrder.BGR
+                ),
+            )
+        )
+
+    # The D435 publishes JPEGs, and (optionally) aligned depth images
+    body_landmarks_str = render_body_landmarks(rng)
+    for resolution, (height, width, f) in D435_RESOLUTIONS.items():
+        image = render_color_image(height, width, rng)
+        jpeg = encode_jpeg(image)
+        depth_image = render_floor_depth(height, width, f, transform, rng)
+        deprojector = create_deprojector(depth_image, f)
+        proj = get_projection_matrix(height, width, f)
+        depth_blender = OverlayBlender(REALSENSE_DEPTH_AR_COLOR, OVERLAY_ALPHA)
+        body_pose_blender = OverlayBlender(
+            REALSENSE_BODY_LANDMARKS_AR_COLOR, OVERLAY_ALPHA
+        )
+
+        cases.append(
+            Case(f"decode/realsense@{resolution}", lambda j=jpeg: decoder.decode(j))
+        )
+        cases.append(
+            Case(
+                f"decode/realsense.half_scale@{resolution}",
+                lambda j=jpeg: decoder.decode(j, scale_denominator=2),
+            )
+        )
+        cases.append(
+            Case(
+                f"overlay/realsense_depth_ar.pointcloud@{resolution}",
+                lambda i=image, d=deprojector, di=depth_image, p=proj, b=depth_blender: (
+                    realsense_depth_ar_pointcloud(copy_frame(i), d, di, transform, p, b)
+                ),
+            )
+        )
+        cases.append(
+            Case(
+                f"overlay/realsense_depth_ar.image@{resolution}",
+                lambda i=image, d=deprojector, di=depth_image, b=depth_blender: (
+                    realsense_depth_ar_image(copy_frame(i), d, di, transform, b)
+                ),
+            )
+        )
+        cases.append(
+            Case(
+                f"overlay/realsense_body_pose_ar@{resolution}",
+                lambda i=image, p=proj, b=body_pose_blender: realsense_body_pose_ar(
+                    copy_frame(i), body_landmarks_str, p, b
+                ),
+            )
+        )
+        for perspective in image_params["realsense"]:
+            params = image_params["realsense"][perspective]
+            perspective_transform = PerspectiveTransform(
+                params, image.shape, BACKGROUND_COLOR
+            )
+            encoder = get_encoder(image_params, "realsense", perspective)
+            lossless_transform = LosslessJPEGTransform(params)
+            cases.append(
+                Case(
+                    f"transform/realsense.{perspective}@{resolution}",
+                    lambda t=perspective_transform, i=image: t.apply(i),
+                )
+            )
+            if lossless_transform.is_supported:
+                cases.append(
+                    Case(
+                        f"transform/realsense.{perspective}.lossless@{resolution}",
+                        lambda t=lossless_transform, j=jpeg: t.apply(j),
+                    )
+                )
+
+            def realsense_pipeline(
+                j=jpeg,
+                t=perspective_transform,
+                e=encoder,
+                overlay=None,
+            ):
+                fr = Frame(decoder.decode(j)[0], ChannelOrder.BGR)
+                if overlay is not None:
+                    fr = overlay(fr)
+                fr = fr.with_image(t.apply(fr.image))
+                return e.encode(fr.image, channel_order=fr.channel_order)
+
+            cases.append(
+                Case(
+                    f"pipeline/realsense.{perspective}@{resolution}",
+                    realsense_pipeline,
+                )
+            )
+            cases.append(
+                Case(
+                    f"pipeline/realsense.{perspective}.depth_ar@{resolution}",
+                    lambda d=deprojector, di=depth_image, p=proj, b=depth_blender, pipeline=realsense_pipeline: (
+                        pipeline(
+                            overlay=lambda fr: realsense_depth_ar_pointcloud(
+                                fr, d, di, transform, p, b
+                            )
+                        )
+                    ),
+                )
+            )
+
+    # The D405 publishes JPEGs, and aligned depth images
+    height, width, f = D405_RESOLUTION
+    resolution = f"{width}x{height}"
+    image, depth_image = render_gripper_scene(height, width, rng)
+    jpeg = encode_jpeg(image)
+    deprojector = create_deprojector(depth_image, f)
+    proj = get_projection_matrix(height, width, f)
+    aruco_detector = create_aruco_detector()
+    gripper_blender = OverlayBlender(GRIPPER_DEPTH_AR_COLOR, OVERLAY_ALPHA)
+    cases.append(Case(f"decode/gripper@{resolution}", lambda: decoder.decode(jpeg)))
+    crop = image_params["gripper"]["d405"]["crop"]
+    roi = (
+        crop["x_min"],
+        crop["y_min"],
+        crop["x_max"] - crop["x_min"],
+        crop["y_max"] - crop["y_min"],
+    )
+    cases.append(
+        Case(
+            f"decode/gripper.d405_crop@{resolution}",
+            lambda: decoder.decode(jpeg, roi),
+        )
+    )
+    cases.append(
+        Case(
+            f"overlay/gripper_depth_ar@{resolution}",
+            lambda: gripper_depth_ar(
+                copy_frame(image),
+                deprojector,
+                depth_image,
+                proj,
+                aruco_detector,
+                gripper_blender,
+            ),
+        )
+    )
+    for stream in ("gripper", "expandedGripper"):
+        perspective_transform = PerspectiveTransform(
+            image_params[stream]["d405"], image.shape, BACKGROUND_COLOR
+        )
+        encoder = get_encoder(image_params, stream, "d405")
+        rotated = rotate_image_around_center(
+            perspective_transform.apply(image), -WRIST_ROLL, BACKGROUND_COLOR
+        )
+        output_resolution = f"{rotated.shape[1]}x{rotated.shape[0]}"
+        cases.append(
+            Case(
+                f"transform/{stream}.d405@{resolution}",
+                lambda t=perspective_transform: t.apply(image),
+            )
+        )
+        cases.append(
+            Case(
+                f"rotate/{stream}.d405@{output_resolution}",
+                lambda r=rotated: rotate_image_around_center(
+                    r, -WRIST_ROLL, BACKGROUND_COLOR
+                ),
+            )
+        )
+
+        def gripper_pipeline(t=perspective_transform, e=encoder, depth_ar=False):
+            fr = Frame(decoder.decode(jpeg)[0], ChannelOrder.BGR)
+            if depth_ar:
+                fr = gripper_depth_ar(
+                    fr, deprojector, depth_image, proj, aruco_detector, gripper_blender
+                )
+            fr = fr.with_image(t.apply(fr.image))
+            fr = fr.with_image(
+                rotate_image_around_center(fr.image, -WRIST_ROLL, BACKGROUND_COLOR)
+            )
+            return e.encode(fr.image, channel_order=fr.channel_order)
+
+        cases.append(Case(f"pipeline/{stream}.d405@{resolution}", gripper_pipeline))
+        cases.append(
+            Case(
+                f"pipeline/{stream}.d405.depth_ar@{resolution}",
+                lambda pipeline=gripper_pipeline: pipeline(depth_ar=True),
+            )
+        )
+
+    # Encoding the outputs of every stream, with every installed backend, in
+    # both channel orders (e.g., BGR camera frames and RGB decoded frames)
+    outputs = {
+        "overhead": render_color_image(768, 768, rng),
+        "realsense": render_color_image(1280, 720, rng),
+        "gripper": render_color_image(270, 270, rng),
+    }
+    for backend in get_encoder_backends():
+        encoder = JPEGEncoder(backend=backend)
+        for stream, output in outputs.items():
+            output_resolution = f"{output.shape[1]}x{output.shape[0]}"
+            for channel_order in ChannelOrder:
+                cases.append(
+                    Case(
+                        f"encode/{stream}.{backend}.{channel_order.value}@{output_resolution}",
+                        lambda e=encoder, o=output, c=channel_order: e.encode(
+                            o, channel_order=c
+                        ),
+                    )
+                )
+    return cases
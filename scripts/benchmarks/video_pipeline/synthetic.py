@@ -0,0 +1,120 @@
+# Synthetic camera frames, depth images, and body landmarks for the video pipeline
+# benchmarks, at the resolutions of the cameras on Stretch. They are rendered from
+# fixed seeds, so that every run benchmarks the same inputs.
+
+import json
+
+import cv2
+import numpy as np
+
+# The (height, width, focal length in pixels) of the cameras, with approximate intrinsics
+NAVIGATION_CAMERA = (768, 1024, 520.0)
+D435_RESOLUTIONS = {
+    "640x480": (480, 640, 385.0),
+    "1280x720": (720, 1280, 910.0),
+}
+D405_RESOLUTION = (270, 480, 215.0)
+# The aruco markers on the gripper's fingers, as in ConfigureVideoStreams
+GRIPPER_ARUCO_IDS = {"finger_left": 200, "finger_right": 201}
+
+
+def get_projection_matrix(height, width, f):
+    """Get the (3, 4) projection matrix of a camera with its principal point at the center."""
+    return np.array([[f, 0, width / 2, 0], [0, f, height / 2, 0], [0, 0, 1, 0]])
+
+
+def render_color_image(height, width, rng):
+    """
+    Render a BGR image with smooth, low-frequency content and a little sensor
+    noise, so that it compresses (and decompresses) like a camera frame rather
+    than like pure noise.
+    """
+    coarse = rng.integers(0, 256, (max(height // 48, 2), max(width // 48, 2), 3))
+    image = cv2.resize(
+        coarse.astype(np.uint8), (width, height), interpolation=cv2.INTER_CUBIC
+    )
+    noise = rng.normal(0.0, 3.0, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(image, quality=90):
+    """Encode an image as a JPEG, like the cameras' compressed image transport."""
+    success, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise RuntimeError("Failed to compress image")
+    return data.tobytes()
+
+
+def get_camera_to_base(tilt):
+    """Get the transform from the camera's optical frame to base_link, for a head tilt down."""
+    # Columns are the optical frame's (x right, y down, z forward) axes in base_link
+    rotation_level = np.array([[0.0, 0.0, 1.0], [-1.0, 0.0, 0.0], [0.0, -1.0, 0.0]])
+    c, s = np.cos(tilt), np.sin(tilt)
+    rotation_tilt = np.array([[c, 0.0, s], [0.0, 1.0, 0.0], [-s, 0.0, c]])
+    transform = np.eye(4)
+    transform[:3, :3] = rotation_tilt @ rotation_level
+    transform[:3, 3] = [0.05, 0.0, 1.29]
+    return transform
+
+
+def render_floor_depth(height, width, f, transform, rng):
+    """Render the depth (in mm) of the floor, with some noise and missing pixels."""
+    u, v = np.meshgrid(np.arange(width), np.arange(height))
+    rays = np.stack(((u - width / 2) / f, (v - height / 2) / f, np.ones_like(u, float)))
+    rays_z_in_base = np.tensordot(transform[2, :3], rays, axes=1)
+    with np.errstate(divide="ignore"):
+        depth = np.where(rays_z_in_base < 0, -transform[2, 3] / rays_z_in_base, 0.0)
+    depth[depth > 4.0] = 0.0
+    depth += rng.normal(0.0, 0.002, depth.shape) * (depth > 0)
+    depth[rng.random(depth.shape) < 0.05] = 0.0
+    return (depth * 1000).astype(np.uint16)
+
+
+def render_gripper_scene(height, width, rng, object_distance=0.12):
+    """
+    Render what the gripper camera sees: the fingers' aruco markers in the bottom
+    corners of the color image, and an object between them in the depth image.
+
+    Returns
+    -------
+    The BGR color image, and the aligned depth image (in mm).
+    """
+    image = render_color_image(height, width, rng)
+    depth = np.full((height, width), 250, dtype=np.uint16)
+    depth[rng.random(depth.shape) < 0.05] = 0
+
+    # The markers, with a white border so the detector can find them
+    dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_250)
+    marker_size = height // 4
+    border = marker_size // 6
+    y = height - marker_size - 2 * border
+    for label, x in (
+        ("finger_left", border),
+        ("finger_right", width - marker_size - 3 * border),
+    ):
+        marker = cv2.aruco.generateImageMarker(
+            dictionary, GRIPPER_ARUCO_IDS[label], marker_size
+        )
+        image[y : y + marker_size + 2 * border, x : x + marker_size + 2 * border] = 255
+        image[
+            y + border : y + border + marker_size, x + border : x + border + marker_size
+        ] = marker[:, :, np.newaxis]
+        depth[y : y + marker_size + 2 * border, x : x + marker_size + 2 * border] = 100
+
+    # An object between the fingers
+    depth[height // 3 : height - border, width // 3 : 2 * width // 3] = int(
+        object_distance * 1000
+    )
+    return image, depth
+
+
+def render_body_landmarks(rng, num_landmarks=33, distance=1.5):
+    """
+    Render the body landmarks of a person standing in front of the camera, as the
+    JSON string that the body landmark detector publishes.
+    """
+    landmarks = {}
+    for i in range(num_landmarks):
+        x, y = rng.uniform(-0.3, 0.3), rng.uniform(-0.8, 0.8)
+        landmarks[f"landmark_{i}"] = [x, y, distance + rng.uniform(-0.1, 0.1)]
+    return json.dumps(landmarks)
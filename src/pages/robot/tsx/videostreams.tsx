@@ -1,6 +1,5 @@
 import React from "react";
 import { ROSCompressedImage } from "shared/util";
-var jpeg = require("jpeg-js");
 
 type VideoStreamProps = {
     width: number;
@@ -45,6 +44,7 @@ export class VideoStream extends React.Component<VideoStreamProps> {
     outputVideoStream?: MediaStream;
     aspectRatio: any;
     started: boolean;
+    sized: boolean;
 
     constructor(props: VideoStreamProps) {
         super(props);
@@ -60,8 +60,11 @@ export class VideoStream extends React.Component<VideoStreamProps> {
         this.video.setAttribute("height", this.height.toString());
         this.outputVideoStream = new MediaStream();
         this.started = false;
+        this.sized = false;
 
         this.updateImage = this.updateImage.bind(this);
+        this.resizeCanvas = this.resizeCanvas.bind(this);
+        this.img.addEventListener("load", this.resizeCanvas);
     }
 
     get imageReceived() {
@@ -77,6 +80,23 @@ export class VideoStream extends React.Component<VideoStreamProps> {
             ?.drawImage(this.img, 0, 0, this.width, this.height);
     }
 
+    resizeCanvas() {
+        if (this.sized) {
+            return;
+        }
+        // Size the canvas from the first decoded image. Unlike the size in the
+        // JPEG header, the image's natural size honors its EXIF orientation,
+        // which the robot uses to rotate some streams without re-encoding them.
+        let width = this.img.naturalWidth;
+        let height = this.img.naturalHeight;
+        this.aspectRatio = width / height;
+        this.height = Math.max(height * this.aspectRatio, 1000);
+        this.width = this.height * this.aspectRatio;
+        this.canvas.current!.width = this.width;
+        this.canvas.current!.height = this.height;
+        this.sized = true;
+    }
+
     updateImage(message: ROSCompressedImage, verbose: boolean = false) {
         if (verbose) {
             console.log(
@@ -87,17 +107,6 @@ export class VideoStream extends React.Component<VideoStreamProps> {
                         message.header.stamp.nanosec / 1.0e9),
             );
         }
-        if (!this.imageReceived) {
-            let { width, height } = jpeg.decode(
-                Uint8Array.from(atob(message.data), (c) => c.charCodeAt(0)),
-                true,
-            );
-            this.aspectRatio = width / height;
-            this.height = Math.max(height * this.aspectRatio, 1000);
-            this.width = this.height * this.aspectRatio;
-            this.canvas.current!.width = this.width;
-            this.canvas.current!.height = this.height;
-        }
         if (this.img.src) {
             URL.revokeObjectURL(this.img.src);
         }
@@ -0,0 +1,243 @@
+"""
+This file contains a controller that adapts a compressed video stream's JPEG
+quality, output scale, and frame rate to a target bitrate and latency budget.
+"""
+
+# Standard imports
+import threading
+from typing import Dict, Optional, Union
+
+
+class AdaptiveBitrateController:
+    """
+    Adapts one video stream's JPEG quality, output scale, and frame rate, within
+    configured bounds, so that the stream stays under a target bitrate and
+    latency budget.
+
+    Over every update period, the controller measures the encoded bytes per second
+    and the mean latency (from the camera's stamp to publishing) of the stream,
+    and combines them with the most recent (optional) feedback from the receiver.
+    If the stream is over budget, the settings are degraded multiplicatively, in
+    order of least noticeable to the operator: first quality, then scale, then
+    frame rate. If the stream is comfortably under budget, they are restored
+    additively, in the opposite order.
+    """
+
+    def __init__(
+        self,
+        target_bitrate: float,
+        latency_budget: float,
+        max_fps: float,
+        min_fps: float = 5.0,
+        max_quality: int = 95,
+        min_quality: int = 30,
+        min_scale: float = 0.5,
+        update_period: float = 1.0,
+        feedback_timeout: float = 3.0,
+    ):
+        """
+        Initialize the AdaptiveBitrateController. The stream starts at the
+        maximum quality, scale, and frame rate.
+
+        Parameters
+        ----------
+        target_bitrate: The target bitrate of the stream, in bytes per second.
+        latency_budget: The maximum acceptable latency, in seconds.
+        max_fps: The maximum frame rate.
+        min_fps: The minimum frame rate.
+        max_quality: The maximum JPEG quality.
+        min_quality: The minimum JPEG quality.
+        min_scale: The minimum output scale. The maximum is 1.0.
+        update_period: How often to update the settings, in seconds.
+        feedback_timeout: Receiver feedback older than this many seconds is ignored.
+        """
+        if target_bitrate <= 0:
+            raise ValueError(f"Target bitrate must be positive, got {target_bitrate}")
+        if not 0 < min_fps <= max_fps:
+            raise ValueError(f"Invalid frame rate bounds: [{min_fps}, {max_fps}]")
+        if not 0 <= min_quality <= max_quality <= 100:
+            raise ValueError(
+                f"Invalid JPEG quality bounds: [{min_quality}, {max_quality}]"
+            )
+        if not 0 < min_scale <= 1.0:
+            raise ValueError(f"Minimum scale must be in (0, 1], got {min_scale}")
+        self.target_bitrate = target_bitrate
+        self.latency_budget = latency_budget
+        self.min_fps, self.max_fps = min_fps, max_fps
+        self.min_quality, self.max_quality = min_quality, max_quality
+        self.min_scale = min_scale
+        self.update_period = update_period
+        self.feedback_timeout = feedback_timeout
+
+        # The current settings
+        self.quality = max_quality
+        self.scale = 1.0
+        self.fps = max_fps
+
+        # The measurements over the current update period
+        self.lock = threading.Lock()
+        self.period_start_time: Optional[float] = None
+        self.period_bytes = 0
+        self.period_frames = 0
+        self.period_latency_sum = 0.0
+        self.last_frame_time: Optional[float] = None
+
+        # The most recent measurements and feedback
+        self.bitrate = 0.0
+        self.latency = 0.0
+        self.sent_fps = 0.0
+        self.receive_fps: Optional[float] = None
+        self.receive_latency: Optional[float] = None
+        self.feedback_time: Optional[float] = None
+
+    def should_process_frame(self, now: float) -> bool:
+        """
+        Check whether a frame arriving now should be processed, given the current
+        frame rate. If so, this counts as the stream's latest frame.
+
+        Parameters
+        ----------
+        now: The current time, in seconds.
+        """
+        with self.lock:
+            # Allow some jitter, so that a stream whose frames arrive at exactly
+            # the target rate does not drop every other frame.
+            if (
+                self.last_frame_time is not None
+                and now - self.last_frame_time < 0.9 / self.fps
+            ):
+                return False
+            self.last_frame_time = now
+            return True
+
+    def record_frame(self, num_bytes: int, latency: float, now: float) -> None:
+        """
+        Record a published frame.
+
+        Parameters
+        ----------
+        num_bytes: The total encoded size of the frame, across all its publishers.
+        latency: The time from the frame's stamp to publishing it, in seconds.
+        now: The current time, in seconds.
+        """
+        with self.lock:
+            if self.period_start_time is None:
+                self.period_start_time = now
+            self.period_bytes += num_bytes
+            self.period_frames += 1
+            self.period_latency_sum += latency
+
+    def record_feedback(
+        self,
+        now: float,
+        receive_fps: Optional[float] = None,
+        receive_latency: Optional[float] = None,
+    ) -> None:
+        """
+        Record feedback from the receiver of the stream (e.g., the browser).
+
+        Parameters
+        ----------
+        now: The current time, in seconds.
+        receive_fps: The rate at which the receiver is receiving frames.
+        receive_latency: The latency the receiver measured, in seconds.
+        """
+        with self.lock:
+            self.receive_fps = receive_fps
+            self.receive_latency = receive_latency
+            self.feedback_time = now
+
+    def update(self, now: float) -> bool:
+        """
+        If an update period has passed, update the settings from the measurements.
+
+        Parameters
+        ----------
+        now: The current time, in seconds.
+
+        Returns
+        -------
+        bool: Whether an update period passed (even if the settings did not change).
+        """
+        with self.lock:
+            if (
+                self.period_start_time is None
+                or now - self.period_start_time < self.update_period
+            ):
+                return False
+            elapsed = now - self.period_start_time
+            self.bitrate = self.period_bytes / elapsed
+            self.sent_fps = self.period_frames / elapsed
+            self.latency = (
+                self.period_latency_sum / self.period_frames
+                if self.period_frames > 0
+                else 0.0
+            )
+            self.period_start_time = now
+            self.period_bytes = 0
+            self.period_frames = 0
+            self.period_latency_sum = 0.0
+
+            # Combine the measurements with the receiver's feedback, if it is recent
+            latency = self.latency
+            receiver_is_behind = False
+            if (
+                self.feedback_time is not None
+                and now - self.feedback_time < self.feedback_timeout
+            ):
+                if self.receive_latency is not None:
+                    latency = max(latency, self.receive_latency)
+                if self.receive_fps is not None:
+                    receiver_is_behind = self.receive_fps < 0.8 * self.sent_fps
+
+            if (
+                self.bitrate > 1.1 * self.target_bitrate
+                or latency > self.latency_budget
+                or receiver_is_behind
+            ):
+                self.degrade()
+            elif (
+                self.bitrate < 0.7 * self.target_bitrate
+                and latency < 0.7 * self.latency_budget
+            ):
+                self.restore()
+            return True
+
+    def degrade(self) -> None:
+        """
+        Multiplicatively lower the quality, else the scale, else the frame rate.
+        """
+        if self.quality > self.min_quality:
+            self.quality = max(self.min_quality, int(self.quality * 0.8))
+        elif self.scale > self.min_scale:
+            self.scale = max(self.min_scale, self.scale * 0.75)
+        elif self.fps > self.min_fps:
+            self.fps = max(self.min_fps, self.fps * 0.75)
+
+    def restore(self) -> None:
+        """
+        Additively raise the frame rate, else the scale, else the quality.
+        """
+        if self.fps < self.max_fps:
+            self.fps = min(self.max_fps, self.fps + 1.0)
+        elif self.scale < 1.0:
+            self.scale = min(1.0, self.scale + 0.1)
+        elif self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + 5)
+
+    def get_state(self) -> Dict[str, Union[int, float, None]]:
+        """
+        Get the current settings and measurements, e.g., to publish them.
+        """
+        with self.lock:
+            return {
+                "quality": self.quality,
+                "scale": round(self.scale, 3),
+                "fps": round(self.fps, 2),
+                "bitrate_kbps": round(self.bitrate * 8 / 1000, 1),
+                "target_bitrate_kbps": round(self.target_bitrate * 8 / 1000, 1),
+                "sent_fps": round(self.sent_fps, 2),
+                "latency": round(self.latency, 3),
+                "receive_fps": self.receive_fps,
+                "receive_latency": self.receive_latency,
+            }
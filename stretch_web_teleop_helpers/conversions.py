@@ -1,6 +1,7 @@
 # Standard imports
 import array
-from typing import Optional, Tuple, Union
+import struct
+from typing import Dict, Optional, Tuple, Union
 
 # Third-party imports
 import cv2
@@ -14,6 +15,15 @@ from rclpy.duration import Duration
 from rclpy.time import Time
 from sensor_msgs.msg import CompressedImage, Image
 
+# Local imports
+from .frames import ENCODING_CHANNEL_ORDERS, ChannelOrder, Frame
+
+# libjpeg-turbo (through PyTurboJPEG) is an optional JPEG encoder and decoder backend
+try:
+    import turbojpeg
+except ImportError:
+    turbojpeg = None
+
 # The fixed header that ROS2 Humble's compressed depth image transport plugin prepends to
 # the data. The exact value was empirically determined, but the below link shows the code
 # that prepends additional data:
@@ -64,11 +74,386 @@ def ros_msg_to_cv2_image(
     raise ValueError("msg must be a ROS Image or CompressedImage")
 
 
+def ros_msg_to_frame(
+    msg: Union[Image, CompressedImage],
+    bridge: Optional[CvBridge] = None,
+) -> Frame:
+    """
+    Convert a ROS Image or (color) CompressedImage message to a Frame, without
+    converting its channel order.
+
+    Parameters
+    ----------
+    msg: the ROS Image or CompressedImage message to convert
+    bridge: the CvBridge to use for the conversion. If `bridge` is None, a new
+        CvBridge will be created.
+    """
+    image = ros_msg_to_cv2_image(msg, bridge)
+    if isinstance(msg, CompressedImage):
+        # cv2 decodes color JPEGs and PNGs to BGR
+        return Frame(image, ChannelOrder.BGR)
+    return Frame(
+        image, ENCODING_CHANNEL_ORDERS.get(msg.encoding.lower(), ChannelOrder.BGR)
+    )
+
+
+class JPEGEncoder:
+    """
+    Encodes images as JPEGs, with configurable quality, chroma subsampling, and
+    Huffman optimization / progressive flags.
+
+    Two backends are supported: "opencv" (`cv2.imencode`), and "turbojpeg"
+    (libjpeg-turbo, through PyTurboJPEG, which must be installed separately).
+    The default settings match `CvBridge.cv2_to_compressed_imgmsg`.
+    """
+
+    BACKENDS = ("opencv", "turbojpeg")
+    SUBSAMPLINGS = ("444", "422", "420")
+
+    def __init__(
+        self,
+        quality: int = 95,
+        subsampling: str = "420",
+        optimize: bool = False,
+        progressive: bool = False,
+        backend: str = "opencv",
+    ):
+        """
+        Initialize the JPEGEncoder.
+
+        Parameters
+        ----------
+        quality: The JPEG quality, in [0, 100].
+        subsampling: The chroma subsampling: "444", "422", or "420".
+        optimize: Whether to compute optimal Huffman tables. Slower, but smaller.
+            The turbojpeg backend only optimizes progressive JPEGs.
+        progressive: Whether to encode a progressive JPEG.
+        backend: The encoder backend: "opencv" or "turbojpeg".
+
+        Raises
+        ------
+        ValueError: If a setting is invalid.
+        NotImplementedError: If the backend is not installed, or does not
+            support the settings.
+        """
+        if not 0 <= quality <= 100:
+            raise ValueError(f"JPEG quality must be in [0, 100], got {quality}")
+        subsampling = str(subsampling)
+        if subsampling not in self.SUBSAMPLINGS:
+            raise ValueError(
+                f"JPEG subsampling must be one of {self.SUBSAMPLINGS}, got {subsampling}"
+            )
+        if backend not in self.BACKENDS:
+            raise ValueError(
+                f"JPEG encoder backend must be one of {self.BACKENDS}, got {backend}"
+            )
+        self.quality = int(quality)
+        self.subsampling = subsampling
+        self.optimize = bool(optimize)
+        self.progressive = bool(progressive)
+        self.backend = backend
+
+        if backend == "turbojpeg":
+            if turbojpeg is None:
+                raise NotImplementedError(
+                    "The turbojpeg JPEG encoder backend requires PyTurboJPEG"
+                )
+            self.turbojpeg = turbojpeg.TurboJPEG()
+            self.turbojpeg_subsample = {
+                "444": turbojpeg.TJSAMP_444,
+                "422": turbojpeg.TJSAMP_422,
+                "420": turbojpeg.TJSAMP_420,
+            }[subsampling]
+            self.turbojpeg_flags = turbojpeg.TJFLAG_PROGRESSIVE if progressive else 0
+        else:
+            self.imencode_params = [
+                cv2.IMWRITE_JPEG_QUALITY,
+                self.quality,
+                cv2.IMWRITE_JPEG_OPTIMIZE,
+                int(self.optimize),
+                cv2.IMWRITE_JPEG_PROGRESSIVE,
+                int(self.progressive),
+            ]
+            # OpenCV < 4.5.5 always uses libjpeg's default, 4:2:0 subsampling
+            if hasattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR"):
+                self.imencode_params += [
+                    cv2.IMWRITE_JPEG_SAMPLING_FACTOR,
+                    {
+                        "444": cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444,
+                        "422": cv2.IMWRITE_JPEG_SAMPLING_FACTOR_422,
+                        "420": cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420,
+                    }[subsampling],
+                ]
+            elif subsampling != "420":
+                raise NotImplementedError(
+                    f"This version of OpenCV ({cv2.__version__}) does not support "
+                    f"{subsampling} JPEG subsampling"
+                )
+
+    @classmethod
+    def from_params(cls, params: Optional[Dict]) -> "JPEGEncoder":
+        """
+        Create an encoder from the (optional) "encoding" parameters of a perspective
+        in `configure_video_streams_params.yaml`. Unspecified settings get their
+        default values.
+        """
+        params = params if params else {}
+        unknown_keys = set(params.keys()) - {
+            "quality",
+            "subsampling",
+            "optimize",
+            "progressive",
+            "backend",
+        }
+        if unknown_keys:
+            raise ValueError(f"Unknown JPEG encoding parameters: {unknown_keys}")
+        return cls(**params)
+
+    def encode(
+        self,
+        image: npt.NDArray[np.uint8],
+        quality: Optional[int] = None,
+        channel_order: ChannelOrder = ChannelOrder.BGR,
+    ) -> Union[bytes, npt.NDArray]:
+        """
+        Encode an image.
+
+        Parameters
+        ----------
+        image: The color or greyscale image.
+        quality: If not None, overrides the encoder's JPEG quality for this image.
+        channel_order: The order of the image's color channels. The turbojpeg
+            backend encodes either order directly; the opencv backend first
+            converts RGB(A) images to BGR(A).
+
+        Returns
+        -------
+        Union[bytes, npt.NDArray]: The JPEG, as any object supporting the buffer protocol.
+        """
+        if quality is None:
+            quality = self.quality
+        if self.backend == "turbojpeg":
+            if image.ndim == 2:
+                return self.turbojpeg.encode(
+                    image[:, :, np.newaxis],
+                    quality=quality,
+                    pixel_format=turbojpeg.TJPF_GRAY,
+                    jpeg_subsample=turbojpeg.TJSAMP_GRAY,
+                    flags=self.turbojpeg_flags,
+                )
+            if channel_order == ChannelOrder.RGB:
+                pixel_format = (
+                    turbojpeg.TJPF_RGBA if image.shape[2] == 4 else turbojpeg.TJPF_RGB
+                )
+            else:
+                pixel_format = (
+                    turbojpeg.TJPF_BGRA if image.shape[2] == 4 else turbojpeg.TJPF_BGR
+                )
+            return self.turbojpeg.encode(
+                image,
+                quality=quality,
+                pixel_format=pixel_format,
+                jpeg_subsample=self.turbojpeg_subsample,
+                flags=self.turbojpeg_flags,
+            )
+        imencode_params = self.imencode_params
+        if quality != self.quality:
+            # The quality is the first parameter
+            imencode_params = [cv2.IMWRITE_JPEG_QUALITY, quality] + imencode_params[2:]
+        image = Frame(image, channel_order).to_channel_order(ChannelOrder.BGR).image
+        success, data = cv2.imencode(".jpeg", image, imencode_params)
+        if not success:
+            raise RuntimeError("Failed to compress image")
+        return data
+
+    def encode_to_msg(
+        self,
+        image: npt.NDArray[np.uint8],
+        quality: Optional[int] = None,
+        channel_order: ChannelOrder = ChannelOrder.BGR,
+    ) -> CompressedImage:
+        """
+        Encode an image into a CompressedImage message. The encoded buffer is copied
+        directly into the message's data array. Note that this does not set the
+        header of the message; that must be done outside of this function.
+
+        Parameters
+        ----------
+        image: The color or greyscale image.
+        quality: If not None, overrides the encoder's JPEG quality for this image.
+        channel_order: The order of the image's color channels.
+
+        Returns
+        -------
+        CompressedImage: The message.
+        """
+        data = array.array("B")
+        data.frombytes(self.encode(image, quality, channel_order))
+        msg = CompressedImage(format="jpeg")
+        msg.data = data
+        return msg
+
+
+class JPEGDecoder:
+    """
+    Decodes (color) JPEGs, optionally only a region of them and/or at a reduced
+    scale, so that decoding only costs as much as the pixels that are used.
+
+    Reduced-scale decoding happens in the DCT domain, which both backends support:
+    "opencv" (`cv2.imdecode`'s IMREAD_REDUCED_* flags), and "turbojpeg"
+    (libjpeg-turbo, through PyTurboJPEG, which must be installed separately).
+    Region-only decoding requires turbojpeg, which losslessly crops the JPEG to the
+    region (expanded to the JPEG's block (MCU) boundaries) before decoding it. With
+    opencv, the whole image is decoded.
+    """
+
+    BACKENDS = ("opencv", "turbojpeg")
+    SCALE_DENOMINATORS = (1, 2, 4, 8)
+
+    def __init__(self, backend: Optional[str] = None):
+        """
+        Initialize the JPEGDecoder.
+
+        Parameters
+        ----------
+        backend: The decoder backend: "opencv" or "turbojpeg". If None, use
+            turbojpeg if it is installed, else opencv.
+
+        Raises
+        ------
+        ValueError: If the backend is invalid.
+        NotImplementedError: If the backend is not installed.
+        """
+        if backend is None:
+            backend = "opencv" if turbojpeg is None else "turbojpeg"
+        if backend not in self.BACKENDS:
+            raise ValueError(
+                f"JPEG decoder backend must be one of {self.BACKENDS}, got {backend}"
+            )
+        self.backend = backend
+        if backend == "turbojpeg":
+            if turbojpeg is None:
+                raise NotImplementedError(
+                    "The turbojpeg JPEG decoder backend requires PyTurboJPEG"
+                )
+            self.turbojpeg = turbojpeg.TurboJPEG()
+        # Like `CvBridge.compressed_imgmsg_to_cv2`, ignore any EXIF orientation
+        self.imdecode_flags = {
+            1: cv2.IMREAD_COLOR,
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+        }
+        for scale_denominator in self.imdecode_flags:
+            self.imdecode_flags[scale_denominator] |= cv2.IMREAD_IGNORE_ORIENTATION
+
+    @staticmethod
+    def get_size(data: Union[bytes, array.array]) -> Optional[Tuple[int, int]]:
+        """
+        Get the size of a JPEG from its frame header, without decoding it.
+
+        Parameters
+        ----------
+        data: The JPEG.
+
+        Returns
+        -------
+        Optional[Tuple[int, int]]: The (width, height) of the JPEG, or None if the
+            frame header could not be found.
+        """
+        data = memoryview(data).cast("B")
+        if data[:2] != b"\xff\xd8":
+            return None
+        offset = 2
+        while offset + 9 <= len(data):
+            if data[offset] != 0xFF:
+                return None
+            marker = data[offset + 1]
+            # SOF0-SOF15, except DHT (C4), JPG (C8), and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[offset + 5 : offset + 9])
+                return width, height
+            (length,) = struct.unpack(">H", data[offset + 2 : offset + 4])
+            offset += 2 + length
+        return None
+
+    @classmethod
+    def get_scale_denominator(cls, scale: float) -> int:
+        """
+        Get the largest supported scale denominator that decodes at (at least)
+        the given scale.
+
+        Parameters
+        ----------
+        scale: The scale the decoded image is needed at, in (0, 1].
+        """
+        return max(
+            scale_denominator
+            for scale_denominator in cls.SCALE_DENOMINATORS
+            if scale * scale_denominator <= 1.0
+        )
+
+    def decode(
+        self,
+        data: Union[bytes, array.array],
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        scale_denominator: int = 1,
+    ) -> Tuple[npt.NDArray[np.uint8], Tuple[int, int]]:
+        """
+        Decode a JPEG.
+
+        Parameters
+        ----------
+        data: The JPEG.
+        roi: If not None, the (x, y, width, height) region of the JPEG that is
+            needed. The decoded image covers at least this region.
+        scale_denominator: Decode the JPEG at 1 / scale_denominator of its size.
+            Must be in SCALE_DENOMINATORS.
+
+        Returns
+        -------
+        npt.NDArray[np.uint8]: The decoded BGR image.
+        Tuple[int, int]: The (x, y) of the decoded image's top-left corner in the
+            full-size JPEG.
+        """
+        if scale_denominator not in self.SCALE_DENOMINATORS:
+            raise ValueError(
+                f"JPEG scale denominator must be one of {self.SCALE_DENOMINATORS}, "
+                f"got {scale_denominator}"
+            )
+        if self.backend == "opencv":
+            image = cv2.imdecode(
+                np.frombuffer(data, np.uint8), self.imdecode_flags[scale_denominator]
+            )
+            if image is None:
+                raise RuntimeError("Failed to decompress image")
+            return image, (0, 0)
+
+        origin = (0, 0)
+        if roi is not None:
+            width, height, subsample, _ = self.turbojpeg.decode_header(data)
+            x, y, w, h = roi
+            # Losslessly cropping requires the origin to be on a block boundary
+            x0 = max(0, x) - max(0, x) % turbojpeg.tjMCUWidth[subsample]
+            y0 = max(0, y) - max(0, y) % turbojpeg.tjMCUHeight[subsample]
+            x1, y1 = min(width, x + w), min(height, y + h)
+            if x1 > x0 and y1 > y0 and (x0, y0, x1, y1) != (0, 0, width, height):
+                data = self.turbojpeg.crop(data, x0, y0, x1 - x0, y1 - y0)
+                origin = (x0, y0)
+        image = self.turbojpeg.decode(
+            data,
+            pixel_format=turbojpeg.TJPF_BGR,
+            scaling_factor=(1, scale_denominator) if scale_denominator > 1 else None,
+        )
+        return image, origin
+
+
 def cv2_image_to_ros_msg(
     image: npt.NDArray,
     compress: bool,
     bridge: Optional[CvBridge] = None,
     encoding: str = "passthrough",
+    jpeg_encoder: Optional[JPEGEncoder] = None,
 ) -> Union[Image, CompressedImage]:
     """
     Convert a cv2 image to a ROS Image or CompressedImage message. Note that this
@@ -90,6 +475,8 @@ def cv2_image_to_ros_msg(
         created.
     encoding: the encoding to use for the ROS Image message. This is only used
         if `compress` is False.
+    jpeg_encoder: the encoder to use for compressed (non-depth) images. If None,
+        a JPEGEncoder with the default settings will be used.
     """
     if bridge is None:
         bridge = CvBridge()
@@ -114,7 +501,9 @@ def cv2_image_to_ros_msg(
             )
             return msg
         # Compressed RGB image
-        return bridge.cv2_to_compressed_imgmsg(image, dst_format="jpeg")
+        if jpeg_encoder is None:
+            jpeg_encoder = JPEGEncoder()
+        return jpeg_encoder.encode_to_msg(image)
     # If we get here, we're not compressing the image
     return bridge.cv2_to_imgmsg(image, encoding=encoding)
 
@@ -189,6 +578,199 @@ def depth_img_to_pointcloud(
     return pointcloud
 
 
+class DepthDeprojector:
+    """
+    Converts depth images to point clouds, like `depth_img_to_pointcloud`, but
+    caches everything that only depends on the camera intrinsics and the image
+    shape.
+
+    The normalized ray (x/z, y/z) through every pixel is computed once, and kept
+    until the intrinsics, image shape, or offsets change (e.g., on a new CameraInfo).
+    Deprojecting a depth image is then a masked multiply of the valid depth values
+    with the cached rays, written into a reusable output buffer.
+    """
+
+    def __init__(self, unit_conversion: float = 1000.0):
+        """
+        Initialize the DepthDeprojector.
+
+        Parameters
+        ----------
+        unit_conversion: The depth values are divided by this constant. Defaults to 1000,
+            as RealSense returns depth in mm, but we want the pointcloud in m.
+        """
+        self.unit_conversion = unit_conversion
+        self.key: Optional[Tuple] = None
+        self.ray_x: Optional[npt.NDArray[np.float32]] = None
+        self.ray_y: Optional[npt.NDArray[np.float32]] = None
+        self.buffer: Optional[npt.NDArray[np.float32]] = None
+
+    def set_intrinsics(
+        self,
+        f_x: float,
+        f_y: float,
+        c_x: float,
+        c_y: float,
+        shape: Tuple[int, ...],
+        u_offset: int = 0,
+        v_offset: int = 0,
+    ) -> bool:
+        """
+        Set the camera intrinsics and depth image shape. The ray grid is only
+        recomputed if these differ from the ones already set.
+
+        Parameters
+        ----------
+        f_x: The focal length of the camera in the x direction, using the pinhole
+            camera model.
+        f_y: The focal length of the camera in the y direction, using the pinhole
+            camera model.
+        c_x: The x-coordinate of the principal point of the camera, using the pinhole
+            camera model.
+        c_y: The y-coordinate of the principal point of the camera, using the pinhole
+            camera model.
+        shape: The shape of the depth images that will be deprojected.
+        u_offset: An offset to add to the column index of every pixel in the depth
+            image. This is useful if the depth image was cropped.
+        v_offset: An offset to add to the row index of every pixel in the depth
+            image. This is useful if the depth image was cropped.
+
+        Returns
+        -------
+        bool: Whether the ray grid was recomputed.
+        """
+        key = (f_x, f_y, c_x, c_y, tuple(shape[:2]), u_offset, v_offset)
+        if key == self.key:
+            return False
+        self.key = key
+
+        h, w = shape[:2]
+        ray_x = (np.arange(w, dtype=np.float32) + (u_offset - c_x)) / f_x
+        ray_y = (np.arange(h, dtype=np.float32) + (v_offset - c_y)) / f_y
+        self.ray_x = np.ascontiguousarray(np.broadcast_to(ray_x, (h, w)))
+        self.ray_y = np.ascontiguousarray(np.broadcast_to(ray_y[:, np.newaxis], (h, w)))
+        self.buffer = np.empty((h * w, 3), dtype=np.float32)
+        return True
+
+    def deproject(self, depth_image: npt.NDArray) -> npt.NDArray[np.float32]:
+        """
+        Convert a depth image to a point cloud, keeping only pixels with positive depth.
+        The points are in the same (row-major) order as `depth_img_to_pointcloud`.
+
+        Note that the returned array is a view of this object's reusable buffer, so it
+        is overwritten by the next call to `deproject`. Copy it to keep it around.
+
+        Parameters
+        ----------
+        depth_image: The depth image to convert to a point cloud. Its shape must match
+            the shape passed to `set_intrinsics`.
+
+        Returns
+        -------
+        pointcloud: The point cloud representation of the depth image. Size: (N, 3).
+        """
+        if self.key is None:
+            raise RuntimeError("Call set_intrinsics before deprojecting depth images")
+        if depth_image.shape[:2] != self.key[4]:
+            raise ValueError(
+                f"Depth image shape {depth_image.shape[:2]} does not match the "
+                f"intrinsics shape {self.key[4]}"
+            )
+
+        # Get the (flattened) indices of the pixels with valid depth
+        depth_flat = depth_image.reshape(-1)
+        valid_idx = np.flatnonzero(depth_flat > 0)
+        num_points = valid_idx.shape[0]
+
+        # Convert units (e.g., mm to m), and multiply by the cached rays
+        pointcloud = self.buffer[:num_points]
+        np.multiply(
+            depth_flat[valid_idx],
+            np.float32(1.0 / self.unit_conversion),
+            out=pointcloud[:, 2],
+            casting="unsafe",
+        )
+        np.multiply(
+            self.ray_x.reshape(-1)[valid_idx], pointcloud[:, 2], out=pointcloud[:, 0]
+        )
+        np.multiply(
+            self.ray_y.reshape(-1)[valid_idx], pointcloud[:, 2], out=pointcloud[:, 1]
+        )
+        return pointcloud
+
+    def planar_distance_mask(
+        self,
+        depth_image: npt.NDArray,
+        transform: Union[TransformStamped, npt.NDArray],
+        min_dist: float,
+        max_dist: float,
+        depth_limits: Optional[Tuple[float, float]] = None,
+    ) -> npt.NDArray[np.uint8]:
+        """
+        Get a mask of the pixels whose 3D point, once transformed into a target frame
+        (e.g., base_link), is within a range of planar (XY) distances of the target
+        frame's origin.
+
+        This works directly in image space: with the cached ray through every pixel,
+        the target-frame x and y of every pixel are affine in its depth, so the mask
+        only takes a few vectorized operations over the depth image, with no point
+        cloud, reprojection, or dilation.
+
+        Parameters
+        ----------
+        depth_image: The depth image. Its shape must match the shape passed to
+            `set_intrinsics`.
+        transform: The transform from the camera frame to the target frame, either
+            as a ROS TransformStamped message or as a 4x4 transformation matrix.
+        min_dist: The minimum planar distance from the target frame's origin.
+        max_dist: The maximum planar distance from the target frame's origin.
+        depth_limits: The optional (min, max) limits on the depth, after unit conversion.
+
+        Returns
+        -------
+        npt.NDArray[np.uint8]: The mask, which is 255 for pixels within the range of
+            distances and 0 elsewhere. Pixels without depth are always 0.
+        """
+        if self.key is None:
+            raise RuntimeError("Call set_intrinsics before computing depth masks")
+        if depth_image.shape[:2] != self.key[4]:
+            raise ValueError(
+                f"Depth image shape {depth_image.shape[:2]} does not match the "
+                f"intrinsics shape {self.key[4]}"
+            )
+        if isinstance(transform, TransformStamped):
+            transform = transform_to_matrix(transform)
+        rotation = transform[:3, :3].astype(np.float32)
+        translation = transform[:3, 3].astype(np.float32)
+
+        # Convert units (e.g., mm to m)
+        depth = depth_image.astype(np.float32)
+        depth *= np.float32(1.0 / self.unit_conversion)
+
+        # The target-frame x and y of every pixel is (r_i . ray) * depth + t_i,
+        # where ray = (x/z, y/z, 1). Compute their squared norm.
+        planar_dist_sq = np.zeros(depth.shape, dtype=np.float32)
+        coord = np.empty(depth.shape, dtype=np.float32)
+        for i in range(2):
+            np.multiply(self.ray_x, rotation[i, 0], out=coord)
+            coord += self.ray_y * rotation[i, 1]
+            coord += rotation[i, 2]
+            coord *= depth
+            coord += translation[i]
+            coord *= coord
+            planar_dist_sq += coord
+
+        # Threshold the distances and the depth, excluding pixels without depth
+        min_depth, max_depth = (
+            depth_limits
+            if depth_limits is not None
+            else (np.finfo(np.float32).tiny, np.finfo(np.float32).max)
+        )
+        mask = cv2.inRange(planar_dist_sq, min_dist**2, max_dist**2)
+        cv2.bitwise_and(mask, cv2.inRange(depth, min_depth, max_depth), dst=mask)
+        return mask
+
+
 def deproject_pixel_to_point(
     u: int, v: int, depth: float, proj: npt.NDArray[np.float32]
 ) -> Tuple[float, float, float]:
@@ -294,6 +876,139 @@ def project_points_to_pixels(
     return uv_dedup[in_bounds_idx]
 
 
+def project_points_to_mask(
+    points: npt.NDArray[np.float32],
+    proj: npt.NDArray[np.float32],
+    mask: Optional[npt.NDArray[np.uint8]] = None,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    dilation_kernel_size: int = 1,
+) -> npt.NDArray[np.uint8]:
+    """
+    Given an array of (x, y, z) points, this function sets the pixels they project
+    to in a mask. This is equivalent to setting the pixels returned by
+    `project_points_to_pixels`, but skips deduplicating them: the in-bounds pixels
+    are written directly to the mask through their flat indices, which is idempotent.
+
+    Parameters
+    ----------
+    points: The array of (x, y, z) points. Size: (N, 3).
+    proj: The camera's projection matrix of size (3, 4).
+    mask: The C-contiguous (height, width) mask to write into. Pixels that points
+        project to are set to 255; other pixels are left as-is. If None, a new
+        zeroed mask is allocated, with the given width and height.
+    width: The width of the image. Only required if mask is None.
+    height: The height of the image. Only required if mask is None.
+    dilation_kernel_size: If greater than 1, the mask is dilated in-place with a
+        square kernel of this size, e.g., to fill gaps between downsampled points.
+
+    Returns
+    -------
+    npt.NDArray[np.uint8]: The mask.
+    """
+    if mask is None:
+        if width is None or height is None:
+            raise ValueError("The width and height are required if mask is None")
+        mask = np.zeros((height, width), dtype=np.uint8)
+    elif not mask.flags.c_contiguous:
+        raise ValueError("The mask must be C-contiguous")
+    height, width = mask.shape[:2]
+
+    # Project the points to the image plane, without building homogeneous points
+    proj = np.asarray(proj, dtype=points.dtype)
+    coords = np.matmul(points, proj[:, :3].T)  # N x 3
+    coords += proj[:, 3]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u = coords[:, 0] / coords[:, 2]
+        v = coords[:, 1] / coords[:, 2]
+
+    # Pixel indices truncate towards zero, so a pixel is in bounds iff its
+    # coordinates are in (-1, size). This also removes points whose third
+    # homogeneous coordinate is 0 or nan, since their coordinates are inf or nan.
+    in_bounds = (u > -1) & (u < width) & (v > -1) & (v < height)
+    flat_idx = v[in_bounds].astype(np.intp) * width + u[in_bounds].astype(np.intp)
+    mask.reshape(-1)[flat_idx] = 255
+
+    if dilation_kernel_size > 1:
+        cv2.dilate(
+            mask,
+            np.ones((dilation_kernel_size, dilation_kernel_size), np.uint8),
+            dst=mask,
+            iterations=1,
+        )
+    return mask
+
+
+def transform_to_matrix(transform: TransformStamped) -> npt.NDArray[np.float64]:
+    """
+    Convert a ROS TransformStamped message to a 4x4 homogeneous transformation matrix.
+
+    Parameters
+    ----------
+    transform: The ROS TransformStamped message.
+
+    Returns
+    -------
+    npt.NDArray[np.float64]: The 4x4 transformation matrix.
+    """
+    t = transform.transform.translation
+    q = transform.transform.rotation
+    x, y, z, w = q.x, q.y, q.z, q.w
+    norm = np.sqrt(x * x + y * y + z * z + w * w)
+    x, y, z, w = x / norm, y / norm, z / norm, w / norm
+
+    matrix = np.eye(4)
+    matrix[:3, :3] = [
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ]
+    matrix[:3, 3] = [t.x, t.y, t.z]
+    return matrix
+
+
+def transform_points(
+    points: npt.NDArray[np.float32],
+    transform: Union[TransformStamped, npt.NDArray],
+    out: Optional[npt.NDArray[np.float32]] = None,
+) -> npt.NDArray[np.float32]:
+    """
+    Apply a rigid transform to an array of (x, y, z) points.
+
+    This is equivalent to multiplying every point, in homogeneous coordinates, by the
+    4x4 transformation matrix. However, it is computed as one (N, 3) x (3, 3) matmul
+    plus a broadcast add of the translation, to avoid allocating an (N, 4) array of
+    homogeneous coordinates.
+
+    Parameters
+    ----------
+    points: The array of (x, y, z) points. Size: (N, 3).
+    transform: The transform, either as a ROS TransformStamped message or as a
+        4x4 transformation matrix.
+    out: An optional preallocated (N, 3) array to write the transformed points into.
+        This may be `points` itself, to transform the points in place.
+
+    Returns
+    -------
+    npt.NDArray[np.float32]: The transformed points. Size: (N, 3).
+    """
+    if isinstance(transform, TransformStamped):
+        transform = transform_to_matrix(transform)
+    dtype = points.dtype if np.issubdtype(points.dtype, np.floating) else np.float64
+    rotation = transform[:3, :3].T.astype(dtype)
+    translation = transform[:3, 3].astype(dtype)
+
+    if out is None:
+        out = np.matmul(points, rotation)
+    elif out is points:
+        # matmul cannot write into one of its inputs, so this needs a temporary
+        out[:] = np.matmul(points, rotation)
+    else:
+        np.matmul(points, rotation, out=out)
+    out += translation
+    return out
+
+
 def create_ros_pose(
     pos: npt.NDArray, quat: npt.NDArray, frame: Optional[str] = None
 ) -> Union[Pose, PoseStamped]:
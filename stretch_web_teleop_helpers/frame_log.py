@@ -0,0 +1,277 @@
+"""
+This file contains an append-only, indexed log of (serialized) messages, which
+is read back through memory maps, so that recorded camera sessions can be
+replayed without loading them into memory.
+
+A frame log is a directory with three files:
+  - data.bin: the messages' bytes, back to back.
+  - index.bin: a fixed-size entry per message, with its receive time, channel,
+    and location in data.bin, in the order they were appended.
+  - channels.json: the name (e.g., topic) and type of every channel.
+"""
+
+# Standard imports
+import json
+import mmap
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Union
+
+# Third-party imports
+import numpy as np
+import numpy.typing as npt
+
+DATA_FILENAME = "data.bin"
+INDEX_FILENAME = "index.bin"
+CHANNELS_FILENAME = "channels.json"
+FRAME_LOG_VERSION = 1
+INDEX_DTYPE = np.dtype(
+    [
+        ("recv_time_ns", "<i8"),
+        ("channel", "<u4"),
+        ("length", "<u4"),
+        ("offset", "<u8"),
+    ]
+)
+
+
+class FrameLogEntry:
+    """
+    One message in a frame log.
+    """
+
+    def __init__(self, channel: str, recv_time_ns: int, data: memoryview):
+        """
+        Initialize the FrameLogEntry.
+
+        Parameters
+        ----------
+        channel: The name of the message's channel.
+        recv_time_ns: The time the message was received, in nanoseconds.
+        data: The message's bytes. This is a view of the log's memory map, so
+            it is only valid until the log is closed.
+        """
+        self.channel = channel
+        self.recv_time_ns = recv_time_ns
+        self.data = data
+
+
+class FrameLogWriter:
+    """
+    Appends messages to a frame log. Appending is thread-safe.
+
+    The data is written before its index entry, so if the writer is interrupted
+    (e.g., the recorder crashes), the log is still readable up to the last
+    complete message.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the FrameLogWriter, creating a new, empty frame log.
+
+        Parameters
+        ----------
+        path: The directory of the frame log.
+
+        Raises
+        ------
+        FileExistsError: If the directory already contains a frame log.
+        """
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, INDEX_FILENAME)):
+            raise FileExistsError(f"{path} already contains a frame log")
+        self.path = path
+        self.channels: List[Dict[str, str]] = []
+        self.channel_ids: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.data_file = open(os.path.join(path, DATA_FILENAME), "wb")
+        self.index_file = open(os.path.join(path, INDEX_FILENAME), "wb")
+        self.offset = 0
+        self.num_entries = 0
+        self.write_channels()
+
+    def add_channel(self, name: str, msg_type: str) -> int:
+        """
+        Add a channel to the log, if it does not exist yet.
+
+        Parameters
+        ----------
+        name: The name of the channel (e.g., the topic).
+        msg_type: The type of the channel's messages (e.g., "sensor_msgs/msg/Image").
+
+        Returns
+        -------
+        int: The channel's id.
+        """
+        with self.lock:
+            if name not in self.channel_ids:
+                self.channel_ids[name] = len(self.channels)
+                self.channels.append({"name": name, "type": msg_type})
+                self.write_channels()
+            return self.channel_ids[name]
+
+    def write_channels(self) -> None:
+        """
+        (Re)write the channels file.
+        """
+        with open(os.path.join(self.path, CHANNELS_FILENAME), "w") as f:
+            json.dump({"version": FRAME_LOG_VERSION, "channels": self.channels}, f)
+
+    def append(
+        self, channel_id: int, recv_time_ns: int, data: Union[bytes, memoryview]
+    ) -> None:
+        """
+        Append a message to the log.
+
+        Parameters
+        ----------
+        channel_id: The id of the message's channel, from `add_channel`.
+        recv_time_ns: The time the message was received, in nanoseconds.
+        data: The message's bytes.
+        """
+        entry = np.array([(recv_time_ns, channel_id, len(data), 0)], dtype=INDEX_DTYPE)
+        with self.lock:
+            entry["offset"] = self.offset
+            self.data_file.write(data)
+            self.index_file.write(entry.tobytes())
+            self.offset += len(data)
+            self.num_entries += 1
+
+    def flush(self) -> None:
+        """
+        Flush the appended messages to the files.
+        """
+        with self.lock:
+            self.data_file.flush()
+            self.index_file.flush()
+
+    def close(self) -> None:
+        """
+        Flush and close the log.
+        """
+        with self.lock:
+            self.data_file.close()
+            self.index_file.close()
+
+    def __enter__(self) -> "FrameLogWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class FrameLogReader:
+    """
+    Reads a frame log through memory maps, so that only the messages that are
+    accessed are paged in.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the FrameLogReader.
+
+        Parameters
+        ----------
+        path: The directory of the frame log.
+
+        Raises
+        ------
+        ValueError: If the frame log is of an unsupported version.
+        """
+        self.path = path
+        with open(os.path.join(path, CHANNELS_FILENAME), "r") as f:
+            channels = json.load(f)
+        if channels["version"] != FRAME_LOG_VERSION:
+            raise ValueError(
+                f"Unsupported frame log version {channels['version']}, "
+                f"expected {FRAME_LOG_VERSION}"
+            )
+        self.channels: List[Dict[str, str]] = channels["channels"]
+
+        # Empty files cannot be memory mapped
+        self.data_file = open(os.path.join(path, DATA_FILENAME), "rb")
+        data_size = os.fstat(self.data_file.fileno()).st_size
+        self.data: Optional[mmap.mmap] = (
+            mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if data_size > 0
+            else None
+        )
+        index_path = os.path.join(path, INDEX_FILENAME)
+        num_entries = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        index: npt.NDArray = (
+            np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(num_entries,))
+            if num_entries > 0
+            else np.zeros(0, dtype=INDEX_DTYPE)
+        )
+        # Ignore any trailing entries whose data was not completely written
+        complete = index["offset"] + index["length"] <= data_size
+        num_complete = num_entries if complete.all() else int(np.argmin(complete))
+        self.index = index[:num_complete]
+
+    def __len__(self) -> int:
+        return self.index.shape[0]
+
+    def __getitem__(self, i: int) -> FrameLogEntry:
+        entry = self.index[i]
+        offset, length = int(entry["offset"]), int(entry["length"])
+        data = (
+            memoryview(self.data)[offset : offset + length]
+            if self.data is not None
+            else memoryview(b"")
+        )
+        return FrameLogEntry(
+            self.channels[entry["channel"]]["name"], int(entry["recv_time_ns"]), data
+        )
+
+    def __iter__(self) -> Iterator[FrameLogEntry]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def get_channel_type(self, name: str) -> str:
+        """
+        Get the message type of a channel.
+        """
+        for channel in self.channels:
+            if channel["name"] == name:
+                return channel["type"]
+        raise KeyError(f"The frame log has no channel {name}")
+
+    def get_channel_counts(self) -> Dict[str, int]:
+        """
+        Get the number of messages in every channel.
+        """
+        counts = np.bincount(self.index["channel"], minlength=len(self.channels))
+        return {
+            channel["name"]: int(count) for channel, count in zip(self.channels, counts)
+        }
+
+    def get_duration(self) -> float:
+        """
+        Get the time from the first to the last message, in seconds.
+        """
+        if len(self) == 0:
+            return 0.0
+        return (
+            int(self.index["recv_time_ns"][-1]) - int(self.index["recv_time_ns"][0])
+        ) / 1.0e9
+
+    def close(self) -> None:
+        """
+        Close the log. Entries' data cannot be accessed after this.
+        """
+        # Views of the memory map must be released before it can be closed
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        if self.data is not None:
+            try:
+                self.data.close()
+            except BufferError:
+                # Some entries' data is still referenced; let the GC unmap it
+                pass
+            self.data = None
+        self.data_file.close()
+
+    def __enter__(self) -> "FrameLogReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,113 @@
+"""
+This file contains a frame type that carries an image's channel order through the
+video stream pipeline, so that color conversions happen at most once (or are
+folded into the JPEG encoder).
+"""
+
+# Standard imports
+from enum import Enum
+from typing import Tuple
+
+# Third-party imports
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+
+class ChannelOrder(Enum):
+    """
+    The order of an image's color channels. Images with an alpha channel have it
+    last (e.g., BGRA), and single-channel images have no channel order.
+    """
+
+    BGR = "bgr"
+    RGB = "rgb"
+
+
+# The channel order of the ROS Image encodings that have color channels
+ENCODING_CHANNEL_ORDERS = {
+    "bgr8": ChannelOrder.BGR,
+    "bgra8": ChannelOrder.BGR,
+    "rgb8": ChannelOrder.RGB,
+    "rgba8": ChannelOrder.RGB,
+}
+
+
+class Frame:
+    """
+    An image, along with the order of its color channels.
+    """
+
+    def __init__(
+        self,
+        image: npt.NDArray[np.uint8],
+        channel_order: ChannelOrder = ChannelOrder.BGR,
+    ):
+        """
+        Initialize the Frame.
+
+        Parameters
+        ----------
+        image: The (h, w) greyscale, or (h, w, 3 or 4) color image.
+        channel_order: The order of the image's color channels.
+        """
+        self.image = image
+        self.channel_order = channel_order
+
+    @property
+    def is_color(self) -> bool:
+        """
+        Whether the image has color channels.
+        """
+        return self.image.ndim == 3 and self.image.shape[2] in (3, 4)
+
+    @property
+    def has_alpha(self) -> bool:
+        """
+        Whether the image has an alpha channel.
+        """
+        return self.image.ndim == 3 and self.image.shape[2] == 4
+
+    def with_image(self, image: npt.NDArray[np.uint8]) -> "Frame":
+        """
+        Get a frame with another image in the same channel order (e.g., the
+        result of cropping or rotating this frame's image).
+        """
+        return Frame(image, self.channel_order)
+
+    def to_channel_order(self, channel_order: ChannelOrder) -> "Frame":
+        """
+        Get the frame in a channel order. This only converts the image if it is in
+        a different channel order.
+
+        Parameters
+        ----------
+        channel_order: The channel order.
+
+        Returns
+        -------
+        Frame: This frame, if it is already in the channel order (or has no color
+            channels), else a converted copy.
+        """
+        if channel_order == self.channel_order or not self.is_color:
+            return self
+        # Swapping the first and third channels converts in either direction
+        color_transform = cv2.COLOR_BGRA2RGBA if self.has_alpha else cv2.COLOR_BGR2RGB
+        return Frame(cv2.cvtColor(self.image, color_transform), channel_order)
+
+    def convert_color(self, color: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """
+        Convert an RGB color to the frame's channel order, e.g., to draw it on the
+        frame without converting the frame.
+
+        Parameters
+        ----------
+        color: The (r, g, b) color.
+
+        Returns
+        -------
+        Tuple[int, int, int]: The color, in the frame's channel order.
+        """
+        if self.channel_order == ChannelOrder.BGR:
+            return tuple(color[::-1])
+        return tuple(color)
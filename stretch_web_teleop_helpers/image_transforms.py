@@ -0,0 +1,449 @@
+"""
+This file contains helpers to apply the crop, mask, and rotate transformations
+described in `configure_video_streams_params.yaml` to camera images.
+"""
+
+# Standard imports
+import math
+import struct
+from typing import Dict, List, Optional, Tuple
+
+# Third-party imports
+import cv2
+import numpy as np
+import numpy.typing as npt
+
+# libjpeg-turbo (through PyTurboJPEG) is optionally used to losslessly crop JPEGs
+try:
+    import turbojpeg
+except ImportError:
+    turbojpeg = None
+
+ROTATE_CODES = {
+    "ROTATE_90_CLOCKWISE": cv2.ROTATE_90_CLOCKWISE,
+    "ROTATE_180": cv2.ROTATE_180,
+    "ROTATE_90_COUNTERCLOCKWISE": cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+# The EXIF orientation that makes a viewer display a JPEG rotated clockwise by the
+# same amount as the corresponding `cv2.rotate` code.
+EXIF_ORIENTATIONS = {
+    cv2.ROTATE_90_CLOCKWISE: 6,
+    cv2.ROTATE_180: 3,
+    cv2.ROTATE_90_COUNTERCLOCKWISE: 8,
+}
+
+
+def create_circular_mask(
+    h: int,
+    w: int,
+    center: Optional[Tuple[int, int]] = None,
+    radius: Optional[float] = None,
+) -> npt.NDArray[np.bool_]:
+    """
+    Create a boolean mask that is True inside a circle.
+
+    Adapted from https://stackoverflow.com/questions/44865023/how-can-i-create-a-circular-mask-for-a-numpy-array # noqa: E501
+
+    Parameters
+    ----------
+    h: The height of the mask.
+    w: The width of the mask.
+    center: The (x, y) center of the circle. Defaults to the middle of the mask.
+    radius: The radius of the circle. Defaults to the smallest distance between
+        the center and the mask walls.
+
+    Returns
+    -------
+    npt.NDArray[np.bool_]: The (h, w) mask.
+    """
+    if center is None:  # use the middle of the image
+        center = (int(w / 2), int(h / 2))
+    if radius is None:  # use the smallest distance between the center and image walls
+        radius = min(center[0], center[1], w - center[0], h - center[1])
+
+    Y, X = np.ogrid[:h, :w]
+    dist_from_center = np.sqrt((X - center[0]) ** 2 + (Y - center[1]) ** 2)
+
+    mask = dist_from_center <= radius
+    return mask
+
+
+def rotate_image_around_center(
+    image: npt.NDArray[np.uint8],
+    angle: float,
+    background_color: Tuple[int, int, int],
+) -> npt.NDArray[np.uint8]:
+    """
+    Rotate an image counterclockwise around its center, keeping its size.
+
+    Parameters
+    ----------
+    image: The image.
+    angle: The angle to rotate by, in radians.
+    background_color: The color of pixels that are rotated in from outside the image.
+
+    Returns
+    -------
+    npt.NDArray[np.uint8]: The rotated image.
+    """
+    image_center = tuple(np.array(image.shape[1::-1]) / 2)
+    rot_mat = cv2.getRotationMatrix2D(image_center, math.degrees(angle), 1.0)
+    return cv2.warpAffine(
+        image,
+        rot_mat,
+        image.shape[1::-1],
+        flags=cv2.INTER_LINEAR,
+        borderValue=background_color,
+    )
+
+
+def get_perspectives_roi(
+    perspectives_params: List[Optional[Dict]],
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Get the region of the source image that a set of perspectives use: the union
+    of their crops.
+
+    Parameters
+    ----------
+    perspectives_params: The params of every perspective, from
+        `configure_video_streams_params.yaml`.
+
+    Returns
+    -------
+    Optional[Tuple[int, int, int, int]]: The (x, y, width, height) of the region,
+        or None if any perspective uses the whole image (or there are none).
+    """
+    crops = [(params or {}).get("crop", None) for params in perspectives_params]
+    if len(crops) == 0 or not all(crops):
+        return None
+    x_min = min(crop["x_min"] for crop in crops)
+    y_min = min(crop["y_min"] for crop in crops)
+    x_max = max(crop["x_max"] for crop in crops)
+    y_max = max(crop["y_max"] for crop in crops)
+    return (x_min, y_min, x_max - x_min, y_max - y_min)
+
+
+class PerspectiveTransform:
+    """
+    A crop, mask, and rotate transformation for one camera perspective, compiled
+    for a fixed input image shape.
+
+    All of the per-image bookkeeping (validating the parameters, building the
+    background, computing the circular mask, and working out where each output
+    pixel comes from) is done once, when the transform is compiled. Applying the
+    transform is then a single pass over the output image into a preallocated
+    buffer: a `cv2.rotate` if the perspective only rotates, else a `cv2.remap`
+    with a precomputed nearest-neighbor lookup table, where pixels that are
+    outside the input image or outside the mask get the background color.
+
+    The input images can also be a region of the camera's (source) image, and/or
+    be at a reduced scale (e.g., if only part of a JPEG was decoded, at a reduced
+    scale). The parameters are still in source pixels, and the output is at the
+    input's scale.
+
+    Note that the output buffer is reused across calls, so callers must be done
+    with the previous output (e.g., it must have been encoded) before applying
+    the transform again.
+    """
+
+    def __init__(
+        self,
+        params: Optional[Dict],
+        input_shape: Tuple[int, ...],
+        background_color: Tuple[int, int, int],
+        source_size: Optional[Tuple[int, int]] = None,
+        source_origin: Tuple[int, int] = (0, 0),
+        scale: float = 1.0,
+    ):
+        """
+        Compile the transform.
+
+        Parameters
+        ----------
+        params: The perspective's parameters, with (optional) "crop", "mask",
+            and "rotate" keys, as in `configure_video_streams_params.yaml`.
+        input_shape: The shape of the images the transform will be applied to.
+        background_color: The color of pixels that are outside the input
+            image or outside the mask.
+        source_size: The (width, height) of the source image. If None, the input
+            images are the source images.
+        source_origin: The (x, y) of the input's top-left corner in the source
+            image, in source pixels.
+        scale: The scale of the input images relative to the source image.
+        """
+        self.input_shape = tuple(input_shape)
+        params = params if params else {}
+        crop = params.get("crop", None)
+        mask = params.get("mask", None)
+        rotate = params.get("rotate", None)
+
+        if source_size is None:
+            source_size = (self.input_shape[1], self.input_shape[0])
+        in_w, in_h = source_size
+        # Whether the input is exactly the (possibly scaled) source image
+        is_whole_source = tuple(source_origin) == (0, 0) and (
+            scale == 1.0
+            or (
+                self.input_shape[0] == int(np.ceil(in_h * scale))
+                and self.input_shape[1] == int(np.ceil(in_w * scale))
+            )
+        )
+        num_channels = self.input_shape[2] if len(self.input_shape) > 2 else 1
+        self.border_value = (
+            tuple(background_color) if num_channels == 3 else (*background_color, 255)
+        )
+
+        # Validate the parameters
+        if crop:
+            for key in ("x_min", "x_max", "y_min", "y_max"):
+                if crop.get(key, None) is None:
+                    raise ValueError(f"Crop {key} is not defined!")
+            x_min, y_min = crop["x_min"], crop["y_min"]
+            h, w = crop["y_max"] - y_min, crop["x_max"] - x_min
+        else:
+            x_min, y_min = 0, 0
+            h, w = in_h, in_w
+        if mask:
+            if mask.get("width", None) is None:
+                raise ValueError("Mask width is not defined!")
+            if mask.get("height", None) is None:
+                raise ValueError("Mask height is not defined!")
+            if (mask["height"], mask["width"]) != (h, w):
+                raise ValueError(
+                    f"Mask size ({mask['width']}, {mask['height']}) must match "
+                    f"the cropped image size ({w}, {h})"
+                )
+        if rotate and rotate not in ROTATE_CODES:
+            raise ValueError(
+                "Invalid rotate image value: options are ROTATE_90_CLOCKWISE, ROTATE_180, or ROTATE_90_COUNTERCLOCKWISE"
+            )
+        self.rotate_code = ROTATE_CODES[rotate] if rotate else None
+
+        # If the perspective is the identity, return the input as-is
+        self.is_identity = is_whole_source and not crop and not mask and not rotate
+        # If the perspective only rotates, cv2.rotate is faster than a remap
+        self.is_rotate_only = is_whole_source and not crop and not mask and bool(rotate)
+
+        # Allocate the output buffer, at the input's scale
+        if self.is_identity or self.is_rotate_only:
+            scaled_h, scaled_w = self.input_shape[:2]
+        else:
+            scaled_h, scaled_w = max(1, round(h * scale)), max(1, round(w * scale))
+        if self.rotate_code in (
+            cv2.ROTATE_90_CLOCKWISE,
+            cv2.ROTATE_90_COUNTERCLOCKWISE,
+        ):
+            out_h, out_w = scaled_w, scaled_h
+        else:
+            out_h, out_w = scaled_h, scaled_w
+        self.output_shape = (out_h, out_w) + tuple(self.input_shape[2:])
+        self.output = np.empty(self.output_shape, dtype=np.uint8)
+        self.map1, self.map2 = None, None
+        if self.is_identity or self.is_rotate_only:
+            return
+
+        # For every output pixel, get the (row, col) of the pixel in the cropped
+        # and masked (but not yet rotated) image that it comes from.
+        rows, cols = np.indices((out_h, out_w), dtype=np.int32)
+        if self.rotate_code == cv2.ROTATE_90_CLOCKWISE:
+            rows, cols = scaled_h - 1 - cols, rows
+        elif self.rotate_code == cv2.ROTATE_180:
+            rows, cols = scaled_h - 1 - rows, scaled_w - 1 - cols
+        elif self.rotate_code == cv2.ROTATE_90_COUNTERCLOCKWISE:
+            rows, cols = cols, scaled_w - 1 - rows
+
+        # Then, get the (row, col) in the input image. Pixels outside the input
+        # image will get the border value.
+        map_x = (cols + (x_min - source_origin[0]) * scale).astype(np.float32)
+        map_y = (rows + (y_min - source_origin[1]) * scale).astype(np.float32)
+        if mask:
+            center = (
+                (mask["center"]["x"], mask["center"]["y"])
+                if mask.get("center", None)
+                else None
+            )
+            circular_mask = create_circular_mask(h, w, center, mask.get("radius", None))
+            if scale != 1.0:
+                # The mask is in source pixels
+                rows = np.minimum(((rows + 0.5) / scale).astype(np.int32), h - 1)
+                cols = np.minimum(((cols + 0.5) / scale).astype(np.int32), w - 1)
+            outside_mask = ~circular_mask[rows, cols]
+            map_x[outside_mask] = -1
+            map_y[outside_mask] = -1
+        self.map1, self.map2 = cv2.convertMaps(
+            map_x, map_y, cv2.CV_16SC2, nninterpolation=True
+        )
+
+    def apply(self, image: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+        """
+        Apply the transform to an image.
+
+        Parameters
+        ----------
+        image: The image, which must have the shape the transform was compiled for.
+
+        Returns
+        -------
+        npt.NDArray[np.uint8]: The transformed image. Unless the transform is
+            the identity, this is the transform's (reused) output buffer.
+        """
+        if image.shape != self.input_shape:
+            raise ValueError(
+                f"Image shape {image.shape} does not match the compiled shape {self.input_shape}"
+            )
+        if self.is_identity:
+            return image
+        if self.is_rotate_only:
+            return cv2.rotate(image, self.rotate_code, dst=self.output)
+        return cv2.remap(
+            image,
+            self.map1,
+            self.map2,
+            interpolation=cv2.INTER_NEAREST,
+            dst=self.output,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=self.border_value,
+        )
+
+
+def create_exif_orientation_segment(orientation: int) -> bytes:
+    """
+    Create a JPEG APP1 segment that contains only an EXIF orientation tag.
+
+    Parameters
+    ----------
+    orientation: The EXIF orientation, in [1, 8].
+
+    Returns
+    -------
+    bytes: The segment, including its marker.
+    """
+    if not 1 <= orientation <= 8:
+        raise ValueError(f"Invalid EXIF orientation: {orientation}")
+    # A big-endian TIFF header, followed by an IFD with one entry: the orientation,
+    # a SHORT (type 3) with count 1, padded to 4 bytes. There is no next IFD.
+    tiff = b"MM\x00\x2a" + struct.pack(">I", 8)
+    tiff += struct.pack(">HHHIHHI", 1, 0x0112, 3, 1, orientation, 0, 0)
+    payload = b"Exif\x00\x00" + tiff
+    return b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+
+def insert_jpeg_app_segment(jpeg: bytes, segment: bytes) -> Optional[bytes]:
+    """
+    Insert an application segment into a JPEG, after its SOI marker and any
+    JFIF (APP0) segments.
+
+    Parameters
+    ----------
+    jpeg: The JPEG.
+    segment: The segment to insert, including its marker.
+
+    Returns
+    -------
+    Optional[bytes]: The JPEG with the segment inserted, or None if the JPEG is
+        malformed or already has an EXIF segment (which the new one would conflict
+        with).
+    """
+    if jpeg[:2] != b"\xff\xd8":
+        return None
+    offset = 2
+    insert_offset = None
+    # Walk the application segments at the start of the JPEG
+    while offset + 4 <= len(jpeg) and jpeg[offset] == 0xFF:
+        marker = jpeg[offset + 1]
+        if not 0xE0 <= marker <= 0xEF:
+            break
+        if marker == 0xE1 and jpeg[offset + 4 : offset + 10] == b"Exif\x00\x00":
+            return None
+        if marker != 0xE0 and insert_offset is None:
+            insert_offset = offset
+        (length,) = struct.unpack(">H", jpeg[offset + 2 : offset + 4])
+        offset += 2 + length
+    if insert_offset is None:
+        insert_offset = offset
+    return jpeg[:insert_offset] + segment + jpeg[insert_offset:]
+
+
+class LosslessJPEGTransform:
+    """
+    A crop and rotate transformation for one camera perspective, applied directly
+    to JPEGs without decoding and re-encoding them.
+
+    Rotations are not applied to the pixels. Instead, the JPEG is tagged with the
+    EXIF orientation that makes the viewer (e.g., the browser) display it rotated.
+    Crops are done losslessly by libjpeg-turbo, which requires PyTurboJPEG and the
+    crop's origin to be on a block (MCU) boundary of the JPEG. Masks are not supported.
+
+    Since the JPEG is not re-encoded, the perspective's "encoding" parameters do
+    not apply.
+    """
+
+    def __init__(self, params: Optional[Dict]):
+        """
+        Initialize the transform.
+
+        Parameters
+        ----------
+        params: The perspective's parameters, with (optional) "crop", "mask",
+            and "rotate" keys, as in `configure_video_streams_params.yaml`.
+        """
+        params = params if params else {}
+        self.crop = params.get("crop", None)
+        mask = params.get("mask", None)
+        rotate = params.get("rotate", None)
+        if rotate and rotate not in ROTATE_CODES:
+            raise ValueError(
+                "Invalid rotate image value: options are ROTATE_90_CLOCKWISE, ROTATE_180, or ROTATE_90_COUNTERCLOCKWISE"
+            )
+
+        # Whether the perspective can (sometimes) be applied losslessly
+        self.is_supported = not mask and (not self.crop or turbojpeg is not None)
+        self.turbojpeg = (
+            turbojpeg.TurboJPEG() if self.crop and self.is_supported else None
+        )
+        self.orientation_segment = (
+            create_exif_orientation_segment(EXIF_ORIENTATIONS[ROTATE_CODES[rotate]])
+            if rotate
+            else None
+        )
+
+    def apply(self, jpeg: bytes) -> Optional[bytes]:
+        """
+        Apply the transform to a JPEG.
+
+        Parameters
+        ----------
+        jpeg: The JPEG.
+
+        Returns
+        -------
+        Optional[bytes]: The transformed JPEG, or None if the transform cannot be
+            applied losslessly to this JPEG (e.g., the crop is not MCU-aligned),
+            in which case the caller should decode it and use a PerspectiveTransform.
+        """
+        if not self.is_supported:
+            return None
+        if self.crop:
+            x_min, y_min = self.crop["x_min"], self.crop["y_min"]
+            w = self.crop["x_max"] - x_min
+            h = self.crop["y_max"] - y_min
+            try:
+                in_w, in_h, subsample, _ = self.turbojpeg.decode_header(jpeg)
+            except OSError:
+                return None
+            if (
+                x_min < 0
+                or y_min < 0
+                or x_min + w > in_w
+                or y_min + h > in_h
+                or x_min % turbojpeg.tjMCUWidth[subsample] != 0
+                or y_min % turbojpeg.tjMCUHeight[subsample] != 0
+            ):
+                return None
+            if (x_min, y_min, w, h) != (0, 0, in_w, in_h):
+                jpeg = self.turbojpeg.crop(jpeg, x_min, y_min, w, h)
+        if self.orientation_segment is not None:
+            return insert_jpeg_app_segment(jpeg, self.orientation_segment)
+        return jpeg
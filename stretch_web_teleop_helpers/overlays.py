@@ -0,0 +1,496 @@
+"""
+This file contains helpers for the AR overlays that ConfigureVideoStreams draws
+on top of the camera images: computing their masks, caching the masks, and
+blending them onto the images.
+"""
+
+# Standard imports
+from typing import Dict, Optional, Tuple, Union
+
+# Third-party imports
+import cv2
+import numpy as np
+import numpy.typing as npt
+from geometry_msgs.msg import TransformStamped
+
+# Local imports
+from .conversions import (
+    DepthDeprojector,
+    deproject_pixel_to_pointcloud_point,
+    project_points_to_mask,
+    project_points_to_pixels,
+    transform_points,
+)
+from .frames import ChannelOrder
+from .pointcloud_filters import box_filter, filter_pointcloud
+
+
+class OverlayMaskCache:
+    """
+    Caches the most recent overlay mask, so it can be reused across RGB frames.
+
+    RGB images typically arrive faster than depth, and an overlay mask only depends
+    on the depth message and the camera's pose (e.g., the transform to base_link,
+    or the gripper's aperture). The cached mask is reused as long as the depth
+    message's stamp is the same and the pose is within tolerance of the pose the
+    mask was computed at.
+    """
+
+    def __init__(
+        self,
+        translation_tolerance: float = 0.005,
+        rotation_tolerance: float = np.radians(0.5),
+        state_tolerance: float = 0.01,
+    ):
+        """
+        Initialize the OverlayMaskCache.
+
+        Parameters
+        ----------
+        translation_tolerance: The maximum change in the camera's position (m) for
+            which the cached mask is reused.
+        rotation_tolerance: The maximum change in the camera's orientation (rad) for
+            which the cached mask is reused.
+        state_tolerance: The maximum change in any element of the joint state for
+            which the cached mask is reused.
+        """
+        self.translation_tolerance = translation_tolerance
+        self.rotation_tolerance = rotation_tolerance
+        self.state_tolerance = state_tolerance
+
+        self.stamp: Optional[Tuple[int, int]] = None
+        self.shape: Optional[Tuple[int, ...]] = None
+        self.pose: Optional[npt.NDArray] = None
+        self.state: Optional[npt.NDArray] = None
+        self.mask: Optional[npt.NDArray[np.uint8]] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def is_pose_close(self, pose: Optional[npt.NDArray]) -> bool:
+        """
+        Check whether a 4x4 camera pose is within tolerance of the cached pose.
+        """
+        if pose is None or self.pose is None:
+            return pose is None and self.pose is None
+        if np.linalg.norm(pose[:3, 3] - self.pose[:3, 3]) > self.translation_tolerance:
+            return False
+        # The angle of the relative rotation, from its trace
+        cos_angle = (np.trace(self.pose[:3, :3].T @ pose[:3, :3]) - 1.0) / 2.0
+        return np.arccos(np.clip(cos_angle, -1.0, 1.0)) <= self.rotation_tolerance
+
+    def is_state_close(self, state: Optional[npt.NDArray]) -> bool:
+        """
+        Check whether a joint state is within tolerance of the cached joint state.
+        """
+        if state is None or self.state is None:
+            return state is None and self.state is None
+        return bool(np.all(np.abs(state - self.state) <= self.state_tolerance))
+
+    def lookup(
+        self,
+        stamp: Tuple[int, int],
+        shape: Tuple[int, ...],
+        pose: Optional[npt.NDArray] = None,
+        state: Optional[npt.NDArray] = None,
+    ) -> Optional[npt.NDArray[np.uint8]]:
+        """
+        Get the cached mask, if it was computed for the same depth message and
+        image shape, and a camera pose and joint state within tolerance.
+
+        Parameters
+        ----------
+        stamp: The depth message's header stamp, as (sec, nanosec).
+        shape: The shape of the image the mask will be overlaid on.
+        pose: The camera's 4x4 pose, if the mask depends on it.
+        state: The joint state the mask depends on, if any.
+
+        Returns
+        -------
+        Optional[npt.NDArray[np.uint8]]: The cached mask, or None on a cache miss.
+        """
+        if (
+            self.mask is not None
+            and stamp == self.stamp
+            and shape == self.shape
+            and self.is_pose_close(pose)
+            and self.is_state_close(state)
+        ):
+            self.hits += 1
+            return self.mask
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        stamp: Tuple[int, int],
+        shape: Tuple[int, ...],
+        mask: npt.NDArray[np.uint8],
+        pose: Optional[npt.NDArray] = None,
+        state: Optional[npt.NDArray] = None,
+    ) -> None:
+        """
+        Cache a mask, along with the inputs it was computed from.
+
+        Parameters
+        ----------
+        stamp: The depth message's header stamp, as (sec, nanosec).
+        shape: The shape of the image the mask will be overlaid on.
+        mask: The mask.
+        pose: The camera's 4x4 pose, if the mask depends on it.
+        state: The joint state the mask depends on, if any.
+        """
+        self.stamp = stamp
+        self.shape = shape
+        self.mask = mask
+        self.pose = None if pose is None else np.array(pose)
+        self.state = None if state is None else np.array(state)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Get the fraction of lookups that were cache hits.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+class OverlayBlender:
+    """
+    Alpha-blends a constant color onto the masked pixels of an image, in-place.
+
+    Only the region of interest (by default, the mask's bounding box) is blended,
+    and the constant color plane and the blending buffer are allocated once per
+    image shape and reused, so overlaying a small mask does not touch, or allocate,
+    full-frame arrays.
+    """
+
+    def __init__(self, color: npt.ArrayLike, alpha: float):
+        """
+        Initialize the OverlayBlender.
+
+        Parameters
+        ----------
+        color: The (r, g, b) overlay color.
+        alpha: The opacity of the overlay, in [0, 1].
+        """
+        self.color = np.asarray(color, dtype=np.uint8)
+        self.alpha = alpha
+        # Maps (image shape, channel order) to the (color plane, blending buffer)
+        self.buffers: Dict[
+            Tuple[Tuple[int, ...], ChannelOrder], Tuple[npt.NDArray, npt.NDArray]
+        ] = {}
+
+    def get_buffers(
+        self, shape: Tuple[int, ...], channel_order: ChannelOrder = ChannelOrder.RGB
+    ) -> Tuple[npt.NDArray[np.uint8], npt.NDArray[np.uint8]]:
+        """
+        Get the color plane and blending buffer for an image shape and channel order.
+        """
+        key = (shape, channel_order)
+        if key not in self.buffers:
+            color_plane = np.empty(shape, dtype=np.uint8)
+            color_plane[...] = (
+                self.color[::-1] if channel_order == ChannelOrder.BGR else self.color
+            )
+            self.buffers[key] = (color_plane, np.empty(shape, dtype=np.uint8))
+        return self.buffers[key]
+
+    def blend(
+        self,
+        image: npt.NDArray[np.uint8],
+        mask: npt.NDArray[np.uint8],
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        channel_order: ChannelOrder = ChannelOrder.RGB,
+    ) -> npt.NDArray[np.uint8]:
+        """
+        Blend the overlay color onto the pixels of the image where the mask is
+        nonzero. The result is identical to blending the whole frame with
+        `cv2.addWeighted` and selecting the masked pixels.
+
+        Parameters
+        ----------
+        image: The image to overlay onto. It is modified in-place, unless it is
+            read-only (e.g., a view of a ROS message's buffer), in which case it
+            is copied first.
+        mask: The uint8 mask. If roi is None, it must be the size of the image;
+            else, it must be the size of the roi.
+        roi: The (x, y, w, h) region of the image that the mask covers. If None,
+            the bounding box of the mask's nonzero pixels is used.
+        channel_order: The order of the image's color channels.
+
+        Returns
+        -------
+        npt.NDArray[np.uint8]: The overlaid image.
+        """
+        if roi is None:
+            x, y, w, h = cv2.boundingRect(mask)
+            mask = mask[y : y + h, x : x + w]
+        else:
+            x, y, w, h = roi
+        if w == 0 or h == 0:
+            return image
+        if not image.flags.writeable:
+            image = image.copy()
+        color_plane, buffer = self.get_buffers(image.shape, channel_order)
+        image_roi = image[y : y + h, x : x + w]
+        blended = cv2.addWeighted(
+            image_roi,
+            1 - self.alpha,
+            color_plane[y : y + h, x : x + w],
+            self.alpha,
+            0,
+            dst=buffer[y : y + h, x : x + w],
+        )
+        cv2.copyTo(blended, mask, image_roi)
+        return image
+
+
+def get_reach_mask_from_pointcloud(
+    pc_in_camera: npt.NDArray,
+    transform: Union[TransformStamped, npt.NDArray],
+    proj: npt.NDArray,
+    img_shape: Tuple[int, ...],
+    leaf_size: float,
+    dilation_kernel_size: int,
+    depth_limits: Tuple[float, float] = (0.01, 1.5),
+    min_dist: float = 0.25,
+    max_dist: float = 1.0,
+) -> Optional[npt.NDArray[np.uint8]]:
+    """
+    Get the mask of pixels in the robot's reach by filtering, downsampling, and
+    transforming the pointcloud, and projecting the points in reach back into
+    the image.
+
+    Parameters
+    ----------
+    pc_in_camera: The pointcloud in the camera frame. Size: (N, 3).
+    transform: The transform from the camera frame to base_link.
+    proj: The camera's projection matrix.
+    img_shape: The shape of the image to overlay the mask on.
+    leaf_size: The size of the voxels to downsample the pointcloud with.
+    dilation_kernel_size: The size of the kernel to dilate the projected points by.
+    depth_limits: The (min, max) distance of the points from the camera.
+    min_dist: The minimum distance of the points from the base in the XY plane.
+    max_dist: The maximum distance of the points from the base in the XY plane.
+
+    Returns
+    -------
+    Optional[npt.NDArray[np.uint8]]: The mask, or None if there are no points.
+    """
+    # Filter by points that are within depth_limits of the camera, and downsample
+    # points using a VoxelGrid
+    pc_in_camera_filtered = filter_pointcloud(
+        np.asarray(pc_in_camera, dtype=np.float32),
+        z_limits=depth_limits,
+        leaf_size=leaf_size,
+    )
+    if pc_in_camera_filtered.size == 0:
+        return None
+
+    # Transform point cloud to base link
+    pc_in_base_link = transform_points(pc_in_camera_filtered, transform)
+
+    # Only keep points that are between min_dist and max_dist from the base in
+    # the XY plane
+    dist = np.sqrt(
+        np.power(pc_in_base_link[:, 0], 2) + np.power(pc_in_base_link[:, 1], 2)
+    )
+    filtered_indices = np.where((dist > min_dist) & (dist < max_dist))[0]
+
+    # Get filtered points in camera frame
+    pts_in_range = pc_in_camera_filtered[filtered_indices, :]
+
+    # Overlay the pixels in the robot's reach. Allocate a new mask, since the
+    # previous one may still be cached.
+    return project_points_to_mask(
+        pts_in_range,
+        proj,
+        width=img_shape[1],
+        height=img_shape[0],
+        dilation_kernel_size=dilation_kernel_size,
+    )
+
+
+def get_reach_mask_from_depth_image(
+    deprojector: DepthDeprojector,
+    depth_image: npt.NDArray,
+    transform: Union[TransformStamped, npt.NDArray],
+    img_shape: Tuple[int, ...],
+    depth_limits: Tuple[float, float] = (0.01, 1.5),
+    min_dist: float = 0.25,
+    max_dist: float = 1.0,
+) -> npt.NDArray[np.uint8]:
+    """
+    Get the mask of pixels in the robot's reach directly from the aligned depth
+    image, by computing the planar distance from the base of every pixel.
+
+    Parameters
+    ----------
+    deprojector: The deprojector, with the depth camera's intrinsics set.
+    depth_image: The depth image, aligned to the color image.
+    transform: The transform from the camera frame to base_link.
+    img_shape: The shape of the image to overlay the mask on.
+    depth_limits: The (min, max) depth of the pixels.
+    min_dist: The minimum distance of the pixels from the base in the XY plane.
+    max_dist: The maximum distance of the pixels from the base in the XY plane.
+
+    Returns
+    -------
+    npt.NDArray[np.uint8]: The mask.
+    """
+    overlay_mask = deprojector.planar_distance_mask(
+        depth_image,
+        transform,
+        min_dist=min_dist,
+        max_dist=max_dist,
+        depth_limits=depth_limits,
+    )
+    if overlay_mask.shape[:2] != img_shape[:2]:
+        overlay_mask = cv2.resize(
+            overlay_mask,
+            (img_shape[1], img_shape[0]),
+            interpolation=cv2.INTER_NEAREST,
+        )
+    return overlay_mask
+
+
+def get_body_landmarks_mask(
+    body_landmarks_3d: npt.NDArray,
+    proj: npt.NDArray,
+    img_shape: Tuple[int, ...],
+) -> Optional[Tuple[npt.NDArray[np.uint8], Tuple[int, int, int, int]]]:
+    """
+    Get the mask of circles on the body landmarks, covering only the region of
+    the image that the circles cover.
+
+    Parameters
+    ----------
+    body_landmarks_3d: The body landmarks in the camera frame. Size: (N, 3).
+    proj: The camera's projection matrix.
+    img_shape: The shape of the image to overlay the mask on.
+
+    Returns
+    -------
+    Optional[Tuple[npt.NDArray[np.uint8], Tuple[int, int, int, int]]]: The mask,
+        and the (x, y, width, height) region of the image it covers, or None if no
+        landmarks are in the image.
+    """
+    body_landmarks_2d = project_points_to_pixels(
+        body_landmarks_3d,
+        proj,
+        width=img_shape[1],
+        height=img_shape[0],
+    )
+    if body_landmarks_2d.shape[0] == 0:
+        return None
+
+    radius = min(img_shape[0], img_shape[1]) // 40
+    x_min = max(int(body_landmarks_2d[:, 0].min()) - radius, 0)
+    y_min = max(int(body_landmarks_2d[:, 1].min()) - radius, 0)
+    x_max = min(int(body_landmarks_2d[:, 0].max()) + radius + 1, img_shape[1])
+    y_max = min(int(body_landmarks_2d[:, 1].max()) + radius + 1, img_shape[0])
+    overlay_mask = np.zeros((y_max - y_min, x_max - x_min), dtype=np.uint8)
+    for u, v in body_landmarks_2d:
+        cv2.circle(overlay_mask, (u - x_min, v - y_min), radius, (255,), -1)
+    return overlay_mask, (x_min, y_min, x_max - x_min, y_max - y_min)
+
+
+def create_aruco_detector() -> cv2.aruco.ArucoDetector:
+    """
+    Create the detector of the gripper's aruco markers.
+    """
+    aruco_parameters = cv2.aruco.DetectorParameters()
+    aruco_parameters.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
+    aruco_dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_250)
+    return cv2.aruco.ArucoDetector(aruco_dictionary, aruco_parameters)
+
+
+def get_graspable_region_mask(
+    image: npt.NDArray,
+    pc_in_camera: npt.NDArray,
+    proj: npt.NDArray,
+    aruco_detector: cv2.aruco.ArucoDetector,
+    aruco_ids: Dict[str, int],
+    leaf_size: float,
+    dilation_kernel_size: int,
+) -> Tuple[Optional[npt.NDArray[np.uint8]], Optional[str]]:
+    """
+    Get the mask of pixels within the graspable region of the gripper, by
+    locating the fingers' aruco markers in the image.
+
+    Note that this does not require extrinsics calibration between the camera and
+    the gripper, because it utilizes the aruco markers on the gripper.
+
+    Parameters
+    ----------
+    image: The gripper camera's image.
+    pc_in_camera: The pointcloud in the camera frame. Size: (N, 3).
+    proj: The camera's projection matrix.
+    aruco_detector: The detector of the gripper's aruco markers.
+    aruco_ids: The ids of the "finger_left" and "finger_right" markers.
+    leaf_size: The size of the voxels to downsample the pointcloud with.
+    dilation_kernel_size: The size of the kernel to dilate the projected points by.
+
+    Returns
+    -------
+    Optional[npt.NDArray[np.uint8]]: The mask, or None if it could not be computed.
+    Optional[str]: If the mask could not be computed, why.
+    """
+    # Filter the pointcloud to only nearby points, to lower its size
+    # and downsample points using a VoxelGrid
+    pc_in_camera_filtered = filter_pointcloud(
+        np.asarray(pc_in_camera, dtype=np.float32),
+        z_limits=(0.01, 0.3),
+        leaf_size=leaf_size,
+    )
+    if pc_in_camera_filtered.shape[0] == 0:
+        return None, "No points in the gripper's depth image."
+
+    # Detect the gripper markers
+    corners, ids, _ = aruco_detector.detectMarkers(image)
+    if ids is None:
+        return None, "Did not detect any aruco markers on the gripper."
+    aruco_center_pos = {}
+    for label, aruco_id in aruco_ids.items():
+        if aruco_id in ids:
+            idx = np.argmax(ids == aruco_id)
+            aruco_corners = corners[idx][0]
+            center = np.mean(aruco_corners, axis=0)
+            aruco_center_pos[label] = deproject_pixel_to_pointcloud_point(
+                center[0], center[1], pc_in_camera_filtered, proj
+            )
+            if aruco_center_pos[label] is None:
+                return None, f"Could not deproject the center of aruco marker {label}."
+    if "finger_left" not in aruco_center_pos or "finger_right" not in aruco_center_pos:
+        return None, "Did not detect both aruco markers on the gripper."
+
+    # Filter the points to those in the range. Note that (x, y, z) is in the
+    # camera frame (e.g., +z out of camera, +x to the left of camera, +y up)
+    left_x, left_y, left_z = aruco_center_pos["finger_left"]
+    right_x, right_y, right_z = aruco_center_pos["finger_right"]
+    # Filter points within the distance range. Add a depth offset of 5cm to
+    # account for the offset between the aruco marker and the gripper tip.
+    # Also filter points within the x range and the y range.
+    z_offset_m = 0.04
+    y_offset_m = 0.02
+    pts_in_range = box_filter(
+        pc_in_camera_filtered,
+        x_limits=(left_x, right_x),
+        y_limits=(
+            min(left_y, right_y) - y_offset_m,
+            max(left_y, right_y) + y_offset_m,
+        ),
+        z_limits=(0.01, max(left_z, right_z) + z_offset_m),
+    )
+
+    # Overlay the pixels in the graspable region. Allocate a new mask, since
+    # the previous one may still be cached.
+    mask = project_points_to_mask(
+        pts_in_range,
+        proj,
+        width=image.shape[1],
+        height=image.shape[0],
+        dilation_kernel_size=dilation_kernel_size,
+    )
+    return mask, None
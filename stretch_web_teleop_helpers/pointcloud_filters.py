@@ -0,0 +1,183 @@
+"""
+This file contains vectorized pointcloud filters that operate directly on (N, 3)
+NumPy arrays. They follow the semantics of PCL's PassThrough and VoxelGrid filters,
+but avoid round-tripping through `pcl.PointCloud` objects.
+"""
+
+# Standard imports
+from typing import Optional, Tuple
+
+# Third-party imports
+import numpy as np
+import numpy.typing as npt
+
+
+def box_filter_mask(
+    points: npt.NDArray[np.float32],
+    x_limits: Optional[Tuple[float, float]] = None,
+    y_limits: Optional[Tuple[float, float]] = None,
+    z_limits: Optional[Tuple[float, float]] = None,
+) -> npt.NDArray[np.bool_]:
+    """
+    Get a mask of the points that are within an axis-aligned box.
+
+    Like PCL's PassThrough filter, the limits are inclusive, and points with a NaN
+    coordinate on a filtered axis are removed.
+
+    Parameters
+    ----------
+    points: The array of (x, y, z) points. Size: (N, 3).
+    x_limits: The (min, max) limits on the x coordinate. If None, x is not filtered.
+    y_limits: The (min, max) limits on the y coordinate. If None, y is not filtered.
+    z_limits: The (min, max) limits on the z coordinate. If None, z is not filtered.
+
+    Returns
+    -------
+    npt.NDArray[np.bool_]: The mask of points within the box. Size: (N,).
+    """
+    mask = np.ones(points.shape[0], dtype=bool)
+    for axis, limits in enumerate((x_limits, y_limits, z_limits)):
+        if limits is None:
+            continue
+        values = points[:, axis]
+        # NaN comparisons are False, so NaNs get filtered out
+        np.logical_and(mask, values >= limits[0], out=mask)
+        np.logical_and(mask, values <= limits[1], out=mask)
+    return mask
+
+
+def box_filter(
+    points: npt.NDArray[np.float32],
+    x_limits: Optional[Tuple[float, float]] = None,
+    y_limits: Optional[Tuple[float, float]] = None,
+    z_limits: Optional[Tuple[float, float]] = None,
+) -> npt.NDArray[np.float32]:
+    """
+    Only keep the points that are within an axis-aligned box. This is equivalent
+    to chaining one PCL PassThrough filter per filtered axis.
+
+    Parameters
+    ----------
+    points: The array of (x, y, z) points. Size: (N, 3).
+    x_limits: The (min, max) limits on the x coordinate. If None, x is not filtered.
+    y_limits: The (min, max) limits on the y coordinate. If None, y is not filtered.
+    z_limits: The (min, max) limits on the z coordinate. If None, z is not filtered.
+
+    Returns
+    -------
+    npt.NDArray[np.float32]: The points within the box. Size: (M, 3).
+    """
+    return points[box_filter_mask(points, x_limits, y_limits, z_limits)]
+
+
+def voxel_grid_filter(
+    points: npt.NDArray[np.float32],
+    leaf_size: float,
+) -> npt.NDArray[np.float32]:
+    """
+    Downsample the points by replacing all the points within each voxel with
+    their centroid.
+
+    Like PCL's VoxelGrid filter, voxels are aligned to multiples of the leaf size,
+    non-finite points are removed, and the centroids are ordered by voxel index
+    (z-major, then y, then x).
+
+    Voxels are grouped by packing each point's integer voxel coordinates into one
+    int64 key. If the grid that the points span has no more cells than there are
+    points (coarse leaf sizes), the keys directly index a table of occupied cells,
+    in O(N + cells). Otherwise (e.g., the depth AR overlays' fine leaf sizes, whose
+    grids have many more cells than points), the keys are sorted, in O(N log N),
+    like PCL sorts its (key, point index) pairs. NumPy has no vectorized hash table
+    (`np.unique` also sorts), and hashing the keys with a Python dict is ~10x
+    slower than the sort for 200k points.
+
+    Parameters
+    ----------
+    points: The array of (x, y, z) points. Size: (N, 3).
+    leaf_size: The edge length of a voxel, in the same units as the points.
+
+    Returns
+    -------
+    npt.NDArray[np.float32]: The centroid of every occupied voxel. Size: (M, 3).
+    """
+    if leaf_size <= 0:
+        raise ValueError(f"Leaf size must be positive, got {leaf_size}")
+    # Summing is much cheaper than a per-point check, and is only non-finite
+    # if some point is non-finite (barring overflow, which is also handled).
+    if not np.isfinite(points.sum()):
+        points = points[np.isfinite(points).all(axis=1)]
+    num_points = points.shape[0]
+    if num_points == 0:
+        return np.zeros((0, 3), dtype=points.dtype)
+
+    # Get the integer voxel coordinates of every point, relative to the minimum.
+    # Work on (3, N) arrays so that the per-axis reductions are contiguous.
+    voxel_coords = np.empty((3, num_points), dtype=np.float32)
+    np.multiply(points.T, np.float32(1.0 / leaf_size), out=voxel_coords)
+    np.floor(voxel_coords, out=voxel_coords)
+    min_coords = voxel_coords.min(axis=1)
+    dims = (voxel_coords.max(axis=1) - min_coords).astype(np.int64) + 1
+
+    # Pack the coordinates into one key per point, and get the index of every
+    # point's voxel, in order of the voxels' keys.
+    voxel_coords -= min_coords[:, np.newaxis]
+    voxel_coords = voxel_coords.astype(np.int64)
+    keys = voxel_coords[0] + dims[0] * (voxel_coords[1] + dims[1] * voxel_coords[2])
+    num_cells = int(dims[0]) * int(dims[1]) * int(dims[2])
+    if num_cells <= num_points:
+        # Number the occupied cells in key order, and look up every point's voxel
+        is_occupied = np.zeros(num_cells, dtype=bool)
+        is_occupied[keys] = True
+        cell_voxel_idx = np.cumsum(is_occupied, dtype=np.intp) - 1
+        voxel_idx = cell_voxel_idx[keys]
+        num_voxels = int(cell_voxel_idx[-1]) + 1
+    else:
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        is_first_in_voxel = np.empty(num_points, dtype=bool)
+        is_first_in_voxel[0] = True
+        np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_first_in_voxel[1:])
+        voxel_idx = np.empty(num_points, dtype=np.intp)
+        voxel_idx[order] = np.cumsum(is_first_in_voxel) - 1
+        num_voxels = int(voxel_idx[order[-1]]) + 1
+
+    # Average the points in every voxel
+    counts = np.bincount(voxel_idx, minlength=num_voxels)
+    centroids = np.empty((num_voxels, 3), dtype=points.dtype)
+    for axis in range(3):
+        centroids[:, axis] = (
+            np.bincount(voxel_idx, weights=points[:, axis], minlength=num_voxels)
+            / counts
+        )
+    return centroids
+
+
+def filter_pointcloud(
+    points: npt.NDArray[np.float32],
+    x_limits: Optional[Tuple[float, float]] = None,
+    y_limits: Optional[Tuple[float, float]] = None,
+    z_limits: Optional[Tuple[float, float]] = None,
+    leaf_size: Optional[float] = None,
+) -> npt.NDArray[np.float32]:
+    """
+    Filter the points to an axis-aligned box and then (optionally) downsample them
+    with a voxel grid. The box limits are applied as one fused mask, so this makes
+    a single copy of the points in the box regardless of how many axes are filtered.
+
+    Parameters
+    ----------
+    points: The array of (x, y, z) points. Size: (N, 3).
+    x_limits: The (min, max) limits on the x coordinate. If None, x is not filtered.
+    y_limits: The (min, max) limits on the y coordinate. If None, y is not filtered.
+    z_limits: The (min, max) limits on the z coordinate. If None, z is not filtered.
+    leaf_size: The voxel edge length to downsample with. If None or not positive,
+        the points are not downsampled.
+
+    Returns
+    -------
+    npt.NDArray[np.float32]: The filtered points. Size: (M, 3).
+    """
+    points = box_filter(points, x_limits, y_limits, z_limits)
+    if leaf_size is not None and leaf_size > 0:
+        points = voxel_grid_filter(points, leaf_size)
+    return points
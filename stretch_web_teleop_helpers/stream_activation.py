@@ -0,0 +1,175 @@
+"""
+This file contains helpers to only subscribe to a video stream's upstream topics
+(e.g., images, pointclouds) while someone is consuming the stream.
+"""
+
+# Standard imports
+import threading
+from typing import Any, Callable, List, Optional
+
+# Third-party imports
+from rclpy.node import Node
+from rclpy.publisher import Publisher
+from rclpy.subscription import Subscription
+
+
+class OnDemandSubscription:
+    """
+    A subscription that a StreamActivator creates and destroys on demand.
+    """
+
+    def __init__(
+        self,
+        args: tuple,
+        kwargs: dict,
+        condition: Optional[Callable[[], bool]] = None,
+        on_destroy: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Initialize the OnDemandSubscription.
+
+        Parameters
+        ----------
+        args: The positional arguments to `Node.create_subscription`.
+        kwargs: The keyword arguments to `Node.create_subscription`.
+        condition: If not None, the subscription is only wanted while the stream
+            is active and this returns True (e.g., while an overlay is enabled).
+        on_destroy: Called after the subscription is destroyed, e.g., to clear the
+            (now stale) latest message it received.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        self.condition = condition
+        self.on_destroy = on_destroy
+        self.subscription: Optional[Subscription] = None
+        # The last time the subscription was wanted
+        self.last_wanted_time: Optional[float] = None
+
+
+class StreamActivator:
+    """
+    Manages the upstream subscriptions of one video stream, so that they only exist
+    while the stream's output publishers have subscribers.
+
+    Subscriptions are created as soon as they are wanted, but are only destroyed
+    once they have not been wanted for the debounce period, so that briefly
+    disconnecting (e.g., reloading the web app) does not thrash subscriptions.
+    """
+
+    def __init__(
+        self,
+        node: Node,
+        name: str,
+        publishers: List[Publisher],
+        debounce_sec: float = 5.0,
+    ):
+        """
+        Initialize the StreamActivator.
+
+        Parameters
+        ----------
+        node: The ROS node that owns the subscriptions.
+        name: The name of the stream, for logging.
+        publishers: The stream's output publishers. The stream is active while
+            any of them has a subscriber.
+        debounce_sec: How long a subscription must be unwanted before it is
+            destroyed, in seconds.
+        """
+        self.node = node
+        self.name = name
+        self.publishers = publishers
+        self.debounce_sec = debounce_sec
+        self.subscriptions: List[OnDemandSubscription] = []
+        self.lock = threading.Lock()
+        self.is_active = False
+
+    def add_subscription(
+        self,
+        *args: Any,
+        condition: Optional[Callable[[], bool]] = None,
+        on_destroy: Optional[Callable[[], None]] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Add a subscription for the activator to manage. The arguments are the same
+        as `Node.create_subscription`, which will be called whenever the
+        subscription is (re)created.
+
+        Parameters
+        ----------
+        condition: If not None, the subscription is only wanted while the stream
+            is active and this returns True.
+        on_destroy: Called after the subscription is destroyed by `update`.
+        """
+        with self.lock:
+            self.subscriptions.append(
+                OnDemandSubscription(args, kwargs, condition, on_destroy)
+            )
+
+    def has_demand(self) -> bool:
+        """
+        Check whether any of the stream's output publishers has a subscriber.
+        """
+        return any(
+            publisher.get_subscription_count() > 0 for publisher in self.publishers
+        )
+
+    def update(self, now: float) -> None:
+        """
+        Create the subscriptions that are wanted, and destroy the ones that have
+        not been wanted for the debounce period.
+
+        Parameters
+        ----------
+        now: The current time, in seconds.
+        """
+        with self.lock:
+            has_demand = self.has_demand()
+            destroyed: List[OnDemandSubscription] = []
+            for on_demand_subscription in self.subscriptions:
+                is_wanted = has_demand and (
+                    on_demand_subscription.condition is None
+                    or on_demand_subscription.condition()
+                )
+                if is_wanted:
+                    on_demand_subscription.last_wanted_time = now
+                    if on_demand_subscription.subscription is None:
+                        on_demand_subscription.subscription = (
+                            self.node.create_subscription(
+                                *on_demand_subscription.args,
+                                **on_demand_subscription.kwargs,
+                            )
+                        )
+                elif on_demand_subscription.subscription is not None and (
+                    on_demand_subscription.last_wanted_time is None
+                    or now - on_demand_subscription.last_wanted_time > self.debounce_sec
+                ):
+                    self.node.destroy_subscription(on_demand_subscription.subscription)
+                    on_demand_subscription.subscription = None
+                    destroyed.append(on_demand_subscription)
+
+            was_active = self.is_active
+            self.is_active = any(
+                on_demand_subscription.subscription is not None
+                for on_demand_subscription in self.subscriptions
+            )
+        if self.is_active and not was_active:
+            self.node.get_logger().info(f"Activated the {self.name} stream")
+        elif was_active and not self.is_active:
+            self.node.get_logger().info(f"Deactivated the {self.name} stream")
+        # Only clear what the destroyed subscriptions received, since the stream's
+        # other subscriptions are still receiving
+        for on_demand_subscription in destroyed:
+            if on_demand_subscription.on_destroy is not None:
+                on_demand_subscription.on_destroy()
+
+    def destroy(self) -> None:
+        """
+        Destroy all the subscriptions.
+        """
+        with self.lock:
+            for on_demand_subscription in self.subscriptions:
+                if on_demand_subscription.subscription is not None:
+                    self.node.destroy_subscription(on_demand_subscription.subscription)
+                    on_demand_subscription.subscription = None
+            self.is_active = False
@@ -0,0 +1,270 @@
+"""
+This file contains fixed-size latency histograms, and the per-stream metrics built
+on them, to find which stage of a video stream's pipeline (decoding, overlaying,
+transforming, encoding, or publishing) is using up the stream's frame budget.
+"""
+
+# Standard imports
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Union
+
+
+class LatencyHistogram:
+    """
+    A histogram of durations, with a fixed set of logarithmically-spaced buckets.
+
+    Recording a duration is a binary search over the bucket edges and a counter
+    increment, and the memory used does not grow with the number of durations.
+    Percentiles are approximated by the upper edge of the bucket they fall in,
+    so with 10 buckets per decade they are within ~26% of the true value.
+    """
+
+    def __init__(
+        self,
+        min_value: float = 1.0e-4,
+        max_value: float = 10.0,
+        buckets_per_decade: int = 10,
+    ):
+        """
+        Initialize the LatencyHistogram.
+
+        Parameters
+        ----------
+        min_value: The upper edge of the first bucket, in seconds.
+        max_value: The lower edge of the last (overflow) bucket, in seconds.
+        buckets_per_decade: The number of buckets per factor of 10.
+        """
+        num_edges = (
+            int(round(math.log10(max_value / min_value) * buckets_per_decade)) + 1
+        )
+        self.edges = [
+            min_value * 10 ** (i / buckets_per_decade) for i in range(num_edges)
+        ]
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Clear all recorded durations.
+        """
+        # One bucket below the first edge, one between every pair of edges,
+        # and one (overflow) bucket above the last edge
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        """
+        Record a duration.
+
+        Parameters
+        ----------
+        value: The duration, in seconds.
+        """
+        self.counts[bisect.bisect_right(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """
+        Get an (upper bound on the) percentile of the recorded durations.
+
+        Parameters
+        ----------
+        q: The percentile, in [0, 100].
+
+        Returns
+        -------
+        float: The percentile, in seconds, or 0.0 if nothing was recorded.
+        """
+        if self.count == 0:
+            return 0.0
+        threshold = q / 100.0 * self.count
+        cumulative_count = 0
+        for i, count in enumerate(self.counts):
+            cumulative_count += count
+            if cumulative_count >= threshold and cumulative_count > 0:
+                # The overflow bucket has no upper edge; the max bounds every bucket
+                return (
+                    self.max if i == len(self.edges) else min(self.edges[i], self.max)
+                )
+        return self.max
+
+    def summarize(self) -> Dict[str, Union[int, float]]:
+        """
+        Summarize the recorded durations, in milliseconds.
+        """
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p90_ms": round(self.percentile(90) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class StreamMetrics:
+    """
+    Latency histograms for every stage of one video stream's pipeline, and for the
+    age of its frames when they are published, along with its frame counters.
+
+    The metrics cover a window of time: `summarize` can reset them, so that every
+    summary covers the time since the previous one.
+
+    While a frame is measured (see `measure_frame`), each stage is recorded once
+    for the frame, as the total time it took (e.g., across every perspective the
+    frame was rendered to), so that the stages can be compared to the frame budget.
+    """
+
+    STAGES = ("decode", "overlay", "transform", "encode", "publish")
+
+    def __init__(self, name: str, frame_budget: float):
+        """
+        Initialize the StreamMetrics.
+
+        Parameters
+        ----------
+        name: The name of the stream.
+        frame_budget: The time the stream has to process each frame (i.e., its
+            frame period), in seconds.
+        """
+        self.name = name
+        self.frame_budget = frame_budget
+        self.lock = threading.Lock()
+        self.stage_histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.frame_age_histogram = LatencyHistogram()
+        self.frames_published = 0
+        # Frames that were replaced by a newer frame, or were too old, before the
+        # stream got to process them
+        self.frames_dropped = 0
+        self.window_start_time = time.monotonic()
+        # The total duration of every stage of the frame being measured, if any
+        self.frame_stage_durations: Optional[Dict[str, float]] = None
+
+    def record_stage(self, stage: str, duration: float) -> None:
+        """
+        Record how long a stage took. While a frame is measured, the duration is
+        added to the stage's total for the frame instead.
+
+        Parameters
+        ----------
+        stage: The stage, one of STAGES.
+        duration: The duration, in seconds.
+        """
+        with self.lock:
+            if self.frame_stage_durations is None:
+                self.stage_histograms[stage].record(duration)
+            else:
+                self.frame_stage_durations[stage] = (
+                    self.frame_stage_durations.get(stage, 0.0) + duration
+                )
+
+    @contextmanager
+    def measure_frame(self) -> Iterator[None]:
+        """
+        A context manager that records every stage its body measures once, as the
+        stage's total duration for the frame. Frames of one stream must be measured
+        one at a time.
+        """
+        with self.lock:
+            self.frame_stage_durations = {}
+        try:
+            yield
+        finally:
+            with self.lock:
+                for stage, duration in self.frame_stage_durations.items():
+                    self.stage_histograms[stage].record(duration)
+                self.frame_stage_durations = None
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """
+        A context manager that records how long its body takes as a stage.
+
+        Parameters
+        ----------
+        stage: The stage, one of STAGES.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start_time)
+
+    def record_published(self, frame_age: float) -> None:
+        """
+        Record a published frame.
+
+        Parameters
+        ----------
+        frame_age: The time from the frame's header stamp to publishing it, in seconds.
+        """
+        with self.lock:
+            self.frames_published += 1
+            self.frame_age_histogram.record(frame_age)
+
+    def record_dropped(self) -> None:
+        """
+        Record a frame that was dropped before being processed.
+        """
+        with self.lock:
+            self.frames_dropped += 1
+
+    def summarize(
+        self, reset: bool = False, now: Optional[float] = None
+    ) -> Dict[str, object]:
+        """
+        Summarize the metrics since the window started.
+
+        Parameters
+        ----------
+        reset: Whether to start a new window.
+        now: The current monotonic time, in seconds. If None, use the current time.
+
+        Returns
+        -------
+        Dict[str, object]: The summary, which can be serialized as JSON. Its
+            "slowest_stage" is the stage with the highest 90th percentile.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            window = max(now - self.window_start_time, 1.0e-9)
+            stages = {
+                stage: histogram.summarize()
+                for stage, histogram in self.stage_histograms.items()
+            }
+            summary = {
+                "stream": self.name,
+                "window_sec": round(window, 3),
+                "fps": round(self.frames_published / window, 2),
+                "frames_published": self.frames_published,
+                "frames_dropped": self.frames_dropped,
+                "frame_budget_ms": round(self.frame_budget * 1000, 2),
+                "frame_age": self.frame_age_histogram.summarize(),
+                "stages": stages,
+                "slowest_stage": max(stages, key=lambda stage: stages[stage]["p90_ms"]),
+            }
+            if reset:
+                for histogram in self.stage_histograms.values():
+                    histogram.reset()
+                self.frame_age_histogram.reset()
+                self.frames_published = 0
+                self.frames_dropped = 0
+                self.window_start_time = now
+        return summary
+
+    def is_over_budget(self, summary: Dict[str, object]) -> bool:
+        """
+        Check whether a summary's stages, at their 90th percentiles, add up to
+        more than the frame budget.
+        """
+        total_p90_ms = sum(stage["p90_ms"] for stage in summary["stages"].values())
+        return total_p90_ms > self.frame_budget * 1000
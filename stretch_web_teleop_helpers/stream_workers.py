@@ -0,0 +1,345 @@
+"""
+This file contains helpers to process each video stream in its own worker thread,
+so that a slow stream (e.g., one with a depth AR overlay) does not delay the others.
+Most of the per-frame work (decoding, remapping, blending, and encoding) is done in
+OpenCV, which releases the GIL, so the workers run in parallel.
+
+Streams can also be processed in separate processes, in which case one process runs
+the TF listener and shares the transforms that the streams need with the others
+through a memory-mapped file.
+"""
+
+# Standard imports
+import mmap
+import os
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+# Third-party imports
+import numpy as np
+import rclpy
+from geometry_msgs.msg import TransformStamped
+from rclpy.node import Node
+from rclpy.time import Time
+
+
+class StreamStats:
+    """
+    Per-stream counters of processed frames, dropped frames, and processing time.
+    """
+
+    def __init__(self):
+        """
+        Initialize the StreamStats.
+        """
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Reset all counters.
+        """
+        with self.lock:
+            # Frames that were processed
+            self.frames_processed = 0
+            # Frames that were older than the maximum frame age when the worker
+            # picked them up, and were dropped without being processed
+            self.frames_dropped = 0
+            # Processed frames that took longer than the stream's frame period
+            self.deadline_misses = 0
+            self.total_processing_time = 0.0
+            self.max_processing_time = 0.0
+
+    def record_processed(self, processing_time: float, period: float) -> None:
+        """
+        Record a processed frame.
+
+        Parameters
+        ----------
+        processing_time: How long the frame took to process, in seconds.
+        period: The stream's frame period, in seconds.
+        """
+        with self.lock:
+            self.frames_processed += 1
+            self.total_processing_time += processing_time
+            self.max_processing_time = max(self.max_processing_time, processing_time)
+            if processing_time > period:
+                self.deadline_misses += 1
+
+    def record_dropped(self) -> None:
+        """
+        Record a frame that was dropped for being stale.
+        """
+        with self.lock:
+            self.frames_dropped += 1
+
+    def __str__(self) -> str:
+        with self.lock:
+            mean_processing_time = (
+                self.total_processing_time / self.frames_processed
+                if self.frames_processed > 0
+                else 0.0
+            )
+            return (
+                f"{self.frames_processed} processed, {self.frames_dropped} dropped, "
+                f"{self.deadline_misses} over deadline, "
+                f"mean {mean_processing_time * 1000:.1f} ms, "
+                f"max {self.max_processing_time * 1000:.1f} ms"
+            )
+
+
+class StreamWorker:
+    """
+    Processes the frames of one video stream in a dedicated thread, at the stream's
+    own rate.
+
+    On every tick, the worker takes the latest frame (if any), drops it if it is
+    older than the maximum frame age, and otherwise processes it. Because the
+    worker only ever takes the latest frame, a stream that cannot keep up skips
+    frames instead of building a backlog.
+    """
+
+    def __init__(
+        self,
+        node: Node,
+        name: str,
+        take_frame: Callable[[], Optional[Any]],
+        process_frame: Callable[[Any], None],
+        target_fps: float,
+        max_frame_age: Optional[float] = None,
+        stats_log_period: Optional[float] = None,
+        on_frame_dropped: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Initialize the StreamWorker.
+
+        Parameters
+        ----------
+        node: The ROS node, used to create the rate and get the time.
+        name: The name of the stream, for logging.
+        take_frame: Returns the latest frame and clears it, or None if there is
+            no new frame. Frames must be ROS messages with a header.
+        process_frame: Processes (e.g., configures and publishes) one frame.
+        target_fps: The rate at which to check for and process frames.
+        max_frame_age: Frames whose header stamp is older than this many seconds
+            are dropped. If None, frames are never dropped.
+        stats_log_period: If not None, log the stream's stats this often (sec).
+        on_frame_dropped: If not None, called whenever a frame is dropped for
+            being too old.
+        """
+        self.node = node
+        self.name = name
+        self.take_frame = take_frame
+        self.process_frame = process_frame
+        self.target_fps = target_fps
+        self.period = 1.0 / target_fps
+        self.max_frame_age = max_frame_age
+        self.stats_log_period = stats_log_period
+        self.on_frame_dropped = on_frame_dropped
+
+        self.stats = StreamStats()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name=f"{name}_stream_worker", daemon=True
+        )
+
+    def start(self) -> None:
+        """
+        Start the worker thread.
+        """
+        self.thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Signal the worker thread to stop, and wait for it to do so.
+
+        Parameters
+        ----------
+        timeout: The maximum time to wait for the thread, in seconds.
+        """
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait for the worker thread to stop.
+        """
+        self.thread.join(timeout)
+
+    def get_frame_age(self, frame: Any) -> float:
+        """
+        Get how long ago a frame was stamped, in seconds.
+        """
+        return (
+            self.node.get_clock().now() - Time.from_msg(frame.header.stamp)
+        ).nanoseconds / 1.0e9
+
+    def run(self) -> None:
+        """
+        Take and process frames until the worker is stopped or ROS shuts down.
+        """
+        rate = self.node.create_rate(self.target_fps)
+        last_stats_log_time = time.monotonic()
+        try:
+            while rclpy.ok() and not self.stop_event.is_set():
+                frame = self.take_frame()
+                if frame is not None:
+                    if (
+                        self.max_frame_age is not None
+                        and self.get_frame_age(frame) > self.max_frame_age
+                    ):
+                        self.stats.record_dropped()
+                        if self.on_frame_dropped is not None:
+                            self.on_frame_dropped()
+                    else:
+                        start_time = time.perf_counter()
+                        try:
+                            self.process_frame(frame)
+                        except Exception as err:
+                            # Keep the stream alive if a single frame fails
+                            self.node.get_logger().error(
+                                f"Error processing {self.name} frame: {err}",
+                                throttle_duration_sec=1.0,
+                            )
+                        self.stats.record_processed(
+                            time.perf_counter() - start_time, self.period
+                        )
+
+                if (
+                    self.stats_log_period is not None
+                    and time.monotonic() - last_stats_log_time > self.stats_log_period
+                ):
+                    self.node.get_logger().info(f"{self.name} stream: {self.stats}")
+                    last_stats_log_time = time.monotonic()
+
+                rate.sleep()
+        finally:
+            self.node.destroy_rate(rate)
+
+
+class SharedTransforms:
+    """
+    The latest transforms between fixed pairs of frames, in a memory-mapped file
+    that one process writes and other processes read.
+
+    Every pair of frames has a slot with a sequence number, the transform's stamp,
+    and its translation and rotation. The writer makes the sequence number odd
+    while it updates a slot, so readers retry instead of reading a torn transform.
+    """
+
+    # The sequence number, stamp (sec, nanosec), translation, and rotation
+    SLOT_SIZE = 10
+
+    def __init__(self, frame_pairs: List[Tuple[str, str]], path: str, create: bool):
+        """
+        Initialize the SharedTransforms.
+
+        Parameters
+        ----------
+        frame_pairs: The (target frame, source frame) pairs, in slot order. The
+            writer and the readers must use the same pairs.
+        path: The path of the file (e.g., in /dev/shm).
+        create: If True, create (or truncate) the file to write to. Else, open the
+            existing file to read from.
+        """
+        self.frame_pairs = frame_pairs
+        self.path = path
+        size = len(frame_pairs) * self.SLOT_SIZE * np.dtype(np.float64).itemsize
+        with open(path, "w+b" if create else "rb") as f:
+            if create:
+                f.truncate(size)
+            self.mmap = mmap.mmap(
+                f.fileno(),
+                size,
+                access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ,
+            )
+        self.slots = np.frombuffer(self.mmap, dtype=np.float64).reshape(
+            len(frame_pairs), self.SLOT_SIZE
+        )
+        # The sequence number of the last transform read from every slot
+        self.read_sequences = [0] * len(frame_pairs)
+
+    def write(self, index: int, transform: TransformStamped) -> None:
+        """
+        Write the latest transform for a pair of frames.
+
+        Parameters
+        ----------
+        index: The index of the pair of frames.
+        transform: The transform.
+        """
+        slot = self.slots[index]
+        sequence = slot[0] + 1
+        slot[0] = sequence
+        translation = transform.transform.translation
+        rotation = transform.transform.rotation
+        slot[1:] = (
+            transform.header.stamp.sec,
+            transform.header.stamp.nanosec,
+            translation.x,
+            translation.y,
+            translation.z,
+            rotation.x,
+            rotation.y,
+            rotation.z,
+            rotation.w,
+        )
+        slot[0] = sequence + 1
+
+    def read_new(self, max_retries: int = 10) -> List[TransformStamped]:
+        """
+        Read the transforms that were written since the last call.
+
+        Parameters
+        ----------
+        max_retries: How many times to retry reading a slot that is being written,
+            before skipping it until the next call.
+
+        Returns
+        -------
+        List[TransformStamped]: The new transforms.
+        """
+        transforms = []
+        for index, (target_frame, source_frame) in enumerate(self.frame_pairs):
+            slot = self.slots[index]
+            for _ in range(max_retries):
+                sequence = slot[0]
+                values = slot[1:].copy()
+                if sequence % 2 == 0 and slot[0] == sequence:
+                    break
+            else:
+                continue
+            if sequence == self.read_sequences[index]:
+                continue
+            self.read_sequences[index] = sequence
+
+            transform = TransformStamped()
+            transform.header.frame_id = target_frame
+            transform.header.stamp.sec = int(values[0])
+            transform.header.stamp.nanosec = int(values[1])
+            transform.child_frame_id = source_frame
+            translation = transform.transform.translation
+            rotation = transform.transform.rotation
+            translation.x, translation.y, translation.z = values[2:5].tolist()
+            rotation.x, rotation.y, rotation.z, rotation.w = values[5:9].tolist()
+            transforms.append(transform)
+        return transforms
+
+    def close(self, remove: bool = False) -> None:
+        """
+        Close the file.
+
+        Parameters
+        ----------
+        remove: If True, also delete the file (i.e., when the writer is done).
+        """
+        # The array must be released before its memory map is closed
+        self.slots = None
+        self.mmap.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
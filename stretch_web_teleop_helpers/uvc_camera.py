@@ -0,0 +1,531 @@
+"""
+This file contains the UVC camera node that `navigation_camera.py` and
+`gripper_camera.py` run, and its helpers: opening the camera, and capturing its
+frames in a dedicated thread that hands each new frame off exactly once, stamped
+when it was captured.
+"""
+
+# Standard imports
+import array
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Third-party imports
+import cv2
+import numpy.typing as npt
+import rclpy
+import yaml
+from ament_index_python.packages import get_package_share_directory
+from cv_bridge import CvBridge
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from rclpy.node import Node
+from rclpy.time import Time
+from sensor_msgs.msg import CameraInfo, CompressedImage, Image
+
+# Local imports
+from .image_transforms import get_perspectives_roi
+from .v4l2_config import configure_v4l2_camera, load_uvc_camera_profile
+
+# How often to log and publish the capture stats (e.g., the achieved fps)
+CAPTURE_STATS_PERIOD = 10.0  # seconds
+
+
+def setup_uvc_camera(
+    device_index: str,
+    size: List[int],
+    fps: int,
+    mjpg_passthrough: bool = False,
+    pixel_format: Optional[str] = None,
+) -> cv2.VideoCapture:
+    """
+    Open a UVC camera.
+
+    Parameters
+    ----------
+    device_index: The camera's device (e.g., "/dev/hello-nav-head-camera").
+    size: The [width, height] to capture at.
+    fps: The frame rate to capture at.
+    mjpg_passthrough: If True, capture MJPG and return each frame's JPEG bytes
+        (as a 1D uint8 array) instead of decoding it to BGR.
+    pixel_format: The fourcc to capture (e.g., "MJPG", "YUYV"). If None, use
+        OpenCV's default (or MJPG, for passthrough).
+
+    Returns
+    -------
+    cv2.VideoCapture: The opened camera.
+    """
+    cap = cv2.VideoCapture(device_index)
+    if mjpg_passthrough:
+        pixel_format = "MJPG"
+    if pixel_format is not None:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*pixel_format))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    # Only queue the latest frame in the driver, so a slow reader gets a fresh
+    # frame instead of a backlog of stale ones
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if mjpg_passthrough:
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+    return cap
+
+
+def is_jpeg(buffer: npt.NDArray) -> bool:
+    """
+    Check whether a captured buffer is a JPEG (i.e., starts with the SOI marker),
+    since cameras that do not support MJPG silently fall back to raw formats.
+    """
+    return buffer.size > 2 and buffer.flat[0] == 0xFF and buffer.flat[1] == 0xD8
+
+
+def clip_roi(
+    roi: Optional[Tuple[int, int, int, int]], width: int, height: int
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Clip an (x, y, width, height) region to an image of the given size.
+
+    Returns
+    -------
+    Optional[Tuple[int, int, int, int]]: The clipped region, or None if the
+        region is None or covers the whole image.
+    """
+    if roi is None:
+        return None
+    x_min, y_min = max(roi[0], 0), max(roi[1], 0)
+    x_max, y_max = min(roi[0] + roi[2], width), min(roi[1] + roi[3], height)
+    if (x_min, y_min, x_max, y_max) == (0, 0, width, height):
+        return None
+    return (x_min, y_min, x_max - x_min, y_max - y_min)
+
+
+def crop_and_bin(
+    image: npt.NDArray,
+    roi: Optional[Tuple[int, int, int, int]],
+    binning: int,
+) -> npt.NDArray:
+    """
+    Crop an image to a region, and downscale it by an integer factor.
+
+    Parameters
+    ----------
+    image: The image.
+    roi: The (x, y, width, height) region to keep, or None to keep the whole image.
+    binning: The factor to downscale by (1 to keep the resolution).
+
+    Returns
+    -------
+    npt.NDArray: The image of the region, which is a view of the original image
+        if it is not downscaled.
+    """
+    if roi is not None:
+        x, y, w, h = roi
+        image = image[y : y + h, x : x + w]
+    if binning > 1:
+        image = cv2.resize(
+            image,
+            (image.shape[1] // binning, image.shape[0] // binning),
+            interpolation=cv2.INTER_AREA,
+        )
+    return image
+
+
+def get_source_region_camera_info(
+    width: int,
+    height: int,
+    roi: Optional[Tuple[int, int, int, int]],
+    binning: int,
+) -> CameraInfo:
+    """
+    Get the camera info that describes which region of the camera's image, at
+    which scale, a cropped and binned image covers.
+
+    Parameters
+    ----------
+    width: The width of the camera's full image.
+    height: The height of the camera's full image.
+    roi: The (x, y, width, height) region, or None for the whole image.
+    binning: The factor the region is downscaled by.
+
+    Returns
+    -------
+    CameraInfo: The camera info, with the full image's size, the region as its
+        ROI, and the downscale factor as its binning.
+    """
+    camera_info = CameraInfo(width=width, height=height)
+    camera_info.binning_x = binning
+    camera_info.binning_y = binning
+    if roi is not None:
+        camera_info.roi.x_offset = roi[0]
+        camera_info.roi.y_offset = roi[1]
+        camera_info.roi.width = roi[2]
+        camera_info.roi.height = roi[3]
+    return camera_info
+
+
+class CaptureStats:
+    """
+    Counters of captured frames, dropped frames, and failed reads, and the
+    achieved capture rate since the last summary.
+    """
+
+    def __init__(self, expected_fps: float):
+        """
+        Initialize the CaptureStats.
+
+        Parameters
+        ----------
+        expected_fps: The camera's frame rate, used to detect dropped frames.
+        """
+        self.lock = threading.Lock()
+        self.period = 1.0 / expected_fps if expected_fps > 0 else 0.0
+        # The sequence number of the last captured frame
+        self.sequence = 0
+        # Frames the camera produced that were never read, estimated from gaps
+        # between consecutive captures that are longer than the frame period
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.last_capture_time: Optional[float] = None
+        self.window_start_time = time.monotonic()
+        self.window_start_sequence = 0
+
+    def record_captured(self, capture_time: float) -> int:
+        """
+        Record a captured frame.
+
+        Parameters
+        ----------
+        capture_time: The monotonic time the frame was captured, in seconds.
+
+        Returns
+        -------
+        int: The frame's sequence number.
+        """
+        with self.lock:
+            if self.last_capture_time is not None and self.period > 0:
+                gap = capture_time - self.last_capture_time
+                if gap > 1.5 * self.period:
+                    self.frames_dropped += round(gap / self.period) - 1
+            self.last_capture_time = capture_time
+            self.sequence += 1
+            return self.sequence
+
+    def record_read_failure(self) -> None:
+        """
+        Record a failed read from the camera.
+        """
+        with self.lock:
+            self.read_failures += 1
+
+    def summarize(self) -> Dict[str, Union[int, float]]:
+        """
+        Summarize the counters, and the capture rate since the last summary.
+        """
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.window_start_time
+            capture_fps = (
+                (self.sequence - self.window_start_sequence) / elapsed
+                if elapsed > 0
+                else 0.0
+            )
+            self.window_start_time = now
+            self.window_start_sequence = self.sequence
+            return {
+                "capture_fps": round(capture_fps, 2),
+                "expected_fps": round(1.0 / self.period, 2) if self.period > 0 else 0,
+                "frames_captured": self.sequence,
+                "frames_dropped": self.frames_dropped,
+                "read_failures": self.read_failures,
+            }
+
+
+class UVCCaptureThread:
+    """
+    Reads frames from a UVC camera in a dedicated thread, and calls a callback
+    exactly once per new frame.
+
+    Reading blocks until the camera has a new frame, so the thread runs at the
+    camera's frame rate and never republishes a frame. Each frame is stamped
+    right after it is grabbed, before it is decoded.
+    """
+
+    def __init__(
+        self,
+        node: Node,
+        name: str,
+        capture: cv2.VideoCapture,
+        on_frame: Callable[[npt.NDArray, Time, int], None],
+    ):
+        """
+        Initialize the UVCCaptureThread.
+
+        Parameters
+        ----------
+        node: The ROS node, used to get the time and log.
+        name: The name of the camera, for logging.
+        capture: The opened camera.
+        on_frame: Called with each new frame (a BGR image, or the JPEG bytes if
+            the camera was set up for MJPG passthrough), its capture stamp, and
+            its sequence number.
+        """
+        self.node = node
+        self.name = name
+        self.capture = capture
+        self.on_frame = on_frame
+
+        self.stats = CaptureStats(capture.get(cv2.CAP_PROP_FPS))
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name=f"{name}_capture", daemon=True
+        )
+
+    def start(self) -> None:
+        """
+        Start the capture thread.
+        """
+        self.thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Signal the capture thread to stop, and wait for it to do so.
+
+        Parameters
+        ----------
+        timeout: The maximum time to wait for the thread, in seconds.
+        """
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def run(self) -> None:
+        """
+        Capture frames until the thread is stopped or ROS shuts down.
+        """
+        while rclpy.ok() and not self.stop_event.is_set():
+            # Grab (blocking until the next frame) before decoding, so the stamp
+            # is as close as possible to when the frame was captured
+            if not self.capture.grab():
+                self.stats.record_read_failure()
+                self.node.get_logger().error(
+                    f"Failed to grab a {self.name} frame", throttle_duration_sec=1.0
+                )
+                time.sleep(0.01)
+                continue
+            stamp = self.node.get_clock().now()
+            sequence = self.stats.record_captured(time.monotonic())
+            ok, image = self.capture.retrieve()
+            if not ok or image is None:
+                self.stats.record_read_failure()
+                continue
+            try:
+                self.on_frame(image, stamp, sequence)
+            except Exception as err:
+                # Keep capturing if a single frame fails
+                self.node.get_logger().error(
+                    f"Error publishing {self.name} frame {sequence}: {err}",
+                    throttle_duration_sec=1.0,
+                )
+
+    def get_diagnostic_status(self) -> DiagnosticStatus:
+        """
+        Summarize the capture stats since the last call as a diagnostic status,
+        which warns if the camera captures noticeably slower than expected.
+        """
+        summary = self.stats.summarize()
+        is_slow = summary["capture_fps"] < 0.9 * summary["expected_fps"]
+        return DiagnosticStatus(
+            level=DiagnosticStatus.WARN if is_slow else DiagnosticStatus.OK,
+            name=f"{self.node.get_name()}: {self.name} capture",
+            message=(
+                f"{summary['capture_fps']} fps (expected {summary['expected_fps']}), "
+                f"{summary['frames_dropped']} dropped, "
+                f"{summary['read_failures']} failed reads"
+            ),
+            hardware_id=self.name,
+            values=[
+                KeyValue(key=key, value=str(value)) for key, value in summary.items()
+            ],
+        )
+
+
+class UVCCameraNode(Node):
+    """
+    Publishes a UVC camera's frames, each exactly once and stamped when it was
+    captured, on `<topic_namespace>/image_raw` (and, if publish_compressed is set,
+    the camera's MJPG frames as-is on `<topic_namespace>/image_raw/compressed`).
+    """
+
+    def __init__(
+        self,
+        camera_name: str,
+        camera_profile: str,
+        video_params_stream: str,
+        video_params_perspectives: List[str],
+        topic_namespace: Optional[str] = None,
+        node_name: str = "image_publisher_node",
+    ):
+        """
+        Initialize the UVCCameraNode.
+
+        Parameters
+        ----------
+        camera_name: The name of the camera, for logging and diagnostics.
+        camera_profile: The default profile in uvc_camera_profiles.yaml with the
+            camera's V4L2 format and controls.
+        video_params_stream: The stream in configure_video_streams_params.yaml
+            that this camera's images are rendered to, if video_params_file is set.
+        video_params_perspectives: The default perspectives of that stream.
+        topic_namespace: The namespace of the topics to publish on. If None,
+            `/<camera_name>`.
+        node_name: The name of the node.
+        """
+        super().__init__(node_name)
+        self.camera_name = camera_name
+        if topic_namespace is None:
+            topic_namespace = f"/{camera_name}"
+
+        # If publish_compressed is True, the camera's MJPG frames are published
+        # as-is on the compressed topic, without being decoded. The raw topic is
+        # then only published (decoded) if publish_raw is True and it has
+        # subscribers.
+        self.publish_raw = self.declare_parameter("publish_raw", True).value
+        self.publish_compressed = self.declare_parameter(
+            "publish_compressed", False
+        ).value
+        self.publisher = self.create_publisher(
+            Image, f"{topic_namespace}/image_raw", 15
+        )
+        if self.publish_compressed:
+            self.compressed_publisher = self.create_publisher(
+                CompressedImage, f"{topic_namespace}/image_raw/compressed", 15
+            )
+        self.diagnostics_publisher = self.create_publisher(
+            DiagnosticArray, "/diagnostics", 1
+        )
+        self.cv_bridge = CvBridge()
+
+        # Apply the camera's format and controls, before opening it
+        camera_profiles_file = self.declare_parameter(
+            "camera_profiles_file",
+            os.path.join(
+                get_package_share_directory("stretch_web_teleop"),
+                "config",
+                "uvc_camera_profiles.yaml",
+            ),
+        ).value
+        self.camera_profile = load_uvc_camera_profile(
+            camera_profiles_file,
+            self.declare_parameter("camera_profile", camera_profile).value,
+        )
+        self.get_logger().info(str(configure_v4l2_camera(self.camera_profile)))
+        self.uvc_camera = setup_uvc_camera(
+            self.camera_profile["device"],
+            [self.camera_profile["width"], self.camera_profile["height"]],
+            self.camera_profile["fps"],
+            mjpg_passthrough=self.publish_compressed,
+            pixel_format=self.camera_profile.get("pixel_format", None),
+        )
+
+        # If video_params_file is set, only publish (on the raw topic) the region of
+        # the image that the perspectives use, downscaled by output_binning, along
+        # with camera info whose ROI and binning describe that region
+        video_params_file = self.declare_parameter("video_params_file", "").value
+        self.output_binning = max(self.declare_parameter("output_binning", 1).value, 1)
+        self.source_roi = None
+        if video_params_file:
+            with open(video_params_file, "r") as params:
+                image_params = yaml.safe_load(params)
+            perspectives = self.declare_parameter(
+                "video_params_perspectives", video_params_perspectives
+            ).value
+            self.source_roi = get_perspectives_roi(
+                [image_params[video_params_stream][p] for p in perspectives]
+            )
+        self.source_region = None  # ((height, width), roi, camera info)
+        if self.source_roi is not None or self.output_binning > 1:
+            self.camera_info_publisher = self.create_publisher(
+                CameraInfo, f"{topic_namespace}/camera_info", 15
+            )
+
+        # Publish each frame exactly once, from a thread that blocks on the camera
+        self.capture_thread = UVCCaptureThread(
+            self, camera_name, self.uvc_camera, self.publish_frame
+        )
+        self.capture_thread.start()
+        self.capture_stats_timer = self.create_timer(
+            CAPTURE_STATS_PERIOD, self.capture_stats_callback
+        )
+
+    def publish_frame(self, image: npt.NDArray, stamp: Time, sequence: int) -> None:
+        """
+        Publish a captured frame (a BGR image, or the JPEG bytes if the camera
+        was set up for MJPG passthrough).
+        """
+        if self.publish_compressed:
+            if not is_jpeg(image):
+                self.get_logger().error(
+                    f"{self.camera_name} frame {sequence} is not an MJPG frame",
+                    throttle_duration_sec=1.0,
+                )
+                return
+            compressed_msg = CompressedImage(format="bgr8; jpeg compressed bgr8")
+            compressed_msg.header.stamp = stamp.to_msg()
+            # Assign an array.array, which rosidl's uint8[] setter takes without
+            # checking every byte
+            compressed_msg.data = array.array("B", image.tobytes())
+            self.compressed_publisher.publish(compressed_msg)
+            if not self.publish_raw or self.publisher.get_subscription_count() == 0:
+                return
+            image = cv2.imdecode(image, cv2.IMREAD_COLOR)
+        elif not self.publish_raw:
+            return
+
+        camera_info = None
+        if self.source_roi is not None or self.output_binning > 1:
+            roi, camera_info = self.get_source_region(image.shape[:2])
+            image = crop_and_bin(image, roi, self.output_binning)
+
+        # Convert the OpenCV image to a ROS Image message, stamped at capture time
+        image_msg = self.cv_bridge.cv2_to_imgmsg(image, encoding="bgr8")
+        image_msg.header.stamp = stamp.to_msg()
+        self.publisher.publish(image_msg)
+        if camera_info is not None:
+            camera_info.header.stamp = image_msg.header.stamp
+            self.camera_info_publisher.publish(camera_info)
+
+    def get_source_region(
+        self, shape: Tuple[int, int]
+    ) -> Tuple[Optional[Tuple[int, int, int, int]], CameraInfo]:
+        """
+        Get the region of a captured image of the given (height, width) to publish,
+        and its camera info.
+        """
+        # Clip the region to the captured size, which may differ from the profile's
+        if self.source_region is None or self.source_region[0] != shape:
+            roi = clip_roi(self.source_roi, shape[1], shape[0])
+            camera_info = get_source_region_camera_info(
+                shape[1], shape[0], roi, self.output_binning
+            )
+            self.source_region = (shape, roi, camera_info)
+        return self.source_region[1], self.source_region[2]
+
+    def capture_stats_callback(self) -> None:
+        """
+        Log and publish the capture stats since the last call.
+        """
+        status = self.capture_thread.get_diagnostic_status()
+        self.get_logger().info(status.message)
+        diagnostic_array = DiagnosticArray()
+        diagnostic_array.header.stamp = self.get_clock().now().to_msg()
+        diagnostic_array.status.append(status)
+        self.diagnostics_publisher.publish(diagnostic_array)
+
+    def close(self) -> None:
+        """
+        Stop capturing, release the camera, and destroy the node.
+        """
+        self.capture_thread.stop(timeout=1.0)
+        self.uvc_camera.release()
+        self.destroy_node()
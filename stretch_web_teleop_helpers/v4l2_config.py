@@ -0,0 +1,283 @@
+"""
+This file contains helpers to configure a V4L2 camera's format and controls
+(brightness, exposure, etc.) from a profile in `uvc_camera_profiles.yaml`.
+
+The format and controls are applied through V4L2 ioctls on the device, which
+takes a few milliseconds, and controls that are already at their value are
+skipped. If the ioctls are not available, everything is applied with a single
+`v4l2-ctl` invocation instead.
+"""
+
+# Standard imports
+import fcntl
+import os
+import re
+import struct
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+# Third-party imports
+import yaml
+
+# Sizes of the V4L2 structs (see linux/videodev2.h). The union in v4l2_format
+# contains pointers, so it is aligned to the pointer size.
+_V4L2_CONTROL_FORMAT = "Ii"
+_V4L2_QUERYCTRL_FORMAT = "II32siiiiI2I"
+_V4L2_PIX_FORMAT_FORMAT = "12I"
+_V4L2_FORMAT_SIZE = struct.calcsize("P") + 200
+
+_V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+_V4L2_CTRL_FLAG_DISABLED = 0x0001
+_V4L2_CTRL_FLAG_READ_ONLY = 0x0004
+_V4L2_CTRL_FLAG_NEXT_CTRL = 0x80000000
+_V4L2_CTRL_TYPE_CTRL_CLASS = 6
+
+
+def _iowr(nr: int, size: int) -> int:
+    """
+    Get the number of a read-write V4L2 ioctl ('V' type).
+    """
+    return (3 << 30) | (size << 16) | (ord("V") << 8) | nr
+
+
+VIDIOC_G_FMT = _iowr(4, _V4L2_FORMAT_SIZE)
+VIDIOC_S_FMT = _iowr(5, _V4L2_FORMAT_SIZE)
+VIDIOC_G_CTRL = _iowr(27, struct.calcsize(_V4L2_CONTROL_FORMAT))
+VIDIOC_S_CTRL = _iowr(28, struct.calcsize(_V4L2_CONTROL_FORMAT))
+VIDIOC_QUERYCTRL = _iowr(36, struct.calcsize(_V4L2_QUERYCTRL_FORMAT))
+
+
+class V4L2ConfigResult:
+    """
+    What configuring a camera changed, and how long it took.
+    """
+
+    def __init__(self, device: str, method: str):
+        """
+        Initialize the V4L2ConfigResult.
+
+        Parameters
+        ----------
+        device: The camera's device.
+        method: How the camera was configured, "ioctl" or "v4l2-ctl".
+        """
+        self.device = device
+        self.method = method
+        self.duration = 0.0
+        # The settings (the format, and control names) that were changed
+        self.changed: List[str] = []
+        # The settings that were already at their value
+        self.unchanged: List[str] = []
+        # The settings that could not be applied, and why
+        self.failed: Dict[str, str] = {}
+
+    def __str__(self) -> str:
+        message = (
+            f"Configured {self.device} with {self.method} in "
+            f"{self.duration * 1000:.1f} ms: {len(self.changed)} changed, "
+            f"{len(self.unchanged)} unchanged"
+        )
+        if self.failed:
+            message += ", failed: " + ", ".join(
+                f"{name} ({error})" for name, error in self.failed.items()
+            )
+        return message
+
+
+def load_uvc_camera_profile(path: str, name: str) -> Dict:
+    """
+    Load a camera's profile from a YAML file like `uvc_camera_profiles.yaml`.
+
+    Parameters
+    ----------
+    path: The path to the YAML file.
+    name: The name of the profile (e.g., "navigation_camera").
+
+    Returns
+    -------
+    Dict: The profile, with the device, width, height, fps, pixel_format, and
+        controls (in the order to apply them).
+
+    Raises
+    ------
+    KeyError: If the file has no such profile.
+    """
+    with open(path, "r") as f:
+        profiles = yaml.safe_load(f)
+    if name not in profiles:
+        raise KeyError(f"{path} has no camera profile {name}")
+    profile = profiles[name]
+    profile.setdefault("controls", {})
+    return profile
+
+
+def get_control_key(name: str) -> str:
+    """
+    Convert a V4L2 control's name (e.g., "Exposure Time, Absolute") to the key that
+    v4l2-ctl uses for it (e.g., "exposure_time_absolute").
+    """
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def query_controls(fd: int) -> Dict[str, int]:
+    """
+    Get the ids of a device's writable controls, by their v4l2-ctl keys.
+    """
+    controls = {}
+    control_id = _V4L2_CTRL_FLAG_NEXT_CTRL
+    while True:
+        query = bytearray(struct.calcsize(_V4L2_QUERYCTRL_FORMAT))
+        struct.pack_into("I", query, 0, control_id)
+        try:
+            fcntl.ioctl(fd, VIDIOC_QUERYCTRL, query)
+        except OSError:
+            # EINVAL after the last control
+            break
+        control_id, control_type, name, *_, flags, _, _ = struct.unpack(
+            _V4L2_QUERYCTRL_FORMAT, query
+        )
+        if control_type != _V4L2_CTRL_TYPE_CTRL_CLASS and not flags & (
+            _V4L2_CTRL_FLAG_DISABLED | _V4L2_CTRL_FLAG_READ_ONLY
+        ):
+            key = get_control_key(name.split(b"\0", 1)[0].decode(errors="replace"))
+            controls[key] = control_id
+        control_id |= _V4L2_CTRL_FLAG_NEXT_CTRL
+    return controls
+
+
+def set_format(fd: int, width: int, height: int, pixel_format: Optional[str]) -> bool:
+    """
+    Set a device's capture size and pixel format (e.g., "MJPG").
+
+    Returns
+    -------
+    bool: Whether the format was changed (False if it was already set).
+    """
+    fmt = bytearray(_V4L2_FORMAT_SIZE)
+    struct.pack_into("I", fmt, 0, _V4L2_BUF_TYPE_VIDEO_CAPTURE)
+    fcntl.ioctl(fd, VIDIOC_G_FMT, fmt)
+    pix_offset = struct.calcsize("P")
+    pix = list(struct.unpack_from(_V4L2_PIX_FORMAT_FORMAT, fmt, pix_offset))
+    fourcc = (
+        struct.unpack("<I", pixel_format.encode())[0]
+        if pixel_format is not None
+        else pix[2]
+    )
+    if pix[:3] == [width, height, fourcc]:
+        return False
+    pix[:3] = [width, height, fourcc]
+    struct.pack_into(_V4L2_PIX_FORMAT_FORMAT, fmt, pix_offset, *pix)
+    fcntl.ioctl(fd, VIDIOC_S_FMT, fmt)
+    return True
+
+
+def configure_with_ioctls(
+    device: str,
+    width: int,
+    height: int,
+    pixel_format: Optional[str],
+    controls: Dict[str, int],
+) -> V4L2ConfigResult:
+    """
+    Configure a device's format and controls with V4L2 ioctls, skipping the
+    controls that are already at their value.
+
+    Raises
+    ------
+    OSError: If the device cannot be opened or does not support the ioctls.
+    """
+    result = V4L2ConfigResult(device, "ioctl")
+    fd = os.open(device, os.O_RDWR | os.O_NONBLOCK)
+    try:
+        if set_format(fd, width, height, pixel_format):
+            result.changed.append("format")
+        else:
+            result.unchanged.append("format")
+
+        control_ids = query_controls(fd)
+        for name, value in controls.items():
+            if name not in control_ids:
+                result.failed[name] = "no such control"
+                continue
+            control = bytearray(struct.pack(_V4L2_CONTROL_FORMAT, control_ids[name], 0))
+            try:
+                fcntl.ioctl(fd, VIDIOC_G_CTRL, control)
+                if struct.unpack(_V4L2_CONTROL_FORMAT, control)[1] == value:
+                    result.unchanged.append(name)
+                    continue
+                control = bytearray(
+                    struct.pack(_V4L2_CONTROL_FORMAT, control_ids[name], value)
+                )
+                fcntl.ioctl(fd, VIDIOC_S_CTRL, control)
+                result.changed.append(name)
+            except OSError as err:
+                result.failed[name] = os.strerror(err.errno) if err.errno else str(err)
+    finally:
+        os.close(fd)
+    return result
+
+
+def configure_with_v4l2_ctl(
+    device: str,
+    width: int,
+    height: int,
+    pixel_format: Optional[str],
+    controls: Dict[str, int],
+) -> V4L2ConfigResult:
+    """
+    Configure a device's format and controls with a single v4l2-ctl invocation.
+    v4l2-ctl does not report which controls it changed, so all are reported as
+    changed if it succeeds.
+    """
+    result = V4L2ConfigResult(device, "v4l2-ctl")
+    fmt = f"--set-fmt-video=width={width},height={height}"
+    if pixel_format is not None:
+        fmt += f",pixelformat={pixel_format}"
+    cmd = ["v4l2-ctl", "--device", device, fmt]
+    if controls:
+        cmd.append(
+            "--set-ctrl="
+            + ",".join(f"{name}={value}" for name, value in controls.items())
+        )
+    try:
+        process = subprocess.run(cmd, capture_output=True, text=True, timeout=5.0)
+    except (OSError, subprocess.TimeoutExpired) as err:
+        result.failed["v4l2-ctl"] = str(err)
+        return result
+    if process.returncode != 0:
+        result.failed["v4l2-ctl"] = (
+            process.stderr.strip() or f"exit {process.returncode}"
+        )
+    else:
+        result.changed += ["format", *controls]
+    return result
+
+
+def configure_v4l2_camera(profile: Dict) -> V4L2ConfigResult:
+    """
+    Apply a camera profile's format and controls to its device.
+
+    Parameters
+    ----------
+    profile: The camera profile, from `load_uvc_camera_profile`.
+
+    Returns
+    -------
+    V4L2ConfigResult: What was changed, and how long it took.
+    """
+    start_time = time.perf_counter()
+    args = (
+        profile["device"],
+        profile["width"],
+        profile["height"],
+        profile.get("pixel_format", None),
+        profile["controls"],
+    )
+    try:
+        result = configure_with_ioctls(*args)
+    except OSError:
+        # E.g., the device is busy, or does not support the ioctls
+        result = configure_with_v4l2_ctl(*args)
+    result.duration = time.perf_counter() - start_time
+    return result
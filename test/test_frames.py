@@ -0,0 +1,217 @@
+"""
+Tests that images keep their colors through the video stream pipeline (decoding a
+ROS message to a Frame, blending an AR overlay onto it, and encoding it as a JPEG),
+whichever channel order the camera publishes them in.
+"""
+
+# Third-party imports
+import cv2
+import numpy as np
+import pytest
+from cv_bridge import CvBridge
+from sensor_msgs.msg import CompressedImage
+
+# Local imports
+from stretch_web_teleop_helpers import conversions
+from stretch_web_teleop_helpers.conversions import (
+    JPEGEncoder,
+    ros_msg_to_cv2_image,
+    ros_msg_to_frame,
+)
+from stretch_web_teleop_helpers.frames import ChannelOrder, Frame
+from stretch_web_teleop_helpers.overlays import OverlayBlender
+
+# The (r, g, b) colors of the synthetic image's patches
+PATCH_COLORS = [(200, 30, 30), (30, 200, 30), (30, 30, 200), (220, 180, 40)]
+PATCH_SIZE = 32
+# The gripper depth AR overlay's color and opacity
+OVERLAY_COLOR = (255, 0, 191)
+OVERLAY_ALPHA = 0.6
+# The largest difference in a color channel that JPEG compression may introduce
+# in the middle of a flat patch
+JPEG_TOLERANCE = 8
+
+BACKENDS = [
+    "opencv",
+    pytest.param(
+        "turbojpeg",
+        marks=pytest.mark.skipif(
+            conversions.turbojpeg is None, reason="PyTurboJPEG is not installed"
+        ),
+    ),
+]
+
+
+def make_rgb_image() -> np.ndarray:
+    """
+    Make an RGB image of flat, differently-colored patches side by side.
+    """
+    image = np.zeros((PATCH_SIZE, PATCH_SIZE * len(PATCH_COLORS), 3), dtype=np.uint8)
+    for i, color in enumerate(PATCH_COLORS):
+        image[:, i * PATCH_SIZE : (i + 1) * PATCH_SIZE] = color
+    return image
+
+
+def make_overlay_mask() -> np.ndarray:
+    """
+    Make a mask that covers the bottom half of every patch.
+    """
+    mask = np.zeros((PATCH_SIZE, PATCH_SIZE * len(PATCH_COLORS)), dtype=np.uint8)
+    mask[PATCH_SIZE // 2 :] = 255
+    return mask
+
+
+def make_msg(input_type: str):
+    """
+    Make the message that a camera would publish the synthetic image as.
+
+    Parameters
+    ----------
+    input_type: "compressed" (a JPEG), or the encoding of a raw image ("bgr8" or
+        "rgb8").
+    """
+    rgb_image = make_rgb_image()
+    bgr_image = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR)
+    if input_type == "compressed":
+        _, data = cv2.imencode(".jpg", bgr_image, [cv2.IMWRITE_JPEG_QUALITY, 100])
+        msg = CompressedImage(format="jpeg")
+        msg.data = data.tobytes()
+        return msg
+    image = rgb_image if input_type == "rgb8" else bgr_image
+    return CvBridge().cv2_to_imgmsg(image, encoding=input_type)
+
+
+def run_pipeline(msg, overlay: bool, backend: str):
+    """
+    Run a message through the pipeline, without converting its channel order.
+    """
+    frame = ros_msg_to_frame(msg, CvBridge())
+    if overlay:
+        blender = OverlayBlender(OVERLAY_COLOR, OVERLAY_ALPHA)
+        frame = frame.with_image(
+            blender.blend(
+                frame.image, make_overlay_mask(), channel_order=frame.channel_order
+            )
+        )
+    encoder = JPEGEncoder(backend=backend)
+    return bytes(encoder.encode(frame.image, channel_order=frame.channel_order))
+
+
+def run_rgb_pipeline(msg, overlay: bool):
+    """
+    Run a message through the pipeline as it was before frames carried their
+    channel order: convert the image to RGB, blend the overlay in RGB, and convert
+    back to BGR to encode it (with the image's true channel order, which the
+    previous pipeline got wrong for rgb8 images).
+    """
+    image = ros_msg_to_cv2_image(msg, CvBridge())
+    if getattr(msg, "encoding", None) != "rgb8":
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    if overlay:
+        blender = OverlayBlender(OVERLAY_COLOR, OVERLAY_ALPHA)
+        image = blender.blend(image, make_overlay_mask())
+    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    return bytes(JPEGEncoder(backend="opencv").encode(image))
+
+
+def get_expected_colors(overlay: bool):
+    """
+    Get the (r, g, b) colors expected at the top and bottom of each patch.
+    """
+    expected = []
+    for color in PATCH_COLORS:
+        bottom = color
+        if overlay:
+            bottom = tuple(
+                round((1 - OVERLAY_ALPHA) * channel + OVERLAY_ALPHA * overlay_channel)
+                for channel, overlay_channel in zip(color, OVERLAY_COLOR)
+            )
+        expected.append((color, bottom))
+    return expected
+
+
+@pytest.mark.parametrize("overlay", [False, True])
+@pytest.mark.parametrize("input_type", ["compressed", "bgr8", "rgb8"])
+def test_encoded_bytes_match_rgb_pipeline(input_type, overlay):
+    """
+    Skipping the conversions to and from RGB does not change the encoded JPEG.
+    """
+    msg = make_msg(input_type)
+    assert run_pipeline(msg, overlay, "opencv") == run_rgb_pipeline(msg, overlay)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("overlay", [False, True])
+@pytest.mark.parametrize("input_type", ["compressed", "bgr8", "rgb8"])
+def test_encoded_colors(input_type, overlay, backend):
+    """
+    The encoded JPEG has the camera's colors (and the overlay's color, blended
+    where the mask is set), whatever channel order the camera publishes in.
+    """
+    data = run_pipeline(make_msg(input_type), overlay, backend)
+    decoded = cv2.cvtColor(
+        cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR),
+        cv2.COLOR_BGR2RGB,
+    ).astype(np.int16)
+    for i, (top, bottom) in enumerate(get_expected_colors(overlay)):
+        x = i * PATCH_SIZE + PATCH_SIZE // 2
+        for y, color in ((PATCH_SIZE // 4, top), (3 * PATCH_SIZE // 4, bottom)):
+            np.testing.assert_allclose(decoded[y, x], color, atol=JPEG_TOLERANCE)
+
+
+@pytest.mark.parametrize(
+    "encoding, channel_order",
+    [
+        ("bgr8", ChannelOrder.BGR),
+        ("rgb8", ChannelOrder.RGB),
+        ("bgra8", ChannelOrder.BGR),
+        ("rgba8", ChannelOrder.RGB),
+    ],
+)
+def test_ros_msg_to_frame_channel_order(encoding, channel_order):
+    """
+    Raw images keep their encoding's channel order, and are not converted.
+    """
+    num_channels = 4 if encoding.endswith("a8") else 3
+    image = np.arange(2 * 3 * num_channels, dtype=np.uint8).reshape(2, 3, num_channels)
+    frame = ros_msg_to_frame(CvBridge().cv2_to_imgmsg(image, encoding=encoding))
+    assert frame.channel_order == channel_order
+    np.testing.assert_array_equal(frame.image, image)
+
+
+def test_ros_msg_to_frame_compressed_is_bgr():
+    """
+    Compressed images are decoded to BGR.
+    """
+    frame = ros_msg_to_frame(make_msg("compressed"))
+    assert frame.channel_order == ChannelOrder.BGR
+    red, _, blue = PATCH_COLORS[0]
+    np.testing.assert_allclose(
+        frame.image[PATCH_SIZE // 2, PATCH_SIZE // 2], (blue, 30, red), atol=2
+    )
+
+
+def test_to_channel_order():
+    """
+    Converting a frame swaps its first and third channels (keeping alpha last),
+    and is skipped if the frame is already in that order or is greyscale.
+    """
+    bgra = np.array([[[1, 2, 3, 4]]], dtype=np.uint8)
+    frame = Frame(bgra, ChannelOrder.BGR)
+    assert frame.to_channel_order(ChannelOrder.BGR) is frame
+    rgba = frame.to_channel_order(ChannelOrder.RGB)
+    assert rgba.channel_order == ChannelOrder.RGB
+    np.testing.assert_array_equal(rgba.image, [[[3, 2, 1, 4]]])
+    np.testing.assert_array_equal(frame.image, bgra)
+
+    grey = Frame(np.zeros((2, 2), dtype=np.uint8), ChannelOrder.BGR)
+    assert grey.to_channel_order(ChannelOrder.RGB) is grey
+
+
+def test_convert_color():
+    """
+    RGB colors are converted to the frame's channel order.
+    """
+    image = np.zeros((1, 1, 3), dtype=np.uint8)
+    assert Frame(image, ChannelOrder.BGR).convert_color((1, 2, 3)) == (3, 2, 1)
+    assert Frame(image, ChannelOrder.RGB).convert_color((1, 2, 3)) == (1, 2, 3)
@@ -0,0 +1,198 @@
+"""
+Tests the NumPy pointcloud filters against brute-force, per-point implementations
+of PCL's PassThrough and VoxelGrid semantics, and (if python-pcl is installed)
+against PCL itself.
+"""
+
+# Standard imports
+import math
+
+# Third-party imports
+import numpy as np
+import pytest
+
+# Local imports
+from stretch_web_teleop_helpers.pointcloud_filters import (
+    box_filter,
+    box_filter_mask,
+    filter_pointcloud,
+    voxel_grid_filter,
+)
+
+# The filter settings used by the RealSense and gripper depth AR overlays
+REALSENSE_Z_LIMITS = (0.01, 1.5)
+REALSENSE_LEAF_SIZE = 0.012
+GRIPPER_Z_LIMITS = (0.01, 0.3)
+GRIPPER_LEAF_SIZE = 0.0019
+GRIPPER_BOX = dict(x_limits=(-0.04, 0.04), y_limits=(-0.03, 0.05), z_limits=(0.01, 0.2))
+
+
+def get_pointcloud(size, max_depth, seed=0):
+    """
+    Get a pointcloud that fills a camera frustum, like a RealSense pointcloud.
+    """
+    rng = np.random.default_rng(seed)
+    z = rng.uniform(0.0, max_depth, size)
+    x = rng.uniform(-0.6, 0.6, size) * z
+    y = rng.uniform(-0.4, 0.4, size) * z
+    return np.stack((x, y, z), axis=1).astype(np.float32)
+
+
+def brute_force_box_filter(points, x_limits=None, y_limits=None, z_limits=None):
+    """
+    Keep the points whose coordinates are within the (inclusive) limits on every
+    filtered axis, one point at a time.
+    """
+    kept = []
+    for point in points:
+        for value, limits in zip(point, (x_limits, y_limits, z_limits)):
+            if limits is not None and not limits[0] <= value <= limits[1]:
+                break
+        else:
+            kept.append(point)
+    return np.array(kept, dtype=points.dtype).reshape(-1, 3)
+
+
+def brute_force_voxel_grid_filter(points, leaf_size):
+    """
+    Average the finite points in every voxel, one point at a time, and order the
+    centroids by voxel (z-major, then y, then x).
+    """
+    inverse_leaf_size = np.float32(1.0 / leaf_size)
+    voxels = {}
+    for point in points:
+        if not np.isfinite(point).all():
+            continue
+        x, y, z = (math.floor(value * inverse_leaf_size) for value in point)
+        voxels.setdefault((z, y, x), []).append(point.astype(np.float64))
+    return np.array(
+        [np.mean(voxels[key], axis=0) for key in sorted(voxels)], dtype=points.dtype
+    ).reshape(-1, 3)
+
+
+def sort_points(points):
+    """
+    Sort points by their coordinates, to compare pointclouds in any order.
+    """
+    return points[np.lexsort(points.T)]
+
+
+@pytest.mark.parametrize(
+    "limits",
+    [
+        dict(z_limits=REALSENSE_Z_LIMITS),
+        dict(z_limits=GRIPPER_Z_LIMITS),
+        GRIPPER_BOX,
+        dict(x_limits=(0.0, 0.1), y_limits=None, z_limits=None),
+        dict(),
+    ],
+)
+def test_box_filter(limits):
+    points = get_pointcloud(5000, 0.5)
+    expected = brute_force_box_filter(points, **limits)
+    np.testing.assert_array_equal(box_filter(points, **limits), expected)
+
+
+def test_box_filter_is_inclusive_and_removes_nans_on_filtered_axes():
+    points = np.array(
+        [
+            [0.0, 0.0, 0.1],
+            [0.0, 0.0, 0.2],
+            [0.0, 0.0, 0.3],
+            [np.nan, 0.0, 0.15],
+            [0.0, 0.0, np.nan],
+        ],
+        dtype=np.float32,
+    )
+    mask = box_filter_mask(points, z_limits=(np.float32(0.1), np.float32(0.2)))
+    np.testing.assert_array_equal(mask, [True, True, False, True, False])
+    assert box_filter(points, x_limits=(-1.0, 1.0)).shape == (4, 3)
+
+
+@pytest.mark.parametrize(
+    "size, max_depth, leaf_size",
+    [
+        # Coarse grids, with fewer cells than points (the voxels are indexed directly)
+        (20000, 0.5, 0.05),
+        (20000, 1.5, 0.1),
+        # Fine grids, with more cells than points (the voxels' keys are sorted)
+        (20000, 1.5, REALSENSE_LEAF_SIZE),
+        (5000, 0.3, GRIPPER_LEAF_SIZE),
+    ],
+)
+def test_voxel_grid_filter(size, max_depth, leaf_size):
+    points = get_pointcloud(size, max_depth)
+    expected = brute_force_voxel_grid_filter(points, leaf_size)
+    actual = voxel_grid_filter(points, leaf_size)
+    assert actual.dtype == points.dtype
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_voxel_grid_filter_removes_non_finite_points():
+    points = get_pointcloud(1000, 0.5)
+    points[::7, 0] = np.nan
+    points[::11, 2] = np.inf
+    expected = brute_force_voxel_grid_filter(points, 0.02)
+    np.testing.assert_allclose(voxel_grid_filter(points, 0.02), expected, atol=1e-6)
+
+
+def test_voxel_grid_filter_edge_cases():
+    assert voxel_grid_filter(np.zeros((0, 3), dtype=np.float32), 0.01).shape == (0, 3)
+    nans = np.full((3, 3), np.nan, dtype=np.float32)
+    assert voxel_grid_filter(nans, 0.01).shape == (0, 3)
+    point = np.array([[0.1, -0.2, 0.3]], dtype=np.float32)
+    np.testing.assert_array_equal(voxel_grid_filter(point, 0.01), point)
+    with pytest.raises(ValueError):
+        voxel_grid_filter(point, 0.0)
+
+
+@pytest.mark.parametrize(
+    "z_limits, leaf_size",
+    [(REALSENSE_Z_LIMITS, REALSENSE_LEAF_SIZE), (GRIPPER_Z_LIMITS, GRIPPER_LEAF_SIZE)],
+)
+def test_filter_pointcloud(z_limits, leaf_size):
+    points = get_pointcloud(20000, 2.0)
+    expected = brute_force_voxel_grid_filter(
+        brute_force_box_filter(points, z_limits=z_limits), leaf_size
+    )
+    actual = filter_pointcloud(points, z_limits=z_limits, leaf_size=leaf_size)
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+    np.testing.assert_array_equal(
+        filter_pointcloud(points, z_limits=z_limits),
+        brute_force_box_filter(points, z_limits=z_limits),
+    )
+
+
+@pytest.mark.parametrize(
+    "z_limits, leaf_size",
+    [(REALSENSE_Z_LIMITS, REALSENSE_LEAF_SIZE), (GRIPPER_Z_LIMITS, GRIPPER_LEAF_SIZE)],
+)
+def test_filter_pointcloud_matches_pcl(z_limits, leaf_size):
+    pcl = pytest.importorskip("pcl")
+    points = get_pointcloud(20000, 2.0)
+    cloud = pcl.PointCloud(points)
+    passthrough = cloud.make_passthrough_filter()
+    passthrough.set_filter_field_name("z")
+    passthrough.set_filter_limits(*z_limits)
+    downsampler = passthrough.filter().make_voxel_grid_filter()
+    downsampler.set_leaf_size(leaf_size, leaf_size, leaf_size)
+    expected = downsampler.filter().to_array()
+
+    actual = filter_pointcloud(points, z_limits=z_limits, leaf_size=leaf_size)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(sort_points(actual), sort_points(expected), atol=1e-5)
+
+
+def test_box_filter_matches_pcl():
+    pcl = pytest.importorskip("pcl")
+    points = get_pointcloud(20000, 0.3)
+    cloud = pcl.PointCloud(points)
+    for field in ("z", "x", "y"):
+        passthrough = cloud.make_passthrough_filter()
+        passthrough.set_filter_field_name(field)
+        passthrough.set_filter_limits(*GRIPPER_BOX[f"{field}_limits"])
+        cloud = passthrough.filter()
+
+    np.testing.assert_array_equal(
+        sort_points(box_filter(points, **GRIPPER_BOX)), sort_points(cloud.to_array())
+    )
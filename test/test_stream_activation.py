@@ -0,0 +1,92 @@
+"""
+Tests creating and destroying a stream's upstream subscriptions on demand.
+"""
+
+# Standard imports
+import logging
+
+# Local imports
+from stretch_web_teleop_helpers.stream_activation import StreamActivator
+
+
+class FakePublisher:
+    """
+    A publisher whose number of subscribers is set by the test.
+    """
+
+    def __init__(self):
+        self.subscription_count = 0
+
+    def get_subscription_count(self):
+        return self.subscription_count
+
+
+class FakeNode:
+    """
+    A node that tracks the topics it is subscribed to.
+    """
+
+    def __init__(self):
+        self.topics = set()
+
+    def create_subscription(self, msg_type, topic, callback, qos):
+        self.topics.add(topic)
+        return topic
+
+    def destroy_subscription(self, subscription):
+        self.topics.remove(subscription)
+
+    def get_logger(self):
+        return logging.getLogger("test_stream_activation")
+
+
+def test_conditional_subscription_is_destroyed_after_debounce():
+    node = FakeNode()
+    publisher = FakePublisher()
+    activator = StreamActivator(node, "realsense", [publisher], debounce_sec=5.0)
+    depth_ar = [True]
+    cleared = []
+    activator.add_subscription(
+        None, "rgb", None, 1, on_destroy=lambda: cleared.append("rgb")
+    )
+    activator.add_subscription(
+        None,
+        "depth",
+        None,
+        1,
+        condition=lambda: depth_ar[0],
+        on_destroy=lambda: cleared.append("depth"),
+    )
+
+    activator.update(0.0)
+    assert node.topics == set() and not activator.is_active
+
+    publisher.subscription_count = 1
+    activator.update(1.0)
+    assert node.topics == {"rgb", "depth"} and activator.is_active
+
+    # Disabling the overlay only destroys its subscription once debounced, and
+    # only clears what that subscription received
+    depth_ar[0] = False
+    activator.update(3.0)
+    assert node.topics == {"rgb", "depth"}
+    activator.update(7.0)
+    assert node.topics == {"rgb"} and activator.is_active
+    assert cleared == ["depth"]
+
+    publisher.subscription_count = 0
+    activator.update(13.0)
+    assert node.topics == set() and not activator.is_active
+    assert cleared == ["depth", "rgb"]
+
+
+def test_destroy():
+    node = FakeNode()
+    publisher = FakePublisher()
+    publisher.subscription_count = 1
+    activator = StreamActivator(node, "overhead", [publisher])
+    activator.add_subscription(None, "rgb", None, 1)
+    activator.update(0.0)
+    assert node.topics == {"rgb"}
+    activator.destroy()
+    assert node.topics == set() and not activator.is_active
@@ -0,0 +1,47 @@
+"""
+Tests the per-stream latency metrics, and that stages are measured per frame.
+"""
+
+# Local imports
+from stretch_web_teleop_helpers.stream_metrics import LatencyHistogram, StreamMetrics
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for _ in range(90):
+        histogram.record(0.001)
+    for _ in range(10):
+        histogram.record(0.05)
+    assert histogram.count == 100
+    assert 0.001 <= histogram.percentile(50) < 0.0013
+    assert histogram.percentile(99) == 0.05
+    assert histogram.summarize()["max_ms"] == 50.0
+
+
+def test_stages_are_summed_per_frame():
+    metrics = StreamMetrics("realsense", frame_budget=1.0 / 15)
+    for _ in range(10):
+        with metrics.measure_frame():
+            metrics.record_stage("decode", 0.01)
+            # One transform and encode per perspective the frame is rendered to
+            for _ in range(3):
+                metrics.record_stage("transform", 0.01)
+                metrics.record_stage("encode", 0.01)
+    summary = metrics.summarize()
+    assert summary["stages"]["decode"]["count"] == 10
+    assert summary["stages"]["transform"]["count"] == 10
+    assert 30.0 <= summary["stages"]["transform"]["p50_ms"] < 40.0
+    assert summary["stages"]["overlay"]["count"] == 0
+    # 10 + 30 + 30 ms per frame is over the 66.7 ms budget, although every
+    # perspective's stages alone are well within it
+    assert metrics.is_over_budget(summary)
+
+
+def test_stages_outside_frames_are_recorded_individually():
+    metrics = StreamMetrics("gripper", frame_budget=1.0 / 15)
+    metrics.record_stage("encode", 0.01)
+    metrics.record_stage("encode", 0.01)
+    summary = metrics.summarize(reset=True)
+    assert summary["stages"]["encode"]["count"] == 2
+    assert not metrics.is_over_budget(summary)
+    assert metrics.summarize()["stages"]["encode"]["count"] == 0
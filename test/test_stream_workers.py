@@ -0,0 +1,85 @@
+"""
+Tests sharing the latest transforms between processes through SharedTransforms.
+"""
+
+# Standard imports
+import multiprocessing
+
+# Third-party imports
+from geometry_msgs.msg import TransformStamped
+
+# Local imports
+from stretch_web_teleop_helpers.stream_workers import SharedTransforms
+
+FRAME_PAIRS = [("base_link", "camera_color_optical_frame"), ("map", "base_link")]
+
+
+def make_transform(sec, x):
+    """
+    Make a transform with a stamp and an x translation.
+    """
+    transform = TransformStamped()
+    transform.header.stamp.sec = sec
+    transform.header.stamp.nanosec = 500
+    transform.transform.translation.x = x
+    transform.transform.rotation.z = 0.6
+    transform.transform.rotation.w = 0.8
+    return transform
+
+
+def read_in_process(path, queue):
+    """
+    Read the shared transforms in another process, and send their x translations.
+    """
+    reader = SharedTransforms(FRAME_PAIRS, path, create=False)
+    queue.put(
+        [
+            (transform.child_frame_id, transform.transform.translation.x)
+            for transform in reader.read_new()
+        ]
+    )
+    reader.close()
+
+
+def test_read_new(tmp_path):
+    path = str(tmp_path / "transforms")
+    writer = SharedTransforms(FRAME_PAIRS, path, create=True)
+    reader = SharedTransforms(FRAME_PAIRS, path, create=False)
+    assert reader.read_new() == []
+
+    writer.write(0, make_transform(10, 1.5))
+    transforms = reader.read_new()
+    assert len(transforms) == 1
+    transform = transforms[0]
+    assert transform.header.frame_id == "base_link"
+    assert transform.child_frame_id == "camera_color_optical_frame"
+    assert (transform.header.stamp.sec, transform.header.stamp.nanosec) == (10, 500)
+    assert transform.transform.translation.x == 1.5
+    assert (transform.transform.rotation.z, transform.transform.rotation.w) == (
+        0.6,
+        0.8,
+    )
+    # Every transform is only read once
+    assert reader.read_new() == []
+
+    writer.write(0, make_transform(11, 2.5))
+    writer.write(1, make_transform(11, 3.5))
+    assert [t.transform.translation.x for t in reader.read_new()] == [2.5, 3.5]
+
+    reader.close()
+    writer.close(remove=True)
+    assert not (tmp_path / "transforms").exists()
+
+
+def test_read_in_another_process(tmp_path):
+    path = str(tmp_path / "transforms")
+    writer = SharedTransforms(FRAME_PAIRS, path, create=True)
+    writer.write(1, make_transform(10, 4.5))
+
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=read_in_process, args=(path, queue))
+    process.start()
+    assert queue.get(timeout=10.0) == [("base_link", 4.5)]
+    process.join()
+    writer.close(remove=True)